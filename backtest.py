@@ -0,0 +1,249 @@
+# backtest.py — оценка исторических прогнозов по свечам (NumPy)
+#
+# Все forecast-снапшоты из SNAPSHOT_DIR (уровни, спот, ema_cross) сверяются со
+# свечами из локального хранилища candles.py (1m, если есть, иначе 5m) на
+# отрезке от времени прогноза до review (нет review — до REVIEW_AT того же дня).
+# Для каждой комбинации (день × уровень × допуск) одной broadcast-операцией:
+#   • касание и время до первого касания, мин: support — low <= L*(1+tol),
+#     resistance — high >= L*(1-tol);
+#   • MAE/MFE, % от спота прогноза, в сторону ema_cross (без направления — long);
+#   • bias hit: цена на конце отрезка ушла от спота в сторону ema_cross.
+# Дни режутся на куски по CHUNK_DAYS (память ~ дни x уровни x допуски x свечи);
+# --workers N раздаёт куски пулу процессов.
+#
+# Свечи заранее: python candles.py ETHUSDT 1 2025-01-01
+#   python backtest.py --tolerances 0,0.05,0.1,0.25,0.5 --from 2025-01-01 --workers 4
+
+import os, json, time, warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+import numpy as np
+
+import candles, history
+from history import json_number
+from store import LocalStore, SNAPSHOT_DIR
+
+TZ = ZoneInfo("Europe/Podgorica")
+REVIEW_AT = os.environ.get("REVIEW_AT", "21:00")
+CHUNK_DAYS = 64
+DIRECTION = {"bullish": 1, "bearish": -1}
+
+# --------- Прогнозы ---------
+def _utc_ms(iso: str) -> int:
+    dt = datetime.fromisoformat(iso)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)   # timestamp_utc пишется без зоны
+    return int(dt.timestamp() * 1000)
+
+def _review_at_ms(date_str: str) -> int:
+    h, m = (int(x) for x in REVIEW_AT.split(":"))
+    d = datetime.fromisoformat(date_str).replace(hour=h, minute=m, tzinfo=TZ)
+    return int(d.timestamp() * 1000)
+
+def _float(v) -> float:
+    v = history.number(v)
+    return float("nan") if v is None else v
+
+def load_forecasts(root: str = SNAPSHOT_DIR, start: str | None = None, end: str | None = None) -> dict:
+    """Прогнозы за [start, end] -> массивы по дням: date, t0/t1 (мс UTC), spot,
+    direction (+1/-1/0), levels (D, L) и side (L,): True — support. Пропуски — NaN."""
+    local = LocalStore(root)
+    names = [n for n in local.names() if n.endswith("_forecast.json")
+             and (not start or n[:10] >= start) and (not end or n[:10] <= end)]
+    rows = []
+    for name in names:
+        try:
+            f = json.loads(local.read_bytes(name))
+        except (TypeError, ValueError):
+            continue
+        date_str = name[:10]
+        lv = f.get("levels") or {}
+        try:
+            t0 = _utc_ms(f["timestamp_utc"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        r = local.read_bytes(f"{date_str}_review.json")
+        try:
+            t1 = _utc_ms(json.loads(r)["timestamp_utc"]) if r else _review_at_ms(date_str)
+        except (KeyError, TypeError, ValueError):
+            t1 = _review_at_ms(date_str)
+        rows.append((date_str, t0, t1, _float(f.get("eth_spot")),
+                     DIRECTION.get((f.get("calc") or {}).get("ema_cross"), 0),
+                     [_float(x) for x in lv.get("support") or []],
+                     [_float(x) for x in lv.get("resistance") or []]))
+    ns = max((len(r[5]) for r in rows), default=0)
+    nr = max((len(r[6]) for r in rows), default=0)
+    levels = np.full((len(rows), ns + nr), np.nan)
+    for i, r in enumerate(rows):
+        levels[i, :len(r[5])] = r[5]
+        levels[i, ns:ns + len(r[6])] = r[6]
+    return {
+        "date": np.array([r[0] for r in rows], dtype="U10"),
+        "t0": np.array([r[1] for r in rows], dtype=np.int64),
+        "t1": np.array([r[2] for r in rows], dtype=np.int64),
+        "spot": np.array([r[3] for r in rows], dtype=np.float64),
+        "direction": np.array([r[4] for r in rows], dtype=np.int8),
+        "levels": levels,
+        "side": np.arange(ns + nr) < ns,
+        "names": [f"S{i + 1}" for i in range(ns)] + [f"R{i + 1}" for i in range(nr)],
+    }
+
+# --------- Свечи по сессиям ---------
+def session_matrix(recs: np.ndarray, t0: np.ndarray, t1: np.ndarray) -> dict:
+    """Свечи (candles.DTYPE по возрастанию) -> матрицы (D, T) по отрезкам [t0, t1]:
+    start, high, low, close и valid; короткие сессии добиты NaN."""
+    start = recs["start"]
+    i0 = np.searchsorted(start, t0, side="left")
+    i1 = np.searchsorted(start, t1, side="right")
+    n = i1 - i0
+    T = max(int(n.max()), 1) if len(n) else 1     # T=0 сломал бы argmax в evaluate
+    idx = i0[:, None] + np.arange(T)[None, :]
+    valid = idx < i1[:, None]
+    idx = np.minimum(idx, max(len(recs) - 1, 0))
+    out = {"valid": valid, "start": np.where(valid, start[idx] if len(recs) else 0, -1)}
+    for k in ("high", "low", "close"):
+        out[k] = np.where(valid, recs[k][idx] if len(recs) else np.nan, np.nan)
+    return out
+
+# --------- Расчёт ---------
+def evaluate(sess: dict, t0: np.ndarray, levels: np.ndarray, side: np.ndarray, spot: np.ndarray,
+             direction: np.ndarray, tolerances: np.ndarray) -> dict:
+    """Одна broadcast-операция на кусок дней. Оси: D дней, L уровней, K допусков, T свечей.
+    tolerances — доли (0.001 = 0.1%). Возвращает touched / first_touch_min (D, L, K),
+    mae_pct / mfe_pct / bias_hit (D,)."""
+    sgn = np.where(side, -1.0, 1.0)                                   # support: -1, resistance: +1
+    price = np.where(side[None, :, None], sess["low"][:, None, :], sess["high"][:, None, :])     # (D, L, T)
+    thr = levels[:, :, None] * (1.0 - sgn[None, :, None] * tolerances[None, None, :])           # (D, L, K)
+    with np.errstate(invalid="ignore"):
+        hit = (sgn[None, :, None, None] * price[:, :, None, :] >= (sgn[None, :, None] * thr)[..., None])
+    hit &= sess["valid"][:, None, None, :]                                                    # (D, L, K, T)
+    touched = hit.any(axis=-1)
+    first = hit.argmax(axis=-1)
+    t_first = np.take_along_axis(sess["start"][:, None, None, :], first[..., None], axis=-1)[..., 0]
+    first_min = np.where(touched, (t_first - t0[:, None, None]) / candles.MINUTE, np.nan)
+
+    any_c = sess["valid"].any(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hi = np.where(sess["valid"], sess["high"], -np.inf).max(axis=1)
+        lo = np.where(sess["valid"], sess["low"], np.inf).min(axis=1)
+        last = np.take_along_axis(sess["close"], (sess["valid"].sum(axis=1) - 1).clip(0)[:, None], axis=1)[:, 0]
+        d = np.where(direction == 0, 1, direction).astype(np.float64)
+        up = (hi / spot - 1) * 100
+        down = (1 - lo / spot) * 100
+        mfe = np.where(d > 0, up, down)
+        mae = np.where(d > 0, down, up)
+        move = np.sign(last - spot)
+    ok = any_c & np.isfinite(spot)
+    return {
+        "touched": touched,
+        "first_touch_min": first_min,
+        "mae_pct": np.where(ok, mae, np.nan),
+        "mfe_pct": np.where(ok, mfe, np.nan),
+        "bias_hit": np.where(ok & (direction != 0), (move == direction).astype(np.float64), np.nan),
+        "candles": sess["valid"].sum(axis=1),
+    }
+
+def _evaluate_chunk(args):
+    recs, fc, tolerances = args
+    sess = session_matrix(recs, fc["t0"], fc["t1"])
+    return evaluate(sess, fc["t0"], fc["levels"], fc["side"], fc["spot"], fc["direction"], tolerances)
+
+def run(fc: dict, recs: np.ndarray, tolerances, workers: int = 1, chunk_days: int = CHUNK_DAYS) -> dict:
+    """Все дни fc по кускам chunk_days (workers > 1 — в пуле процессов); результат
+    evaluate, склеенный по оси дней."""
+    tolerances = np.asarray(tolerances, dtype=np.float64)
+    D = len(fc["date"])
+    parts = []
+    for i in range(0, D, chunk_days):
+        sl = slice(i, i + chunk_days)
+        sub = {k: (v[sl] if k not in ("side", "names") else v) for k, v in fc.items()}
+        # процессам — только свечи своего куска, а не весь memmap
+        lo = np.searchsorted(recs["start"], sub["t0"].min())
+        hi = np.searchsorted(recs["start"], sub["t1"].max(), side="right")
+        parts.append((np.asarray(recs[lo:hi]), sub, tolerances))
+    if workers > 1 and len(parts) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            res = list(pool.map(_evaluate_chunk, parts))
+    else:
+        res = [_evaluate_chunk(p) for p in parts]
+    if not res:
+        L, K = len(fc["side"]), len(tolerances)
+        return {"touched": np.zeros((0, L, K), bool), "first_touch_min": np.empty((0, L, K)),
+                "mae_pct": np.empty(0), "mfe_pct": np.empty(0), "bias_hit": np.empty(0),
+                "candles": np.empty(0, np.int64)}
+    return {k: np.concatenate([r[k] for r in res]) for k in res[0]}
+
+def summarize(fc: dict, res: dict, tolerances) -> dict:
+    """Сводка по всем дням: на каждый допуск и уровень — доля касаний и медиана
+    времени до касания; по дням — средние MAE/MFE и доля угаданных направлений."""
+    scored = res["candles"] > 0
+    out = {"days": int(scored.sum()), "days_without_candles": int((~scored).sum()), "by_tolerance": []}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)    # nanmedian/nanmean по пустым колонкам
+        for k, tol in enumerate(tolerances):
+            t = res["touched"][scored, :, k]
+            m = res["first_touch_min"][scored, :, k]
+            has = ~np.isnan(fc["levels"][scored])
+            rate = np.where(has.sum(0) > 0, (t & has).sum(0) / np.maximum(has.sum(0), 1), np.nan)
+            med = np.nanmedian(m, axis=0) if len(m) else np.full(len(fc["names"]), np.nan)
+            out["by_tolerance"].append({
+                "tolerance_pct": round(float(tol) * 100, 4),
+                "levels": {name: {"touch_rate": json_number(rate[i], 4), "median_first_touch_min": json_number(med[i], 4)}
+                           for i, name in enumerate(fc["names"])},
+            })
+        out["mae_pct_mean"] = json_number(np.nanmean(res["mae_pct"][scored]) if scored.any() else np.nan, 4)
+        out["mfe_pct_mean"] = json_number(np.nanmean(res["mfe_pct"][scored]) if scored.any() else np.nan, 4)
+        bh = res["bias_hit"][scored]
+        out["bias_hit_rate"] = json_number(np.nanmean(bh) if np.isfinite(bh).any() else np.nan, 4)
+        out["bias_days"] = int(np.isfinite(bh).sum())
+    return out
+
+def load_candles(symbol: str, interval: str | None = None) -> tuple:
+    """(interval, свечи из локального хранилища): 1m, если сохранены, иначе 5m."""
+    store = candles.CandleStore(fetch=None)
+    for iv in ([interval] if interval else ["1", "5"]):
+        recs = store.load(symbol, iv)
+        if len(recs):
+            return iv, recs
+    return interval or "5", np.empty(0, dtype=candles.DTYPE)
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Бэктест уровней и направления прогнозов по свечам")
+    ap.add_argument("--from", dest="start", help="YYYY-MM-DD")
+    ap.add_argument("--to", dest="end", help="YYYY-MM-DD (включительно)")
+    ap.add_argument("--symbol", default="ETHUSDT")
+    ap.add_argument("--interval", choices=["1", "5"], help="по умолчанию 1m, если есть, иначе 5m")
+    ap.add_argument("--tolerances", default="0,0.05,0.1,0.25,0.5", help="допуски в %% через запятую")
+    ap.add_argument("--workers", type=int, default=1, help="процессов (куски по %d дней)" % CHUNK_DAYS)
+    ap.add_argument("--json", action="store_true", help="сводку — JSON в stdout")
+    args = ap.parse_args()
+
+    tols = np.array([float(x) / 100 for x in args.tolerances.split(",") if x.strip()])
+    t = time.perf_counter()
+    fc = load_forecasts(start=args.start, end=args.end)
+    iv, recs = load_candles(args.symbol, args.interval)
+    t_load = time.perf_counter() - t
+    t = time.perf_counter()
+    res = run(fc, recs, tols, workers=args.workers)
+    t_eval = time.perf_counter() - t
+    summ = summarize(fc, res, tols)
+    if args.json:
+        print(json.dumps(summ, ensure_ascii=False, indent=1))
+        raise SystemExit
+    print(f"{len(fc['date'])} forecasts, {len(recs)} candles {iv}m; load {t_load*1000:.0f} ms, "
+          f"evaluate {len(fc['date'])}x{len(fc['names'])}x{len(tols)} in {t_eval*1000:.0f} ms")
+    print(f"days scored {summ['days']} (no candles: {summ['days_without_candles']}), "
+          f"bias hit {summ['bias_hit_rate']} over {summ['bias_days']} days, "
+          f"MAE {summ['mae_pct_mean']}%  MFE {summ['mfe_pct_mean']}%")
+    print("tol %    " + "  ".join(f"{n:>16}" for n in fc["names"]))
+    for row in summ["by_tolerance"]:
+        cells = []
+        for n in fc["names"]:
+            lv = row["levels"][n]
+            rate = "-" if lv["touch_rate"] is None else f"{lv['touch_rate']*100:.0f}%"
+            med = "-" if lv["median_first_touch_min"] is None else f"{lv['median_first_touch_min']:.0f}m"
+            cells.append(f"{rate:>7} {med:>8}")
+        print(f"{row['tolerance_pct']:<8} " + "  ".join(cells))
@@ -0,0 +1 @@
+# bench — заглушки Bybit/GitHub и замеры производительности (см. bench/run.py)
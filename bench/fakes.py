@@ -0,0 +1,513 @@
+# bench/fakes.py — локальные заглушки Bybit v5 и GitHub для бенчмарков
+#
+# Оба сервера — ThreadingHTTPServer на 127.0.0.1 со случайным портом, с
+# keep-alive, настраиваемой задержкой на запрос и долей ошибок (HTTP 503).
+# FakeBybitWS — публичный WebSocket v5 (tickers/kline) на тех же ценах,
+# умеет рвать соединение, чтобы проверить переподключение stream.BookFeed.
+# Цены детерминированы: одна и та же минута всегда даёт одну и ту же свечу,
+# поэтому прогоны сравнимы между собой.
+#
+#   with FakeBybit(latency=0.05, error_rate=0.02) as bybit, FakeGitHub() as gh:
+#       os.environ["BYBIT_API"] = bybit.url
+#       os.environ["GITHUB_API"], os.environ["GITHUB_RAW"] = gh.api_url, gh.raw_url
+
+import json, time, base64, asyncio, hashlib, random, threading, urllib.parse
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+import candles
+
+CONTENTS_LIMIT = 1 << 20   # contents API отдаёт base64 только для файлов до 1 МБ
+LISTING_LIMIT = 1000       # и не больше 1000 записей в листинге папки (остальные молча отброшены)
+
+def git_blob_sha(data: bytes) -> str:
+    # как store.git_blob_sha; store здесь не импортируем — он читает GITHUB_* при импорте,
+    # а адреса заглушек известны только после их старта
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class _Server:
+    """Общая часть: поток сервера, задержка, ошибки, счётчик запросов по пути."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *a):
+                pass
+
+            def _dispatch(self, method):
+                u = urllib.parse.urlsplit(self.path)
+                with outer._lock:
+                    outer.calls[f"{method} {outer.route(u.path)}"] += 1
+                    fail = outer._rng.random() < outer.error_rate
+                    if fail:
+                        outer.errors += 1
+                if outer.latency:
+                    time.sleep(outer.latency)
+                n = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(n) if n else b""
+                if fail:
+                    code, headers, out = 503, {}, b'{"message":"injected failure"}'
+                else:
+                    code, headers, out = outer.handle(method, u.path, dict(urllib.parse.parse_qsl(u.query)),
+                                                      self.headers, body)
+                self.send_response(code)
+                headers.setdefault("Content-Type", "application/json")
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_PATCH(self):
+                self._dispatch("PATCH")
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def route(self, path: str) -> str:
+        return path
+
+    def handle(self, method, path, query, headers, body):
+        raise NotImplementedError
+
+def _json(obj, code=200, headers=None):
+    return code, headers or {}, json.dumps(obj).encode()
+
+# --------- Bybit v5 ---------
+BASE_PRICE = {"ETHUSDT": 3100.0, "BTCUSDT": 90000.0, "SOLUSDT": 140.0}
+
+class FakeBybit(_Server):
+    """/v5/market/tickers, kline, funding/history, open-interest, orderbook и
+    recent-trade. Цена — сумма синусоид от номера минуты: дневной размах около
+    ±2%, уровни регулярно касаются; остальное выводится из цены и времени."""
+
+    def price(self, symbol: str, t_ms) -> np.ndarray:
+        m = np.asarray(t_ms, dtype=np.float64) / candles.MINUTE
+        base = BASE_PRICE.get(symbol, 100.0)
+        return base * (1 + 0.02 * np.sin(2 * np.pi * m / 4320) + 0.004 * np.sin(2 * np.pi * m / 97))
+
+    def candles(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> np.ndarray:
+        """Свечи со start в [start_ms, end_ms] — массив candles.DTYPE по возрастанию."""
+        iv = candles.INTERVAL_MS[interval]
+        first = -(-start_ms // iv) * iv
+        t = np.arange(first, end_ms + 1, iv, dtype=np.int64)
+        out = np.empty(len(t), dtype=candles.DTYPE)
+        o, c = self.price(symbol, t), self.price(symbol, t + iv)
+        out["start"] = t
+        out["open"], out["close"] = o, c
+        out["high"] = np.maximum(o, c) * 1.001
+        out["low"] = np.minimum(o, c) * 0.999
+        out["volume"] = 10.0 * iv / candles.MINUTE
+        out["turnover"] = out["volume"] * (o + c) / 2
+        return out
+
+    def handle(self, method, path, q, headers, body):
+        now = int(time.time() * 1000)
+        if path == "/v5/market/tickers":
+            syms = [q["symbol"]] if "symbol" in q else list(BASE_PRICE)
+            lst = []
+            for s in syms:
+                last = float(self.price(s, now))
+                it = {"symbol": s, "lastPrice": f"{last:.2f}", "turnover24h": f"{last * 2e5:.2f}"}
+                if q.get("category") == "linear":
+                    it |= {"fundingRate": "0.0001", "openInterestValue": f"{last * 1e6:.2f}",
+                           "turnover24h": f"{last * 5e5:.2f}"}
+                lst.append(it)
+            return _json({"retCode": 0, "result": {"category": q.get("category"), "list": lst}})
+        if path == "/v5/market/funding/history":
+            t = now - now % 28_800_000 - 28_800_000 * np.arange(int(q.get("limit", 200)))
+            lst = [{"symbol": q["symbol"], "fundingRate": f"{r:.6f}", "fundingRateTimestamp": str(ts)}
+                   for ts, r in zip(t, 1e-4 * np.sin(t / 8.64e7))]
+            return _json({"retCode": 0, "result": {"category": "linear", "list": lst}})
+        if path == "/v5/market/open-interest":
+            t = now - now % 3_600_000 - 3_600_000 * np.arange(int(q.get("limit", 50)))
+            lst = [{"openInterest": f"{v:.3f}", "timestamp": str(ts)}
+                   for ts, v in zip(t, 1e6 * (1 + 0.05 * np.sin(t / 8.64e7)))]
+            return _json({"retCode": 0, "result": {"symbol": q["symbol"], "category": "linear", "list": lst}})
+        if path == "/v5/market/orderbook":
+            n = int(q.get("limit", 25))
+            mid = float(self.price(q["symbol"], now))
+            step = np.arange(1, n + 1) * mid * 1e-5
+            size = 1 + np.sin(now / 6e4 + np.arange(n)) ** 2
+            side = lambda px, sz: [[f"{p:.2f}", f"{v:.3f}"] for p, v in zip(px, sz)]
+            return _json({"retCode": 0, "result": {"s": q["symbol"], "b": side(mid - step, size),
+                                                   "a": side(mid + step, size[::-1] * 1.1), "ts": now}})
+        if path == "/v5/market/recent-trade":
+            t = now - 250 * np.arange(int(q.get("limit", 500)))          # сделка каждые 250 мс
+            px = self.price(q["symbol"], t)
+            lst = [{"symbol": q["symbol"], "price": f"{p:.2f}", "size": "0.5", "time": str(ts),
+                    "side": "Buy" if (ts // 1000) % 3 else "Sell"} for ts, p in zip(t, px)]
+            return _json({"retCode": 0, "result": {"category": "linear", "list": lst}})
+        if path == "/v5/market/kline":
+            iv = q.get("interval", "1")
+            ms = candles.INTERVAL_MS[iv]
+            limit = min(int(q.get("limit", 200)), candles.PAGE)
+            end = min(int(q.get("end", now)), now)
+            oldest = end - end % ms - (limit - 1) * ms    # как Bybit: не больше limit самых новых
+            recs = self.candles(q["symbol"], iv, max(int(q.get("start", 0)), oldest), end)[::-1]
+            rows = [[str(r["start"])] + [f"{r[k]:.4f}" for k in candles.FIELDS[1:]] for r in recs]
+            return _json({"retCode": 0, "result": {"symbol": q["symbol"], "category": q.get("category"), "list": rows}})
+        return _json({"retCode": 10001, "retMsg": f"unknown path {path}"}, 404)
+
+class FakeBybitWS:
+    """Публичный WebSocket Bybit v5: на subscribe — подтверждение, на ping — pong,
+    затем каждые `every` секунд по сообщению на топик (tickers.<S>, kline.<iv>.<S>)
+    с ценами FakeBybit. Первые `drops` соединений сервер закрывает после
+    `drop_after` сообщений с данными."""
+
+    def __init__(self, every: float = 0.05, drop_after: int | None = None, drops: int = 1):
+        self.prices = FakeBybit()
+        self.every = every
+        self.drop_after, self.drops = drop_after, drops
+        self.connections = 0
+        self.subscriptions = []     # аргументы subscribe по соединениям
+        self.pings = 0
+        self._loop = self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        from websockets.asyncio.server import serve
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+
+        async def up():
+            self._server = await serve(self._session, "127.0.0.1", 0)
+        asyncio.run_coroutine_threadsafe(up(), self._loop).result()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.close()
+            asyncio.run_coroutine_threadsafe(self._server.wait_closed(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+
+    def message(self, topic: str, now: int) -> dict:
+        kind, _, rest = topic.partition(".")
+        if kind == "tickers":
+            last = float(self.prices.price(rest, now))
+            return {"topic": topic, "ts": now, "type": "snapshot",
+                    "data": {"symbol": rest, "lastPrice": f"{last:.2f}", "turnover24h": f"{last * 2e5:.2f}"}}
+        iv, _, symbol = rest.partition(".")
+        ms = candles.INTERVAL_MS[iv]
+        r = self.prices.candles(symbol, iv, now - now % ms, now)[-1]
+        k = {"start": int(r["start"]), "end": int(r["start"]) + ms - 1, "interval": iv, "confirm": False,
+             "timestamp": now} | {f: f"{r[f]:.4f}" for f in candles.FIELDS[1:]}
+        return {"topic": topic, "ts": now, "type": "snapshot", "data": [k]}
+
+    async def _session(self, ws):
+        import websockets
+        self.connections += 1
+        drop = self.drop_after if self.connections <= self.drops else None
+        args = []
+        self.subscriptions.append(args)
+
+        async def read():
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg.get("op") == "subscribe":
+                    args.extend(msg.get("args") or [])
+                    await ws.send(json.dumps({"success": True, "ret_msg": "", "op": "subscribe"}))
+                elif msg.get("op") == "ping":
+                    self.pings += 1
+                    await ws.send(json.dumps({"success": True, "ret_msg": "pong", "op": "ping"}))
+
+        reader = asyncio.create_task(read())
+        sent = 0
+        try:
+            while True:
+                await asyncio.sleep(self.every)
+                now = int(time.time() * 1000)
+                for topic in list(args):
+                    await ws.send(json.dumps(self.message(topic, now)))
+                    sent += 1
+                    if drop is not None and sent >= drop:
+                        await ws.close(1011, "fake drop")
+                        return
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            reader.cancel()
+
+# --------- GitHub ---------
+class FakeGitHub(_Server):
+    """Один репозиторий в памяти: raw (url/raw/...), contents API и Git Data API
+    (url/api/...). ETag raw/contents — blob SHA, If-None-Match -> 304."""
+
+    def __init__(self, repo: str = "bench/repo", branch: str = "main", **kw):
+        super().__init__(**kw)
+        self.repo, self.branch = repo, branch
+        self.blobs, self.trees, self.commits = {}, {}, {}
+        self.head = None
+        self.raw_cache = {}        # {path: bytes} — устаревший кэш raw: отдаётся вместо головы ветки
+        self.seed({})
+
+    @property
+    def raw_url(self) -> str:
+        return f"{self.url}/raw"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api"
+
+    # ---- содержимое ----
+    def _tree(self, files: dict) -> str:
+        sha = hashlib.sha1(json.dumps(sorted(files.items())).encode()).hexdigest()
+        self.trees[sha] = files
+        return sha
+
+    def _commit(self, tree: str, parents: list, message: str) -> str:
+        sha = hashlib.sha1(json.dumps([tree, parents, message, len(self.commits)]).encode()).hexdigest()
+        self.commits[sha] = {"tree": tree, "parents": parents, "message": message}
+        return sha
+
+    def seed(self, files: dict):
+        """Новая история из одного коммита: {path: bytes}."""
+        with self._lock:
+            paths = {}
+            for path, data in files.items():
+                sha = git_blob_sha(data)
+                self.blobs[sha] = data
+                paths[path] = sha
+            self.head = self._commit(self._tree(paths), [], "seed")
+
+    def files(self) -> dict:
+        """{path: blob sha} в голове ветки."""
+        return self.trees[self.commits[self.head]["tree"]]
+
+    def read(self, path: str) -> bytes | None:
+        sha = self.files().get(path)
+        return self.blobs.get(sha) if sha else None
+
+    def route(self, path: str) -> str:
+        parts = path.split("/")
+        if path.startswith("/raw/"):
+            return "raw"
+        if "/git/" in path:
+            return "git/" + path.split("/git/")[1].split("/")[0]
+        if "/contents/" in path or path.endswith("/contents"):
+            return "contents"
+        return "/".join(parts[:3])
+
+    # ---- HTTP ----
+    def handle(self, method, path, q, headers, body):
+        prefix_raw = f"/raw/{self.repo}/{self.branch}/"
+        prefix_api = f"/api/repos/{self.repo}/"
+        inm = (headers.get("If-None-Match") or "").strip('"')
+        if method == "GET" and path.startswith(prefix_raw):
+            rel = urllib.parse.unquote(path[len(prefix_raw):])
+            if rel in self.raw_cache:
+                return 200, {"Content-Type": "text/plain"}, self.raw_cache[rel]
+            sha = self.files().get(rel)
+            if sha is None:
+                return 404, {"Content-Type": "text/plain"}, b"404: Not Found"
+            if inm == sha:
+                return 304, {"ETag": f'"{sha}"'}, b""
+            return 200, {"ETag": f'"{sha}"', "Content-Type": "text/plain"}, self.blobs[sha]
+        if not path.startswith(prefix_api):
+            return _json({"message": "Not Found"}, 404)
+        rest = path[len(prefix_api):]
+        if rest.startswith("contents"):
+            raw = "vnd.github.raw" in (headers.get("Accept") or "")
+            return self._contents(urllib.parse.unquote(rest[len("contents"):]).strip("/"), inm, raw)
+        if method == "GET" and rest.startswith("git/trees/"):
+            return self._tree_listing(urllib.parse.unquote(rest[len("git/trees/"):]), q, inm)
+        if rest.startswith("git/"):
+            with self._lock:
+                return self._git(method, rest[4:], q, json.loads(body) if body else None)
+        return _json({"message": "Not Found"}, 404)
+
+    def _contents(self, rel: str, inm: str, raw: bool = False):
+        files = self.files()
+        if rel in files:
+            sha = files[rel]
+            if inm == sha:
+                return 304, {"ETag": f'"{sha}"'}, b""
+            data = self.blobs[sha]
+            if raw:
+                return 200, {"ETag": f'"{sha}"', "Content-Type": "application/vnd.github.raw"}, data
+            # как у GitHub: больше 1 МБ содержимое в JSON не отдаётся (encoding "none")
+            big = len(data) > CONTENTS_LIMIT
+            return _json({"type": "file", "name": rel.rsplit("/", 1)[-1], "path": rel, "sha": sha, "size": len(data),
+                          "encoding": "none" if big else "base64",
+                          "content": "" if big else base64.b64encode(data).decode()},
+                         headers={"ETag": f'"{sha}"'})
+        prefix = f"{rel}/" if rel else ""
+        items = {}
+        for p, sha in files.items():
+            if not p.startswith(prefix):
+                continue
+            name, sep, _ = p[len(prefix):].partition("/")
+            items[name] = {"type": "dir", "name": name, "sha": None} if sep else {"type": "file", "name": name, "sha": sha}
+        if not items:
+            return _json({"message": "Not Found"}, 404)
+        listing = sorted(items.values(), key=lambda it: it["name"])[:LISTING_LIMIT]
+        etag = hashlib.sha1(json.dumps(listing).encode()).hexdigest()
+        if inm == etag:
+            return 304, {"ETag": f'"{etag}"'}, b""
+        return _json(listing, headers={"ETag": f'"{etag}"'})
+
+    def _tree_listing(self, ref: str, q, inm: str):
+        """GET git/trees/<sha | ветка | ветка:папка>: без recursive — только прямые
+        потомки (пути относительно папки), с recursive — все файлы. Без лимита 1000."""
+        if ref in self.trees:
+            files, prefix = self.trees[ref], ""
+        else:
+            branch, _, rel = ref.partition(":")
+            if branch != self.branch:
+                return _json({"message": "Not Found"}, 404)
+            files, prefix = self.files(), f"{rel.strip('/')}/" if rel.strip("/") else ""
+        entries = {}
+        for p, sha in files.items():
+            if not p.startswith(prefix):
+                continue
+            name, sep, _ = p[len(prefix):].partition("/")
+            if q.get("recursive"):
+                entries[p[len(prefix):]] = {"path": p[len(prefix):], "type": "blob", "mode": "100644", "sha": sha}
+            elif sep:
+                entries[name] = {"path": name, "type": "tree", "mode": "040000", "sha": None}
+            else:
+                entries[name] = {"path": name, "type": "blob", "mode": "100644", "sha": sha}
+        if prefix and not entries:
+            return _json({"message": "Not Found"}, 404)
+        tree = sorted(entries.values(), key=lambda e: e["path"])
+        etag = hashlib.sha1(json.dumps(tree).encode()).hexdigest()
+        if inm == etag:
+            return 304, {"ETag": f'"{etag}"'}, b""
+        return _json({"truncated": False, "tree": tree}, headers={"ETag": f'"{etag}"'})
+
+    def _git(self, method, rest, q, j):
+        if method == "GET" and rest == f"ref/heads/{self.branch}":
+            return _json({"object": {"sha": self.head, "type": "commit"}})
+        if method == "GET" and rest.startswith("commits/"):
+            c = self.commits.get(rest.split("/")[1])
+            return _json({"sha": rest.split("/")[1], "tree": {"sha": c["tree"]}}) if c else _json({}, 404)
+        if method == "POST" and rest == "blobs":
+            data = base64.b64decode(j["content"]) if j.get("encoding") == "base64" else j["content"].encode()
+            sha = git_blob_sha(data)
+            self.blobs[sha] = data
+            return _json({"sha": sha}, 201)
+        if method == "POST" and rest == "trees":
+            files = dict(self.trees.get(j.get("base_tree"), {}))
+            for e in j["tree"]:
+                if "content" in e:
+                    data = e["content"].encode()
+                    sha = git_blob_sha(data)
+                    self.blobs[sha] = data
+                else:
+                    sha = e["sha"]
+                files[e["path"]] = sha
+            return _json({"sha": self._tree(files)}, 201)
+        if method == "POST" and rest == "commits":
+            return _json({"sha": self._commit(j["tree"], j["parents"], j["message"])}, 201)
+        if method == "PATCH" and rest == f"refs/heads/{self.branch}":
+            if self.commits.get(j["sha"], {}).get("parents") != [self.head] and not j.get("force"):
+                return _json({"message": "Update is not a fast forward"}, 422)
+            self.head = j["sha"]
+            return _json({"object": {"sha": self.head}})
+        return _json({"message": "Not Found"}, 404)
+
+    def commit_files(self, files: dict, message: str = "bench"):
+        """Коммит поверх головы ветки: {path: bytes} (как будто main.py снял новый день)."""
+        with self._lock:
+            paths = dict(self.files())
+            for path, data in files.items():
+                sha = git_blob_sha(data)
+                self.blobs[sha] = data
+                paths[path] = sha
+            self.head = self._commit(self._tree(paths), [self.head], message)
+
+# --------- Синтетическая история снапшотов ---------
+def snapshot_pair(day, bybit: FakeBybit | None = None) -> dict:
+    """forecast и review за день day (datetime.date) в формате main.py:
+    {"YYYY-MM-DD_forecast.json": dict, "YYYY-MM-DD_review.json": dict}."""
+    from datetime import datetime, timezone
+    bybit = bybit or FakeBybit()
+    t0 = int(datetime(day.year, day.month, day.day, 8, tzinfo=timezone.utc).timestamp() * 1000)
+    eth, btc = float(bybit.price("ETHUSDT", t0)), float(bybit.price("BTCUSDT", t0))
+    sess = bybit.candles("ETHUSDT", "5", t0 - 8 * 3600_000, t0 + 12 * 3600_000)
+    hi, lo, close = float(sess["high"].max()), float(sess["low"].min()), float(sess["close"][-1])
+    btc_close = float(bybit.price("BTCUSDT", t0 + 12 * 3600_000))
+    step = round(eth * 0.01, 1)
+    support, resistance = [round(eth - step, 1), round(eth - 2 * step, 1)], [round(eth + step, 1), round(eth + 2 * step, 1)]
+    cross = "bullish" if int(t0 // 86400_000) % 3 else "bearish"
+    ts, tr = lo <= support[0], hi >= resistance[0]
+    d = day.isoformat()
+    forecast = {
+        "timestamp_utc": f"{d}T08:00:00", "mode": "forecast", "eth_spot": round(eth, 2), "btc_spot": round(btc, 1),
+        "calc": {"atr_1d": round(eth * 0.03, 2), "vwap_today": round(eth, 2), "orderbook_imbalance_pct": -1.8,
+                 "rsi_1h": 50.0, "rsi_4h": 50.0, "ema_20_1h": round(eth, 2), "ema_50_1h": round(eth, 2),
+                 "ema_200_1h": round(eth * 0.99, 2), "ema_cross": cross, "macd_hist_1h": 0.1},
+        "derivs": {"funding_eth_pct": 0.01, "funding_btc_pct": 0.01, "oi_eth": 1.2e9, "oi_btc": 8.1e9,
+                   "oi_change_24h_pct": 1.0, "taker_buy_sell_ratio": 1.0,
+                   "liquidations_buy_24h_usd": None, "liquidations_sell_24h_usd": None},
+        "levels": {"support": support, "resistance": resistance, "range_mid": round(eth, 1)},
+    }
+    review = {
+        "timestamp_utc": f"{d}T20:00:00", "mode": "review",
+        "actual": {"high": round(hi, 2), "low": round(lo, 2), "close": round(close, 2),
+                   "vwap_approx": round(float(sess["turnover"].sum() / sess["volume"].sum()), 2),
+                   "volume_base_sum": float(sess["volume"].sum()), "turnover_quote_sum": float(sess["turnover"].sum()),
+                   "btc_close": round(btc_close, 2)},
+        "compare": {"levels_forecast": forecast["levels"], "touched_support": bool(ts), "touched_resistance": bool(tr),
+                    "inside_range": bool(support[1] <= close <= resistance[1]),
+                    "bias": "bullish" if tr and not ts else ("bearish" if ts and not tr else "range")},
+        "forecast_ref": {"eth_spot_at_forecast": forecast["eth_spot"], "btc_spot_at_forecast": forecast["btc_spot"],
+                         "calc_at_forecast": forecast["calc"]},
+    }
+    return {f"{d}_forecast.json": forecast, f"{d}_review.json": review}
+
+def snapshot_history(days: int, end=None) -> dict:
+    """{имя: bytes} за `days` дней, оканчивающихся end (по умолчанию — вчера)."""
+    from datetime import date, timedelta
+    end = end or date.today() - timedelta(days=1)
+    bybit = FakeBybit()
+    out = {}
+    for i in range(days):
+        for name, obj in snapshot_pair(end - timedelta(days=days - 1 - i), bybit).items():
+            out[name] = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return out
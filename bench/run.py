@@ -0,0 +1,303 @@
+# bench/run.py — сквозные замеры на локальных заглушках Bybit и GitHub
+#
+# Каждый случай (сценарий × длина истории) идёт в отдельном процессе: модули
+# читают ENV при импорте, и кэши/метрики одного прогона не должны влиять на
+# другой. Сценарии:
+#   snapshot — build_forecast_snapshot / build_review_snapshot, в хранилище
+#              свечей уже лежит история за N дней (5m — не больше 365 дней)
+#   parser   — parser.main с нуля, после одного нового дня и без изменений
+#   proxy    — время старта с построением индекса /summary и пропускная
+#              способность эндпоинтов под нагрузкой (uvicorn в своём процессе)
+#   backtest — backtest.py по N дням прогнозов и 1m-свечам (не больше 730 дней),
+#              5 допусков, в одном процессе и пулом из 2
+#
+#   python -m bench.run                                  # всё, истории 10,100,1000 дней
+#   python -m bench.run parser --days 10,100,1000,10000
+#   python -m bench.run snapshot --latency 0.05 --error-rate 0.02
+#   python -m bench.run proxy --source github --concurrency 50 --duration 5
+#
+# Гейт для изменений производительности:
+#   python -m bench.run --save base.json                 # до изменения
+#   python -m bench.run --compare base.json --tolerance 0.25   # после; код 1 при регрессии
+
+import os, sys, json, time, argparse, subprocess, tempfile, shutil
+
+SCENARIOS = ("snapshot", "parser", "proxy", "backtest")
+M5_MAX_DAYS = 365
+M1_MAX_DAYS = 730
+
+def _env(**kw):
+    os.environ.update({k: str(v) for k, v in kw.items()})
+
+def _calls(server) -> int:
+    return sum(server.calls.values())
+
+# --------- Сценарии (выполняются в дочернем процессе) ---------
+def case_snapshot(days: int, latency: float, error_rate: float, **_) -> list:
+    tmp = tempfile.mkdtemp(prefix="bench-snap-")
+    _env(KLINE_DIR=f"{tmp}/klines", SNAPSHOT_DIR=f"{tmp}/snapshots", SNAPSHOT_REMOTE="none")
+    from bench import fakes
+    bybit = fakes.FakeBybit(latency=latency, error_rate=error_rate).start()
+    _env(BYBIT_API=bybit.url)
+    import candles, main
+
+    now = int(time.time() * 1000)
+    day = 1440 * candles.MINUTE
+    for sym in ("ETHUSDT", "BTCUSDT"):
+        for iv in ("60", "240", "D", "5"):
+            span = min(days, M5_MAX_DAYS) if iv == "5" else days
+            recs = bybit.candles(sym, iv, now - span * day, now)
+            main.CANDLES._write(sym, iv, recs[recs["start"] + candles.INTERVAL_MS[iv] <= now], "wb")
+
+    out = []
+    for label, build in (("forecast", main.build_forecast_snapshot),
+                         ("review", lambda: main.build_review_snapshot(forecast))):
+        c0 = _calls(bybit)
+        t = time.perf_counter()
+        result = build()
+        dt = time.perf_counter() - t
+        if label == "forecast":
+            forecast = result
+        out.append({"case": f"snapshot/{label}", "days": days, "seconds": dt,
+                    "requests": _calls(bybit) - c0, "errors_injected": bybit.errors})
+    bybit.stop()
+    shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+def case_parser(days: int, latency: float, error_rate: float, **_) -> list:
+    tmp = tempfile.mkdtemp(prefix="bench-parser-")
+    _env(SNAPSHOT_DIR=f"{tmp}/snapshots", SNAPSHOT_REMOTE="github", GITHUB_TOKEN="bench",
+         GITHUB_REPO="bench/repo", GITHUB_PATH="snapshots")
+    from datetime import date, timedelta
+    from bench import fakes
+    gh = fakes.FakeGitHub(latency=latency, error_rate=error_rate).start()
+    end = date.today() - timedelta(days=1)
+    gh.seed({f"snapshots/{n}": b for n, b in fakes.snapshot_history(days, end).items()})
+    _env(GITHUB_API=gh.api_url, GITHUB_RAW=gh.raw_url)
+    import parser
+
+    def run(label):
+        c0 = _calls(gh)
+        t = time.perf_counter()
+        parser.main()
+        return {"case": f"parser/{label}", "days": days, "seconds": time.perf_counter() - t,
+                "requests": _calls(gh) - c0}
+
+    out = [run("cold")]
+    today = fakes.snapshot_history(1, end + timedelta(days=1))
+    gh.commit_files({f"snapshots/{n}": b for n, b in today.items()})
+    out.append(run("one_new_day"))
+    out.append(run("unchanged"))
+    gh.stop()
+    shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+def case_proxy(days: int, latency: float, error_rate: float, concurrency: int, duration: float,
+               source: str, **_) -> list:
+    import asyncio, socket, random
+    tmp = tempfile.mkdtemp(prefix="bench-proxy-")
+    _env(SNAPSHOT_DIR=f"{tmp}/snapshots", SUMMARY_REFRESH=3600, HTTP_POOL=max(20, concurrency),
+         SNAPSHOT_REMOTE="none" if source == "local" else "github",
+         GITHUB_REPO="bench/repo", GITHUB_PATH="snapshots")
+    from datetime import date, timedelta
+    from bench import fakes
+    end = date.today() - timedelta(days=1)
+    history = fakes.snapshot_history(days, end)
+    gh = None
+    if source == "local":
+        os.makedirs(f"{tmp}/snapshots")
+        for name, data in history.items():
+            with open(f"{tmp}/snapshots/{name}", "wb") as f:
+                f.write(data)
+    else:
+        gh = fakes.FakeGitHub(latency=latency, error_rate=error_rate).start()
+        gh.seed({f"snapshots/{n}": b for n, b in history.items()})
+        _env(GITHUB_API=gh.api_url, GITHUB_RAW=gh.raw_url)
+    import httpx
+
+    # прокси — отдельным процессом: генератор нагрузки не делит с ним GIL
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    t_start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "proxy:app", "--host", "127.0.0.1",
+                               "--port", str(port), "--log-level", "warning"], cwd=root, env=os.environ.copy(),
+                              stdout=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+
+    out = []
+    with httpx.Client(base_url=base, timeout=60) as c:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError("proxy exited on startup")
+            try:
+                if c.get("/healthz").json()["summary"]["days"] >= days:
+                    break
+            except httpx.TransportError:
+                pass
+            time.sleep(0.02)
+    # запуск интерпретатора + импорт + построение индекса /summary
+    out.append({"case": f"proxy/{source}/startup_summary", "days": days, "seconds": time.perf_counter() - t_start})
+
+    dates = [(end - timedelta(days=i)).isoformat() for i in range(days)]
+    rnd = random.Random(1)
+    endpoints = {
+        "snapshot": lambda: f"/snapshot?date={rnd.choice(dates)}&type=forecast",
+        "snapshot_fields": lambda: f"/snapshot?date={rnd.choice(dates)}&type=forecast&fields=eth_spot,levels",
+        "summary_stats": lambda: "/summary/stats?days=30",
+        "summary_csv": lambda: "/summary?format=csv",
+        "rolling": lambda: "/summary/rolling?window=30&format=csv",
+        "range30": lambda: f"/snapshots?from={dates[min(29, days - 1)]}&to={dates[0]}&type=review&fields=compare.bias",
+    }
+
+    async def load(make_url):
+        lat, errors = [], 0
+        stop_at = time.perf_counter() + duration
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as client:
+            async def worker():
+                nonlocal errors
+                while time.perf_counter() < stop_at:
+                    t = time.perf_counter()
+                    try:
+                        r = await client.get(make_url())
+                        ok = r.status_code < 400
+                    except httpx.HTTPError:
+                        ok = False
+                    lat.append(time.perf_counter() - t)
+                    errors += not ok
+            t0 = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return lat, errors, time.perf_counter() - t0
+
+    for name, make_url in endpoints.items():
+        lat, errors, wall = asyncio.run(load(make_url))
+        lat.sort()
+        out.append({"case": f"proxy/{source}/{name}", "days": days, "rps": len(lat) / wall,
+                    "p50_ms": lat[len(lat) // 2] * 1000, "p99_ms": lat[int(len(lat) * 0.99)] * 1000,
+                    "errors": errors, "concurrency": concurrency})
+    server.terminate()
+    server.wait()
+    if gh is not None:
+        gh.stop()
+    shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+def case_backtest(days: int, **_) -> list:
+    tmp = tempfile.mkdtemp(prefix="bench-backtest-")
+    _env(KLINE_DIR=f"{tmp}/klines", SNAPSHOT_DIR=f"{tmp}/snapshots")
+    from datetime import date, timedelta
+    from bench import fakes
+    import candles, backtest
+    end = date.today() - timedelta(days=1)
+    os.makedirs(f"{tmp}/snapshots")
+    for name, data in fakes.snapshot_history(days, end).items():
+        with open(f"{tmp}/snapshots/{name}", "wb") as f:
+            f.write(data)
+    now = int(time.time() * 1000)
+    span = min(days, M1_MAX_DAYS) + 1
+    recs = fakes.FakeBybit().candles("ETHUSDT", "1", now - span * 1440 * candles.MINUTE, now - candles.MINUTE)
+    candles.CandleStore(fetch=None)._write("ETHUSDT", "1", recs, "wb")
+
+    tols = [0.0, 0.0005, 0.001, 0.0025, 0.005]
+    out = []
+    t = time.perf_counter()
+    fc = backtest.load_forecasts()
+    _, m1 = backtest.load_candles("ETHUSDT", "1")
+    out.append({"case": "backtest/load", "days": days, "seconds": time.perf_counter() - t})
+    for label, workers in (("evaluate", 1), ("evaluate_pool2", 2)):
+        t = time.perf_counter()
+        backtest.summarize(fc, backtest.run(fc, m1, tols, workers=workers), tols)
+        out.append({"case": f"backtest/{label}", "days": days, "seconds": time.perf_counter() - t})
+    shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+CASES = {"snapshot": case_snapshot, "parser": case_parser, "proxy": case_proxy, "backtest": case_backtest}
+
+# --------- Оркестровка ---------
+def run_case(scenario: str, opts: dict) -> list:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    p = subprocess.run([sys.executable, "-m", "bench.run", "_case", scenario, json.dumps(opts)],
+                       cwd=root, capture_output=True, text=True)
+    if p.returncode != 0:
+        # упавший прогон — тоже результат (например, при --error-rate); идём дальше
+        err = (p.stderr.strip().splitlines() or ["?"])[-1]
+        return [{"case": f"{scenario}/FAILED", "days": opts["days"], "error": err}]
+    return json.loads(p.stdout.strip().splitlines()[-1])
+
+def fmt_row(r: dict) -> str:
+    if "error" in r:
+        return f"{r['case']:<34} {r['days']:>6}d  {r['error']}"
+    if "rps" in r:
+        return (f"{r['case']:<34} {r['days']:>6}d  {r['rps']:>9.0f} req/s  p50 {r['p50_ms']:7.1f} ms"
+                f"  p99 {r['p99_ms']:7.1f} ms  errors {r['errors']}")
+    extra = f"  {r['requests']} requests" if "requests" in r else ""
+    return f"{r['case']:<34} {r['days']:>6}d  {r['seconds']*1000:>9.1f} ms{extra}"
+
+def key(r: dict) -> str:
+    return f"{r['case']}@{r['days']}"
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """Регрессии: время выросло или пропускная способность упала больше, чем на
+    tolerance; упавший прогон — регрессия для всех его замеров из baseline."""
+    base = {key(r): r for r in baseline}
+    ran = {(r["case"].split("/")[0], r["days"]) for r in results}
+    got = {key(r) for r in results}
+    bad = [f"{k}: missing ({'failed' if any('error' in r for r in results) else 'not measured'})"
+           for k, b in base.items() if (b["case"].split("/")[0], b["days"]) in ran and k not in got]
+    for r in results:
+        b = base.get(key(r))
+        if b is None or "error" in r or "error" in b:
+            continue
+        if "seconds" in r and r["seconds"] > b["seconds"] * (1 + tolerance):
+            bad.append(f"{key(r)}: {b['seconds']*1000:.1f} -> {r['seconds']*1000:.1f} ms")
+        if "rps" in r and r["rps"] < b["rps"] * (1 - tolerance):
+            bad.append(f"{key(r)}: {b['rps']:.0f} -> {r['rps']:.0f} req/s")
+    return bad
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["_case"]:
+        print(json.dumps(CASES[argv[1]](**json.loads(argv[2]))))
+        return 0
+
+    ap = argparse.ArgumentParser(prog="python -m bench.run", description="Замеры на заглушках Bybit/GitHub")
+    ap.add_argument("scenarios", nargs="*", metavar="scenario",
+                    help=f"{' | '.join(SCENARIOS)} (по умолчанию все)")
+    ap.add_argument("--days", default="10,100,1000", help="длины истории через запятую")
+    ap.add_argument("--latency", type=float, default=0.0, help="задержка заглушек на запрос, с")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 503 от заглушек")
+    ap.add_argument("--concurrency", type=int, default=8, help="proxy: одновременных клиентов")
+    ap.add_argument("--duration", type=float, default=3.0, help="proxy: секунд на эндпоинт")
+    ap.add_argument("--source", choices=("local", "github"), default="local", help="proxy: откуда снапшоты")
+    ap.add_argument("--save", help="записать результаты в JSON")
+    ap.add_argument("--compare", help="сравнить с сохранёнными результатами")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="допустимое ухудшение для --compare")
+    args = ap.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        ap.error(f"unknown scenario: {', '.join(sorted(unknown))}")
+
+    opts = {"latency": args.latency, "error_rate": args.error_rate, "concurrency": args.concurrency,
+            "duration": args.duration, "source": args.source}
+    results = []
+    for scenario in args.scenarios or SCENARIOS:
+        for days in (int(d) for d in args.days.split(",") if d.strip()):
+            for r in run_case(scenario, opts | {"days": days}):
+                print(fmt_row(r), flush=True)
+                results.append(r)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            bad = compare(results, json.load(f), args.tolerance)
+        for line in bad:
+            print(f"REGRESSION {line}")
+        return 1 if bad else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
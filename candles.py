@@ -0,0 +1,225 @@
+# candles.py — локальное хранилище свечей Bybit по (symbol, interval)
+#
+# Файл <KLINE_DIR>/<SYMBOL>_<interval>.bin — записи фиксированного типа DTYPE
+# по возрастанию start, только дозапись в конец. Читается через np.memmap.
+# Храним только закрытые свечи; текущая (незакрытая) свеча живёт в памяти
+# до следующей синхронизации. При каждом запуске докачивается только хвост
+# с последней сохранённой свечи, окнами по 1000 свечей (лимит Bybit); окна
+# качаются параллельно под общим ограничителем частоты запросов.
+# ENV: KLINE_DIR (по умолчанию .cache/klines рядом с этим файлом)
+#      KLINE_WORKERS (по умолчанию 8), KLINE_RPS (по умолчанию 20 запросов/с)
+#
+# Заполнить историю заранее (например, месяцы 1m для бэктеста):
+#   python candles.py ETHUSDT 1 2025-10-01 2025-12-01
+
+import os, time, threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+KLINE_DIR = os.environ.get("KLINE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "klines")
+
+DTYPE = np.dtype([
+    ("start", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+    ("close", "<f8"), ("volume", "<f8"), ("turnover", "<f8"),
+])
+FIELDS = DTYPE.names
+
+MINUTE = 60_000
+INTERVAL_MS = {
+    "1": MINUTE, "3": 3*MINUTE, "5": 5*MINUTE, "15": 15*MINUTE, "30": 30*MINUTE,
+    "60": 60*MINUTE, "120": 120*MINUTE, "240": 240*MINUTE, "360": 360*MINUTE, "720": 720*MINUTE,
+    "D": 1440*MINUTE,
+}
+PAGE = 1000   # макс. свечей за один запрос /v5/market/kline
+WORKERS = max(1, int(os.environ.get("KLINE_WORKERS", "8")))
+RPS = float(os.environ.get("KLINE_RPS", "20"))
+
+def to_records(rows) -> np.ndarray:
+    """Свечи Bybit [start, open, high, low, close, volume, turnover] в любом порядке
+    -> массив DTYPE по возрастанию start без дублей."""
+    if len(rows) == 0:
+        return np.empty(0, dtype=DTYPE)
+    a = np.asarray(rows, dtype=np.float64)[:, :7]
+    out = np.empty(len(a), dtype=DTYPE)
+    out["start"] = a[:, 0].astype(np.int64)
+    for i, name in enumerate(FIELDS[1:], start=1):
+        out[name] = a[:, i]
+    return dedupe(out)
+
+def dedupe(recs: np.ndarray) -> np.ndarray:
+    """Сортировка по start; из дублей остаётся первый."""
+    _, idx = np.unique(recs["start"], return_index=True)
+    return recs[idx]
+
+def as_arrays(recs: np.ndarray) -> dict:
+    """Колонки записей: {"start", "open", ..., "turnover"} -> массивы (вход indicators)."""
+    return {name: recs[name] for name in FIELDS}
+
+def windows(start_ms: int, end_ms: int, interval: str):
+    """[start, end] -> окна по PAGE свечей: [(w_start, w_end), ...]."""
+    step = PAGE * INTERVAL_MS[interval]
+    return [(w, min(w + step - 1, end_ms)) for w in range(start_ms, end_ms + 1, step)]
+
+class RateLimiter:
+    """Token bucket: в среднем `rate` запросов в секунду, всплеск до `burst`."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def backfill(fetch, symbol: str, interval: str, start_ms: int, end_ms: int,
+             workers: int = WORKERS, limiter: RateLimiter | None = None) -> np.ndarray:
+    """Свечи с start в [start_ms, end_ms): окна по PAGE качаются параллельно,
+    перекрытия убираются, результат — один непрерывный массив по возрастанию."""
+    ws = windows(start_ms, end_ms - 1, interval)
+    if not ws:
+        return np.empty(0, dtype=DTYPE)
+
+    def one(w):
+        if limiter is not None:
+            limiter.acquire()
+        return to_records(fetch(symbol, interval, *w))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ws)))) as pool:
+        parts = list(pool.map(one, ws))
+    recs = dedupe(np.concatenate(parts))
+    return np.ascontiguousarray(recs[(recs["start"] >= start_ms) & (recs["start"] < end_ms)])
+
+class CandleStore:
+    """fetch(symbol, interval, start_ms, end_ms) -> список свечей Bybit (не больше PAGE)."""
+
+    def __init__(self, fetch, root: str = KLINE_DIR, workers: int = WORKERS, rps: float = RPS):
+        self.fetch = fetch
+        self.root = root
+        self.workers = workers
+        self.limiter = RateLimiter(rps)   # общий на все (symbol, interval) этого хранилища
+        self._open = {}    # (symbol, interval) -> незакрытая свеча (DTYPE, 1 запись)
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, f"{symbol}_{interval}.bin")
+
+    def _lock(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def load(self, symbol: str, interval: str) -> np.ndarray:
+        """Сохранённые свечи через memmap (хвост от оборванной записи игнорируется)."""
+        path = self.path(symbol, interval)
+        try:
+            n = os.path.getsize(path) // DTYPE.itemsize
+        except FileNotFoundError:
+            n = 0
+        if n == 0:
+            return np.empty(0, dtype=DTYPE)
+        return np.memmap(path, dtype=DTYPE, mode="r", shape=(n,))
+
+    def _write(self, symbol: str, interval: str, recs: np.ndarray, mode: str):
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(symbol, interval)
+        if mode == "ab":
+            n = os.path.getsize(path) // DTYPE.itemsize if os.path.exists(path) else 0
+            with open(path, "r+b" if n else "wb") as f:
+                f.truncate(n * DTYPE.itemsize)   # срезаем недописанную запись, если была
+                f.seek(0, os.SEEK_END)
+                f.write(recs.tobytes())
+            return
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(recs.tobytes())
+        os.replace(tmp, path)
+
+    def _fetch_range(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> np.ndarray:
+        """[start_ms, end_ms] включительно."""
+        return backfill(self.fetch, symbol, interval, start_ms, end_ms + 1, self.workers, self.limiter)
+
+    def sync(self, symbol: str, interval: str, start_ms: int, end_ms: int, now_ms: int):
+        """Докачивает недостающее в [start_ms, end_ms]: хвост после последней
+        сохранённой свечи и, если нужно, начало до первой."""
+        iv = INTERVAL_MS[interval]
+        start_ms -= start_ms % iv
+        with self._lock((symbol, interval)):
+            have = self.load(symbol, interval)
+            if len(have) and start_ms < int(have["start"][0]):
+                # просят историю раньше сохранённой — редкий случай, переписываем файл
+                head = self._fetch_range(symbol, interval, start_ms, int(have["start"][0]) - 1)
+                merged = np.concatenate([head[head["start"] < have["start"][0]], np.asarray(have)])
+                del have
+                self._write(symbol, interval, merged, "wb")
+                have = self.load(symbol, interval)
+            tail_from = int(have["start"][-1]) + iv if len(have) else start_ms
+            if tail_from > end_ms:
+                return
+            new = self._fetch_range(symbol, interval, tail_from, end_ms)
+            new = new[new["start"] >= tail_from]
+            closed = new["start"] + iv <= now_ms
+            if closed.any():
+                self._write(symbol, interval, new[closed], "ab")
+            self._open[(symbol, interval)] = new[~closed][-1:]
+
+    def append_closed(self, symbol: str, interval: str, row) -> bool:
+        """Дописывает закрытую свечу из живого фида, если она продолжает файл
+        без дыры; иначе пропуск закроет следующий sync."""
+        rec = np.array([tuple(row)], dtype=DTYPE)
+        with self._lock((symbol, interval)):
+            have = self.load(symbol, interval)
+            if not len(have) or int(rec["start"][0]) != int(have["start"][-1]) + INTERVAL_MS[interval]:
+                return False
+            del have
+            self._write(symbol, interval, rec, "ab")
+            return True
+
+    def range(self, symbol: str, interval: str, start_ms: int, end_ms: int, now_ms: int,
+              include_open: bool = True, sync: bool = True) -> np.ndarray:
+        """Свечи с start в [start_ms, end_ms] по возрастанию (после sync;
+        sync=False — только то, что уже лежит локально)."""
+        if sync:
+            self.sync(symbol, interval, start_ms, end_ms, now_ms)
+        recs = self.load(symbol, interval)
+        i = np.searchsorted(recs["start"], start_ms - start_ms % INTERVAL_MS[interval], side="left")
+        j = np.searchsorted(recs["start"], end_ms, side="right")
+        out = np.asarray(recs[i:j])
+        opened = self._open.get((symbol, interval))
+        if include_open and opened is not None and len(opened) and start_ms <= opened["start"][0] <= end_ms:
+            out = np.concatenate([out, opened])
+        return out
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import datetime, timezone
+    import main   # fetch_kline_window и общая HTTP-сессия
+
+    ap = argparse.ArgumentParser(description="Докачать историю свечей в локальное хранилище")
+    ap.add_argument("symbol")
+    ap.add_argument("interval", choices=list(INTERVAL_MS))
+    ap.add_argument("start", help="YYYY-MM-DD (UTC)")
+    ap.add_argument("end", nargs="?", help="YYYY-MM-DD (UTC), по умолчанию — сейчас")
+    args = ap.parse_args()
+
+    def ms(d):
+        return int(datetime.fromisoformat(d).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+    now_ms = int(time.time() * 1000)
+    end_ms = min(ms(args.end), now_ms) if args.end else now_ms
+    t = time.perf_counter()
+    main.CANDLES.sync(args.symbol.upper(), args.interval, ms(args.start), end_ms, now_ms)
+    have = main.CANDLES.load(args.symbol.upper(), args.interval)
+    print(f"{args.symbol.upper()} {args.interval}: {len(have)} candles stored, {time.perf_counter() - t:.1f}s")
@@ -0,0 +1,100 @@
+# history.py — колоночная история числовых полей снапшотов (analytics/history.npy)
+#
+# Один структурированный массив NumPy: строка — дата, колонка — поле
+# forecast (префикс f_) или review (префикс r_), пропуски — NaN.
+# Формат .npy читается через np.load(path, mmap_mode="r") без разбора JSON:
+#
+#   h = history.load("analytics/history.npy")
+#   year = history.window(h, "2025-01-01", "2025-12-31")
+#   miss = year["r_actual_high"] - year["f_levels_resistance_0"]
+
+import io, os, math
+import numpy as np
+
+FORECAST_PATHS = [
+    ("eth_spot",), ("btc_spot",),
+    ("calc","atr_1d"), ("calc","vwap_today"), ("calc","orderbook_imbalance_pct"),
+    ("calc","rsi_1h"), ("calc","rsi_4h"),
+    ("calc","ema_20_1h"), ("calc","ema_50_1h"), ("calc","ema_200_1h"), ("calc","macd_hist_1h"),
+    ("derivs","funding_eth_pct"), ("derivs","funding_btc_pct"),
+    ("derivs","oi_eth"), ("derivs","oi_btc"), ("derivs","oi_change_24h_pct"),
+    ("derivs","taker_buy_sell_ratio"),
+    ("derivs","liquidations_buy_24h_usd"), ("derivs","liquidations_sell_24h_usd"),
+    ("levels","support",0), ("levels","support",1),
+    ("levels","resistance",0), ("levels","resistance",1),
+    ("levels","range_mid"),
+]
+REVIEW_PATHS = [
+    ("actual","high"), ("actual","low"), ("actual","close"), ("actual","vwap_approx"),
+    ("actual","volume_base_sum"), ("actual","turnover_quote_sum"),
+    ("compare","touched_support"), ("compare","touched_resistance"), ("compare","inside_range"),
+]
+PATHS = {"forecast": FORECAST_PATHS, "review": REVIEW_PATHS}
+
+def column_name(mode: str, path) -> str:
+    return f"{mode[0]}_" + "_".join(str(p) for p in path)
+
+COLUMNS = [column_name(m, p) for m, paths in PATHS.items() for p in paths]
+DTYPE = np.dtype([("date", "datetime64[D]")] + [(c, "f8") for c in COLUMNS])
+
+def number(v) -> float | None:
+    """Число из поля снапшота; None — нет или не число. Спот старых снапшотов —
+    {"last": ...}, флаги — bool (0/1)."""
+    if isinstance(v, dict):
+        v = v.get("last")
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return None
+    return v if math.isfinite(v) else None
+
+def json_number(v, digits: int = 6) -> float | None:
+    """float для ответа JSON: округлён, NaN/inf -> null."""
+    v = float(v)
+    return round(v, digits) if math.isfinite(v) else None
+
+def numeric_fields(data: dict, mode: str) -> dict:
+    """{колонка: число или None} для одного снапшота (None — поля нет)."""
+    out = {}
+    for path in PATHS.get(mode, []):
+        cur = data
+        for p in path:
+            try:
+                cur = cur[p]
+            except (KeyError, IndexError, TypeError):
+                cur = None
+                break
+        out[column_name(mode, path)] = number(cur)
+    return out
+
+def build(rows: dict) -> np.ndarray:
+    """rows: {"YYYY-MM-DD": {колонка: число}} -> массив DTYPE, отсортированный по дате."""
+    dates = sorted(rows)
+    arr = np.full(len(dates), np.nan, dtype=DTYPE)
+    arr["date"] = np.array(dates, dtype="datetime64[D]")
+    for i, d in enumerate(dates):
+        for col, v in rows[d].items():
+            if v is not None and col in DTYPE.names:
+                arr[col][i] = v
+    return arr
+
+def to_bytes(arr: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    np.save(buf, arr, allow_pickle=False)
+    return buf.getvalue()
+
+def save(path: str, arr: np.ndarray):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(to_bytes(arr))
+    os.replace(tmp, path)
+
+def load(path: str, mmap: bool = True) -> np.ndarray:
+    return np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+
+def window(arr: np.ndarray, start: str, end: str) -> np.ndarray:
+    """Строки с датой в [start, end] — бинарный поиск по отсортированному индексу."""
+    dates = arr["date"]
+    i = np.searchsorted(dates, np.datetime64(start, "D"), side="left")
+    j = np.searchsorted(dates, np.datetime64(end, "D"), side="right")
+    return arr[i:j]
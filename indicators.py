@@ -0,0 +1,210 @@
+# indicators.py — индикаторы по массивам свечей (NumPy)
+#
+# EMA, Wilder RSI, MACD, ATR, VWAP, пивоты. Рекурсия y[t] = b*y[t-1] + a*x[t]
+# считается векторно по блокам (см. _ewm), без цикла по свечам.
+#
+# Проверка против наивных реализаций (код выхода 1 при расхождении) и замер скорости:
+#   python indicators.py
+
+import math
+import numpy as np
+
+# --------- Сглаживание ---------
+def _ewm(x: np.ndarray, alpha: float, y0: float) -> np.ndarray:
+    """y[k] = (1-alpha)*y[k-1] + alpha*x[k], y[-1] = y0.
+
+    Развёрнуто: y[k] = b^k * (y0 + alpha * sum_{j<=k} x[j] / b^j), b = 1-alpha.
+    Считаем блоками, в которых b^-k не превышает 1e8, — так точность float64
+    не теряется на длинных рядах."""
+    x = np.asarray(x, dtype=np.float64)
+    beta = 1.0 - alpha
+    if beta <= 0.0:
+        return x.copy()
+    out = np.empty_like(x)
+    block = max(1, int(math.log(1e8) / -math.log(beta)))
+    prev = y0
+    for i in range(0, len(x), block):
+        xb = x[i:i + block]
+        pw = beta ** np.arange(1, len(xb) + 1)
+        out[i:i + len(xb)] = pw * (prev + alpha * np.cumsum(xb / pw))
+        prev = out[i + len(xb) - 1]
+    return out
+
+def _seeded(x: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """Первое значение — SMA(period), дальше рекурсия; до него NaN."""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if len(x) < period or period < 1:
+        return out
+    seed = x[:period].mean()
+    out[period - 1] = seed
+    out[period:] = _ewm(x[period:], alpha, seed)
+    return out
+
+def ema(x, period: int) -> np.ndarray:
+    return _seeded(x, period, 2.0 / (period + 1))
+
+def wilder(x, period: int) -> np.ndarray:
+    return _seeded(x, period, 1.0 / period)
+
+# --------- Индикаторы ---------
+def rsi(close, period: int = 14) -> np.ndarray:
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+    d = np.diff(close)
+    avg_gain = wilder(np.clip(d, 0, None), period)
+    avg_loss = wilder(np.clip(-d, 0, None), period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    r = np.where(avg_loss == 0, 100.0, r)
+    out[1:] = np.where(np.isnan(avg_gain), np.nan, r)
+    return out
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9):
+    """(линия, сигнальная, гистограмма)."""
+    line = ema(close, fast) - ema(close, slow)
+    sig = np.full(len(line), np.nan)
+    valid = np.flatnonzero(~np.isnan(line))
+    if len(valid):
+        sig[valid[0]:] = ema(line[valid[0]:], signal)
+    return line, sig, line - sig
+
+def true_range(high, low, close) -> np.ndarray:
+    high, low, close = (np.asarray(v, dtype=np.float64) for v in (high, low, close))
+    tr = high - low
+    if len(close) > 1:
+        prev = close[:-1]
+        tr[1:] = np.maximum.reduce([tr[1:], np.abs(high[1:] - prev), np.abs(low[1:] - prev)])
+    return tr
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    return wilder(true_range(high, low, close), period)
+
+def vwap(volume, turnover) -> float:
+    """VWAP = оборот в котируемой / объём в базовой (как в review)."""
+    v = float(np.sum(volume))
+    return float(np.sum(turnover)) / v if v > 0 else float("nan")
+
+def last(x) -> float:
+    return float(x[-1]) if len(x) else float("nan")
+
+# --------- calc для снапшота ---------
+def compute_calc(h1: dict, h4: dict, d1: dict, m5_today: dict) -> dict:
+    """Поля snapshot["calc"] из свечей 1h, 4h, 1D и 5m с локальной полуночи.
+    d1 включает текущие (незакрытые) сутки — для ATR они отбрасываются."""
+    c1 = h1["close"]
+    line, sig, hist = macd(c1)
+    e20, e50, e200 = last(ema(c1, 20)), last(ema(c1, 50)), last(ema(c1, 200))
+    out = {
+        "atr_1d": last(atr(d1["high"][:-1], d1["low"][:-1], d1["close"][:-1], 14)),
+        "vwap_today": vwap(m5_today["volume"], m5_today["turnover"]),
+        "rsi_1h": last(rsi(c1, 14)),
+        "rsi_4h": last(rsi(h4["close"], 14)),
+        "ema_20_1h": e20,
+        "ema_50_1h": e50,
+        "ema_200_1h": e200,
+        "ema_cross": ("bullish" if e50 > e200 else "bearish") if math.isfinite(e50) and math.isfinite(e200) else None,
+        "macd_hist_1h": last(hist),
+    }
+    # NaN в JSON невалиден — отсутствующее значение пишем как null
+    return {k: (None if isinstance(v, float) and not math.isfinite(v) else v) for k, v in out.items()}
+
+def pivot_levels(d1: dict, m5_today: dict) -> dict:
+    """snapshot["levels"]: классические пивоты по последним закрытым суткам d1
+    (P = (H+L+C)/3; S1 = 2P-H, S2 = P-(H-L); R1 = 2P-L, R2 = P+(H-L)) и
+    high/low текущей сессии по 5m с локальной полуночи."""
+    out = {}
+    if len(d1["close"]) >= 2:
+        h, l, c = float(d1["high"][-2]), float(d1["low"][-2]), float(d1["close"][-2])
+        p = (h + l + c) / 3
+        out = {"support": [round(2*p - h, 2), round(p - (h - l), 2)],
+               "resistance": [round(2*p - l, 2), round(p + (h - l), 2)],
+               "range_mid": round(p, 2)}
+    if len(m5_today["low"]):
+        out["session_high_low"] = [round(float(m5_today["low"].min()), 2), round(float(m5_today["high"].max()), 2)]
+    return out
+
+# --------- Наивные эталоны и бенчмарк ---------
+def _ref_ema(x, n):
+    a = 2.0 / (n + 1); out = [math.nan] * len(x)
+    if len(x) < n: return out
+    y = sum(x[:n]) / n; out[n - 1] = y
+    for i in range(n, len(x)):
+        y = a * x[i] + (1 - a) * y; out[i] = y
+    return out
+
+def _ref_rsi(c, n):
+    out = [math.nan] * len(c)
+    if len(c) <= n: return out
+    g = [max(c[i] - c[i - 1], 0) for i in range(1, len(c))]
+    l = [max(c[i - 1] - c[i], 0) for i in range(1, len(c))]
+    ag = sum(g[:n]) / n; al = sum(l[:n]) / n
+    for i in range(n, len(g) + 1):
+        if i > n:
+            ag = (ag * (n - 1) + g[i - 1]) / n; al = (al * (n - 1) + l[i - 1]) / n
+        out[i] = 100.0 if al == 0 else 100 - 100 / (1 + ag / al)
+    return out
+
+def _ref_atr(h, l, c, n):
+    tr = [h[0] - l[0]] + [max(h[i] - l[i], abs(h[i] - c[i - 1]), abs(l[i] - c[i - 1])) for i in range(1, len(c))]
+    out = [math.nan] * len(c)
+    if len(c) < n: return out
+    y = sum(tr[:n]) / n; out[n - 1] = y
+    for i in range(n, len(c)):
+        y = (y * (n - 1) + tr[i]) / n; out[i] = y
+    return out
+
+def _ref_macd(c, fast=12, slow=26, signal=9):
+    f, s = _ref_ema(c, fast), _ref_ema(c, slow)
+    line = [a - b for a, b in zip(f, s)]
+    first = next((i for i, v in enumerate(line) if not math.isnan(v)), len(line))
+    sig = [math.nan] * first + _ref_ema(line[first:], signal)
+    return line, sig, [a - b for a, b in zip(line, sig)]
+
+def _fake(rng, n):
+    c = 3000 + np.cumsum(rng.normal(0, 5, n))
+    h = c + rng.uniform(0, 8, n); l = c - rng.uniform(0, 8, n)
+    return h, l, c
+
+def self_check(n: int = 5000, seed: int = 7) -> dict:
+    """{индикатор: совпал ли с наивной реализацией} на случайном ряде длины n."""
+    h, l, c = _fake(np.random.default_rng(seed), n)
+    cl = c.tolist()
+    checks = {
+        "ema20": (ema(c, 20), _ref_ema(cl, 20)),
+        "ema200": (ema(c, 200), _ref_ema(cl, 200)),
+        "rsi14": (rsi(c, 14), _ref_rsi(cl, 14)),
+        "atr14": (atr(h, l, c, 14), _ref_atr(h.tolist(), l.tolist(), cl, 14)),
+    }
+    for part, got, ref in zip(("line", "signal", "hist"), macd(c), _ref_macd(cl)):
+        checks[f"macd_{part}"] = (got, ref)
+    return {name: bool(np.allclose(got, np.array(ref), rtol=1e-9, atol=1e-9, equal_nan=True))
+            for name, (got, ref) in checks.items()}
+
+if __name__ == "__main__":
+    import sys, time
+    rng = np.random.default_rng(7)
+    fake = lambda n: _fake(rng, n)
+
+    results = self_check()
+    for name, ok in results.items():
+        print(f"{name:12s} {'OK' if ok else 'MISMATCH'}")
+    if not all(results.values()):
+        sys.exit(1)
+
+    symbols, candles = 50, 1000
+    series = [fake(candles) for _ in range(symbols)]
+    t = time.perf_counter()
+    for h, l, c in series:
+        tf = {"high": h, "low": l, "close": c, "volume": np.ones(candles), "turnover": c}
+        compute_calc(tf, tf, tf, tf)
+    dt = time.perf_counter() - t
+    t = time.perf_counter()
+    for h, l, c in series[:5]:
+        cl, hl, ll = c.tolist(), h.tolist(), l.tolist()
+        _ref_ema(cl, 20); _ref_ema(cl, 50); _ref_ema(cl, 200); _ref_rsi(cl, 14); _ref_atr(hl, ll, cl, 14)
+    dt_ref = (time.perf_counter() - t) * symbols / 5
+    print(f"compute_calc: {symbols} symbols x 4 timeframes x {candles} candles: {dt*1000:.1f} ms "
+          f"(naive loops ~{dt_ref*1000:.1f} ms)")
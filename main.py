@@ -1,15 +1,37 @@
 # main.py — Bybit Snapshot (forecast & review)
 # версия 2025-10-27
 
-import os, json, math, time, base64, urllib.request, urllib.parse
+import os, json, math, time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 
+import httpx
+import numpy as np
+
+import candles, indicators, market, metrics, resilience, sessions, stream
+from scheduler import Scheduler
+from store import open_store, snapshot_name
+
 # --------- Константы ---------
-BYBIT = "https://api.bybit.com"
-REPO = os.environ.get("GITHUB_REPO", "anton-baton-sem/bybit-tg-bot")
-BRANCH = os.environ.get("GITHUB_BRANCH", "main")
-MODE = os.environ.get("MODE", "forecast").strip().lower()  # forecast | review
+BYBIT = os.environ.get("BYBIT_API", "https://api.bybit.com").rstrip("/")   # заглушка — см. bench/
+MODE = os.environ.get("MODE", "forecast").strip().lower()  # forecast | review | daemon | stream
+# пары для спота: "ETHUSDT,BTCUSDT" или с явным ключом "ETHUSDT:eth_spot,SOLUSDT:sol_spot";
+# calc (ATR/VWAP) считается для первой пары
+SYMBOLS = os.environ.get("SYMBOLS", "ETHUSDT,BTCUSDT")
+
+# снапшоты: локальная папка SNAPSHOT_DIR + GitHub (см. store.py)
+STORE = open_store()
+
+# MODE=daemon / MODE=stream: процесс живёт постоянно и снимает снапшоты
+# в FORECAST_AT / REVIEW_AT по локальному времени (см. scheduler.py);
+# в stream цены ещё и приходят по WebSocket (см. stream.py)
+FORECAST_AT = os.environ.get("FORECAST_AT", "09:00")
+REVIEW_AT = os.environ.get("REVIEW_AT", "21:00")
+SCHEDULER_STATE = os.environ.get("SCHEDULER_STATE") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "scheduler.json")
+STREAM_INTERVALS = ("1", "5", "60", "240", "D")
+BOOK: stream.PriceBook | None = None   # задаётся в run_stream()
 
 # --------- Время / Дата ---------
 LOCAL_TZ = ZoneInfo("Europe/Podgorica")
@@ -30,78 +52,93 @@ def local_time_to_utc_ms(dt_local: datetime) -> int:
     return int(dt_local.astimezone(timezone.utc).timestamp() * 1000)
 
 # --------- HTTP утилиты ---------
-def http_get_json(url, params=None, timeout=10, retries=(1,3,7)):
+# Одна сессия на процесс: keep-alive пул, без нового TCP+TLS на каждый запрос.
+# httpx.Client потокобезопасен — его делят параллельные выборки.
+def make_session(transport: httpx.BaseTransport | None = None) -> httpx.Client:
+    return httpx.Client(
+        headers={
+            "User-Agent": "RenderBot/1.0 (+https://render.com)",
+            "Accept": "application/json",
+            "Cache-Control": "no-store",
+            "Pragma": "no-cache",
+        },
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+        transport=transport,
+    )
+
+SESSION = make_session()
+
+def configure(base: str | None = None, transport: httpx.BaseTransport | None = None):
+    """Подмена Bybit (бенчмарки, заглушки): базовый URL и/или транспорт httpx,
+    например httpx.MockTransport — тогда запросы не выходят в сеть."""
+    global BYBIT, SESSION
+    if base:
+        BYBIT = base.rstrip("/")
+    if transport is not None:
+        old, SESSION = SESSION, make_session(transport)
+        old.close()
+
+# повторы: сеть/5xx/429 с джиттером и Retry-After, 4xx — сразу; общий дедлайн —
+# RUN_DEADLINE на прогон; после серии сбоев Bybit — быстрый отказ (см. resilience.py)
+BYBIT_POLICY = resilience.Policy(attempts=4, base=0.5, cap=4.0, timeout=10.0)
+RUN_DEADLINE = float(os.environ.get("RUN_DEADLINE", "120"))
+
+def http_get_json(url, params=None, timeout=10, policy=BYBIT_POLICY):
     q = dict(params or {})
     q["nocache"] = "1"
     q["ts"] = str(int(time.time()))
-    full = f"{url}?{urllib.parse.urlencode(q)}"
-    headers = {
-        "User-Agent": "RenderBot/1.0 (+https://render.com)",
-        "Accept": "application/json",
-        "Cache-Control": "no-store",
-        "Pragma": "no-cache",
-    }
-    last_err = None
-    for backoff in (0,)+tuple(retries):
-        if backoff:
-            time.sleep(backoff)
-        try:
-            req = urllib.request.Request(full, headers=headers)
-            with urllib.request.urlopen(req, timeout=timeout) as r:
-                return json.loads(r.read().decode())
-        except Exception as e:
-            last_err = e
-    raise last_err
-
-def github_put_file(path_rel: str, content_bytes: bytes, message: str):
-    token = os.environ.get("GITHUB_TOKEN")
-    if not token:
-        print("⚠️ No GITHUB_TOKEN — skip upload")
-        return
-    url = f"https://api.github.com/repos/{REPO}/contents/{path_rel}"
-    body = json.dumps({
-        "message": message,
-        "content": base64.b64encode(content_bytes).decode(),
-        "branch": BRANCH,
-    }).encode()
-    req = urllib.request.Request(url, data=body, method="PUT", headers={
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github.v3+json",
-        "User-Agent": "RenderBot/1.0"
-    })
-    with urllib.request.urlopen(req) as r:
-        print(f"GitHub upload: HTTP {r.status} {path_rel}")
-
-def github_get_raw_snapshot(fname: str) -> dict | None:
-    """Пробуем RAW, затем API (base64). Возвращаем dict или None."""
-    raw_url = f"https://raw.githubusercontent.com/{REPO}/{BRANCH}/snapshots/{fname}"
-    try:
-        req = urllib.request.Request(raw_url, headers={"User-Agent":"RenderBot/1.0"})
-        with urllib.request.urlopen(req, timeout=10) as r:
-            return json.loads(r.read().decode())
-    except Exception:
-        pass
-    # API fallback
-    api_url = f"https://api.github.com/repos/{REPO}/contents/snapshots/{fname}?ref={BRANCH}"
-    try:
-        req = urllib.request.Request(api_url, headers={"User-Agent":"RenderBot/1.0"})
-        with urllib.request.urlopen(req, timeout=10) as r:
-            j = json.loads(r.read().decode())
-            if "content" in j:
-                return json.loads(base64.b64decode(j["content"]).decode())
-    except Exception:
-        pass
-    return None
+    endpoint = httpx.URL(url).path   # /v5/market/kline и т.п. — метка для метрик
+
+    def attempt(left):
+        with metrics.timer("bybit_request_seconds", endpoint=endpoint):
+            r = SESSION.get(url, params=q, timeout=min(timeout, left))
+            r.raise_for_status()
+            j = r.json()
+        if isinstance(j, dict) and j.get("retCode") == 10006:
+            # лимит запросов Bybit приходит и как HTTP 200 с retCode 10006
+            raise resilience.UpstreamError(429, r.headers, "bybit rate limit (retCode 10006)")
+        return j
+
+    return resilience.call(attempt, policy, resilience.breaker("bybit"), name="bybit")
+
+def parse_symbols(spec: str) -> dict:
+    """"ETHUSDT,BTCUSDT:btc" -> {"ETHUSDT": "eth_spot", "BTCUSDT": "btc"} (порядок сохраняется)."""
+    out = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        sym, _, key = part.partition(":")
+        sym = sym.strip().upper()
+        out[sym] = key.strip() or sym.removesuffix("USDT").removesuffix("USDC").lower() + "_spot"
+    return out
 
 # --------- Bybit helpers ---------
-def get_spot_last(symbol: str):
-    j = http_get_json(f"{BYBIT}/v5/market/tickers", {"category":"spot","symbol":symbol})
-    it = j.get("result", {}).get("list", [{}])[0]
-    last = float(it.get("lastPrice", "nan"))
-    ts_ms = int(time.time()*1000)
-    return last, ts_ms
+def parse_tickers(payload: dict) -> dict:
+    """Ответ /v5/market/tickers -> {symbol: lastPrice} (битые строки пропускаются)."""
+    book = {}
+    for it in payload.get("result", {}).get("list", []) or []:
+        try:
+            book[it["symbol"]] = float(it["lastPrice"])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return book
+
+def get_spot_tickers(category: str = "spot", symbols=None):
+    """Все тикеры категории одним запросом (без symbol Bybit отдаёт весь список).
+    В MODE=stream — из книги цен, если в ней есть свежие цены всех symbols."""
+    if BOOK is not None and category == "spot" and symbols:
+        live = {s: BOOK.last(s) for s in symbols}
+        if all(v is not None for v in live.values()):
+            return {s: v[0] for s, v in live.items()}, min(v[1] for v in live.values())
+    j = http_get_json(f"{BYBIT}/v5/market/tickers", {"category":category})
+    return parse_tickers(j), int(time.time()*1000)
 
 def get_kline_last_close(symbol: str):
+    if BOOK is not None:
+        live = BOOK.candle(symbol, "1")
+        if live is not None:
+            return float(live["close"][0]), int(live["start"][0])
     j = http_get_json(f"{BYBIT}/v5/market/kline",
                       {"category":"spot","symbol":symbol,"interval":"1","limit":"1"})
     it = j.get("result", {}).get("list", [[]])
@@ -111,97 +148,157 @@ def get_kline_last_close(symbol: str):
         return close, start_ms
     return float("nan"), 0
 
-def get_klines_range(symbol: str, interval: str, start_ms: int, end_ms: int) -> list:
-    """Возвращает список свечей (как в Bybit v5). Для суток достаточно interval=5."""
+def fetch_kline_window(symbol: str, interval: str, start_ms: int, end_ms: int) -> list:
+    """Одно окно свечей (не больше 1000) — как отдаёт Bybit v5, новые первыми."""
     j = http_get_json(f"{BYBIT}/v5/market/kline",
                       {"category":"spot","symbol":symbol,"interval":interval,
-                       "start":str(start_ms),"end":str(end_ms),"limit":"1000"})
+                       "start":str(start_ms),"end":str(end_ms),"limit":str(candles.PAGE)})
     return j.get("result", {}).get("list", [])
 
+# локальный кэш свечей: с Bybit докачивается только хвост после последней сохранённой
+CANDLES = candles.CandleStore(fetch_kline_window)
+
+def get_klines_range(symbol: str, interval: str, start_ms: int, end_ms: int):
+    """Свечи [start, open, high, low, close, volume, turnover] по возрастанию времени
+    (массив candles.DTYPE), включая текущую незакрытую. Для суток достаточно interval=5.
+    В MODE=stream без REST, если локальные свечи смыкаются с текущей из книги."""
+    now_ms = int(time.time()*1000)
+    if BOOK is not None:
+        live = BOOK.candle(symbol, interval)
+        iv = candles.INTERVAL_MS[interval]
+        have = CANDLES.range(symbol, interval, start_ms, end_ms, now_ms, include_open=False, sync=False)
+        if (live is not None and len(have) and have["start"][0] <= start_ms - start_ms % iv
+                and have["start"][-1] + iv == live["start"][0] <= end_ms):
+            return np.concatenate([have, live])
+    return CANDLES.range(symbol, interval, start_ms, end_ms, now_ms)
+
 def within(x, ref, tol):
     return math.isfinite(x) and math.isfinite(ref) and abs(x-ref) <= tol
 
-# --------- Safe spot fetch (ETH/BTC) ---------
-def fetch_spot_safe(snapshot, symbol="ETHUSDT", key="eth_spot"):
-    last, last_ts = get_spot_last(symbol)
-    ref_close, ref_ts = get_kline_last_close(symbol)
-    atr = float(snapshot.get("calc", {}).get("atr_1d", "nan"))
-    vwap = float(snapshot.get("calc", {}).get("vwap_today", "nan"))
-
-    tol_pct = 0.008
-    tol_abs = max(0.0, 2.0*atr if math.isfinite(atr) else 0.0)
-    tol = max(tol_abs, last*tol_pct if math.isfinite(last) else 0.0)
-
+# --------- Safe spot fetch ---------
+def spot_ok(last, ref_close, tol, vwap):
     ok_close = within(last, ref_close, tol)
     ok_vwap  = True if not math.isfinite(vwap) else within(last, vwap, max(tol, last*0.01))
-
-    invalid = False
-    if not (ok_close and ok_vwap):
-        last2, last2_ts = get_spot_last(symbol)
-        ref_close2, ref_ts2 = get_kline_last_close(symbol)
-        if not (within(last2, ref_close2, tol) or (math.isfinite(vwap) and within(last2, vwap, max(tol, last2*0.01)))):
-            invalid = True
-        last, last_ts = last2, last2_ts
-        ref_close, ref_ts = ref_close2, ref_ts2
-
-    snapshot[key] = round(float(last), 2)
-    snapshot.setdefault("meta", {}).update({
-        f"{key}_source": "bybit_spot_lastPrice",
-        f"{key}_time_ms": int(last_ts),
-        f"{key}_ref_close": round(float(ref_close), 2) if math.isfinite(ref_close) else None,
-        f"{key}_ref_time_ms": int(ref_ts) if ref_ts else None,
-        "tz_local": "Europe/Podgorica",
-        "snapshot_date_local": today_local_str(),
-    })
-    if invalid:
-        snapshot["meta"]["invalid"] = True
+    return ok_close and ok_vwap
+
+def fetch_spots_safe(snapshot, symbols: dict, calc_symbol: str | None = None, tickers=None):
+    """Спот всех пар {symbol: key} параллельно: общий список тикеров (один запрос на
+    все пары) и контрольные 1m-свечи уходят одной волной; повторная проверка —
+    второй волной только для пар, не прошедших сверку. ATR/VWAP из calc применяются
+    к calc_symbol. tickers — уже полученный (book, ts_ms) из get_spot_tickers."""
+    calc = snapshot.get("calc", {})
+    atr = float(calc.get("atr_1d") or "nan")
+    vwap = float(calc.get("vwap_today") or "nan")
+
+    def tol_for(sym, last):
+        a = atr if sym == calc_symbol else float("nan")
+        tol_pct = 0.008
+        tol_abs = max(0.0, 2.0*a if math.isfinite(a) else 0.0)
+        return max(tol_abs, last*tol_pct if math.isfinite(last) else 0.0)
+
+    def vwap_for(sym):
+        return vwap if sym == calc_symbol else float("nan")
+
+    def wave(pool, syms, tickers=None):
+        ft = pool.submit(get_spot_tickers, "spot", list(syms)) if tickers is None else None
+        fr = {s: pool.submit(get_kline_last_close, s) for s in syms}
+        book, ts = ft.result() if ft is not None else tickers
+        return {s: ((book.get(s, float("nan")), ts), fr[s].result()) for s in syms}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(symbols) + 1)) as pool:
+        res = wave(pool, symbols, tickers)
+        bad = [s for s, ((last, _), (ref, _)) in res.items()
+               if not spot_ok(last, ref, tol_for(s, last), vwap_for(s))]
+        res2 = wave(pool, bad) if bad else {}
+
+    invalid = set()
+    for s, ((last2, _), (ref2, _)) in res2.items():
+        tol = tol_for(s, res[s][0][0])
+        v = vwap_for(s)
+        if not (within(last2, ref2, tol) or (math.isfinite(v) and within(last2, v, max(tol, last2*0.01)))):
+            invalid.add(s)
+        res[s] = res2[s]
+
+    meta = snapshot.setdefault("meta", {})
+    for s, key in symbols.items():
+        (last, last_ts), (ref_close, ref_ts) = res[s]
+        # пары нет в тикерах (новый SYMBOLS, нет сделок) — NaN в JSON невалиден, пишем null
+        snapshot[key] = round(float(last), 2) if math.isfinite(last) else None
+        meta.update({
+            f"{key}_source": "bybit_spot_lastPrice",
+            f"{key}_time_ms": int(last_ts),
+            f"{key}_ref_close": round(float(ref_close), 2) if math.isfinite(ref_close) else None,
+            f"{key}_ref_time_ms": int(ref_ts) if ref_ts else None,
+            "tz_local": "Europe/Podgorica",
+            "snapshot_date_local": today_local_str(),
+        })
+        if s in invalid or not math.isfinite(last):
+            # какие пары не прошли сверку: ["btc_spot", ...]
+            meta["invalid"] = sorted({*meta.get("invalid", []), key})
     return snapshot
 
-# --------- Заглушки вычислений (подставь свои реальные расчёты) ---------
-def compute_calc(snapshot):
-    snapshot["calc"] = snapshot.get("calc", {}) | {
-        "atr_1d": snapshot.get("calc", {}).get("atr_1d", 16.5),
-        "vwap_today": snapshot.get("calc", {}).get("vwap_today", 4135.2),
-        "orderbook_imbalance_pct": snapshot.get("calc", {}).get("orderbook_imbalance_pct", -1.8),
-        "rsi_1h": snapshot.get("calc", {}).get("rsi_1h", 52.4),
-        "rsi_4h": snapshot.get("calc", {}).get("rsi_4h", 58.1),
-        "ema_20_1h": snapshot.get("calc", {}).get("ema_20_1h", 4120.5),
-        "ema_50_1h": snapshot.get("calc", {}).get("ema_50_1h", 4102.3),
-        "ema_200_1h": snapshot.get("calc", {}).get("ema_200_1h", 4045.0),
-        "ema_cross": snapshot.get("calc", {}).get("ema_cross", "bullish"),
-        "macd_hist_1h": snapshot.get("calc", {}).get("macd_hist_1h", -0.12),
-    }
+def fetch_spot_safe(snapshot, symbol="ETHUSDT", key="eth_spot"):
+    return fetch_spots_safe(snapshot, {symbol: key}, calc_symbol=symbol)
+
+# --------- Индикаторы ---------
+# каждый таймфрейм берётся один раз (из локального кэша + хвост с Bybit)
+# и переиспользуется всеми индикаторами: {имя: (interval, свечей истории)}
+CALC_TIMEFRAMES = {"h1": ("60", 1000), "h4": ("240", 200), "d1": ("D", 30)}
+
+def fetch_calc_candles(symbol: str) -> dict:
+    """Свечи 1h/4h/1D и 5m с локальной полуночи — параллельно, по таймфрейму на поток."""
+    now_ms = int(time.time()*1000)
+    ranges = {name: (iv, now_ms - n*candles.INTERVAL_MS[iv]) for name, (iv, n) in CALC_TIMEFRAMES.items()}
+    ranges["m5_today"] = ("5", local_midnight_ms())
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        futs = {name: pool.submit(get_klines_range, symbol, iv, start, now_ms)
+                for name, (iv, start) in ranges.items()}
+        return {name: candles.as_arrays(f.result()) for name, f in futs.items()}
+
+def compute_calc(snapshot, symbol="ETHUSDT", tf: dict | None = None):
+    """tf — уже полученные свечи fetch_calc_candles (иначе качаются здесь)."""
+    calc = snapshot.get("calc", {})
+    try:
+        calc = calc | indicators.compute_calc(**(tf if tf is not None else fetch_calc_candles(symbol)))
+    except Exception as e:
+        # без индикаторов прогноз всё равно пишем; сверка спота обойдётся без ATR/VWAP
+        print(f"⚠️ calc failed for {symbol}: {e!r}")
+    snapshot["calc"] = calc
     return snapshot
 
-def compute_derivs(snapshot):
-    snapshot["derivs"] = snapshot.get("derivs", {}) | {
-        "funding_eth_pct": 0.009,
-        "funding_btc_pct": 0.011,
-        "oi_eth": 3.42,
-        "oi_btc": 5.12,
-        "oi_change_24h_pct": 0.8,
-        "taker_buy_sell_ratio": 1.04,
-        "liquidations_buy_24h_usd": 3.1e6,
-        "liquidations_sell_24h_usd": 2.8e6,
-    }
-    return snapshot
+# --------- Деривативы, объёмы, стакан ---------
+def fetch_market(symbols, calc_symbol: str) -> dict:
+    """Все запросы market.plan одной волной через общую сессию: {ключ: ответ | None}.
+    Сбой одного запроса не валит остальные — его поля в снапшоте будут null."""
+    reqs = market.plan(symbols, calc_symbol, spot=BOOK is None)
 
-def compute_volumes(snapshot):
-    snapshot["volume_analysis"] = snapshot.get("volume_analysis", {}) | {
-        "spot_volume_24h": 531_000_000,
-        "futures_volume_24h": 1_240_000_000,
-        "cumulative_delta_1h": -3_800_000,
-        "liquidations_24h_usd": 5.9e6,
-    }
+    def one(path, params):
+        try:
+            return http_get_json(f"{BYBIT}{path}", params)
+        except Exception as e:
+            print(f"⚠️ {path} failed: {e!r}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=len(reqs)) as pool:
+        futs = {k: pool.submit(one, path, params) for k, (path, params) in reqs.items()}
+        return {k: f.result() for k, f in futs.items()}
+
+def compute_market(snapshot, payloads: dict, symbols, calc_symbol: str):
+    """derivs, volume_analysis и calc.orderbook_imbalance_pct из ответов fetch_market."""
+    st = market.stats(payloads, symbols, calc_symbol, int(time.time()*1000))
+    if BOOK is not None and st["volume_analysis"]["spot_volume_24h"] is None:
+        # MODE=stream: спот-тикеры по REST не запрашиваются — оборот из WebSocket-тикера
+        live = BOOK.turnover(calc_symbol)
+        if live is not None:
+            st["volume_analysis"]["spot_volume_24h"] = round(live[0], 0)
+    for part in ("derivs", "volume_analysis", "calc", "meta"):
+        snapshot[part] = snapshot.get(part, {}) | st[part]
     return snapshot
 
-def compute_levels(snapshot):
-    snapshot["levels"] = snapshot.get("levels", {}) | {
-        "support": [4050, 3970],
-        "resistance": [4250, 4320],
-        "range_mid": 4140,
-        "session_high_low": [4046, 4253],
-    }
+def compute_levels(snapshot, tf: dict | None):
+    """Пивоты прошлых суток и high/low текущей сессии; без свечей — уровней нет."""
+    if tf is not None:
+        snapshot["levels"] = snapshot.get("levels", {}) | indicators.pivot_levels(tf["d1"], tf["m5_today"])
     return snapshot
 
 # --------- BUILD: forecast ---------
@@ -211,19 +308,32 @@ def build_forecast_snapshot():
         "timestamp_local": now_local().isoformat(),
         "mode": "forecast",
     }
-    snap = compute_calc(snap)
-    snap = fetch_spot_safe(snap, "ETHUSDT", "eth_spot")
-    snap = fetch_spot_safe(snap, "BTCUSDT", "btc_spot")
-    snap = compute_derivs(snap)
-    snap = compute_volumes(snap)
-    snap = compute_levels(snap)
+    symbols = parse_symbols(SYMBOLS)
+    calc_symbol = next(iter(symbols), "ETHUSDT")
+    # свечи и рынок (тикеры, фандинг, OI, стакан, сделки) качаются одновременно
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        fm = pool.submit(fetch_market, list(symbols), calc_symbol)
+        ft = pool.submit(fetch_calc_candles, calc_symbol)
+        try:
+            tf = ft.result()
+        except Exception as e:
+            print(f"⚠️ candles failed for {calc_symbol}: {e!r}")
+            tf = None
+        payloads = fm.result()
+    snap = compute_calc(snap, calc_symbol, tf) if tf is not None else snap | {"calc": {}}
+    spot = payloads.get("tickers_spot")
+    tickers = (parse_tickers(spot), int(time.time()*1000)) if spot else None
+    snap = fetch_spots_safe(snap, symbols, calc_symbol=calc_symbol, tickers=tickers)
+    snap = compute_market(snap, payloads, list(symbols), calc_symbol)
+    snap = compute_levels(snap, tf)
     return snap
 
 # --------- BUILD: review ---------
-def build_review_snapshot():
+def build_review_snapshot(forecast: dict | None = None):
+    """forecast — утренний прогноз, если он уже в памяти (daemon); иначе берётся из хранилища."""
     date_str = today_local_str()
-    forecast_name = f"{date_str}_forecast.json"
-    forecast = github_get_raw_snapshot(forecast_name)
+    if forecast is None:
+        forecast = STORE.get(snapshot_name(date_str, "forecast"))
     if not forecast:
         # fallback: попробуем частичную сборку без прогноза (не критично)
         print("⚠️ Forecast snapshot not found — review will be partial.")
@@ -237,32 +347,27 @@ def build_review_snapshot():
     # берём 5-минутки за день
     kl = get_klines_range("ETHUSDT", interval="5", start_ms=start_ms, end_ms=end_ms)
 
-    hi = -float("inf")
-    lo = float("inf")
-    close = float("nan")
-    vol_sum_base = 0.0
-    vol_sum_quote = 0.0
-
-    for k in kl:
-        # формат: [start, open, high, low, close, volume(base), turnover(quote)]
-        h = float(k[2]); l = float(k[3]); c = float(k[4])
-        v_base = float(k[5]); v_quote = float(k[6])
-        hi = max(hi, h)
-        lo = min(lo, l)
-        close = c
-        vol_sum_base += v_base
-        vol_sum_quote += v_quote
-
-    vwap_approx = (vol_sum_quote / vol_sum_base) if vol_sum_base > 0 else None
-
     # сравнение с прогнозными уровнями
     levels = forecast.get("levels", {}) if isinstance(forecast, dict) else {}
     supp = levels.get("support", []) or []
     ress = levels.get("resistance", []) or []
     range_mid = levels.get("range_mid")
 
-    touched_support = any(math.isfinite(lo) and lo <= float(s) + 1e-8 for s in supp)
-    touched_resist  = any(math.isfinite(hi) and hi >= float(r) - 1e-8 for r in ress)
+    # high/low/close/объёмы и касания уровней — одним векторным проходом
+    agg = sessions.aggregate(kl, [(start_ms, end_ms)], supp, ress)
+    hi, lo, close = float(agg["high"][0]), float(agg["low"][0]), float(agg["close"][0])
+    vol_sum_base, vol_sum_quote = float(agg["volume"][0]), float(agg["turnover"][0])
+    vwap_approx = (vol_sum_quote / vol_sum_base) if vol_sum_base > 0 else None
+
+    touched_support = bool(agg["touched_support"][0])
+    touched_resist  = bool(agg["touched_resistance"][0])
+
+    # закрытие BTC на конец сессии — для btc_change_pct в /summary (в review нет btc_spot)
+    try:
+        btc_close, _ = get_kline_last_close("BTCUSDT")
+    except Exception as e:
+        print(f"⚠️ BTC close failed: {e!r}")
+        btc_close = float("nan")
     inside_range = (
         math.isfinite(close) and
         (min([*supp, *ress]) if (supp or ress) else -float("inf")) <= close <=
@@ -291,6 +396,7 @@ def build_review_snapshot():
             "vwap_approx": round(vwap_approx, 2) if vwap_approx else None,
             "volume_base_sum": vol_sum_base,
             "turnover_quote_sum": vol_sum_quote,
+            "btc_close": round(btc_close, 2) if math.isfinite(btc_close) else None,
         },
         "compare": {
             "levels_forecast": levels,
@@ -298,6 +404,11 @@ def build_review_snapshot():
             "touched_resistance": bool(touched_resist),
             "inside_range": bool(inside_range),
             "bias": bias,
+            # время первого касания каждого уровня (мс UTC), null — не касались
+            "first_touch_ms": {
+                "support": [int(t) if t >= 0 else None for t in agg["support_first_touch_ms"][0]],
+                "resistance": [int(t) if t >= 0 else None for t in agg["resistance_first_touch_ms"][0]],
+            },
         },
         "forecast_ref": {
             "eth_spot_at_forecast": forecast.get("eth_spot"),
@@ -309,25 +420,75 @@ def build_review_snapshot():
 
 # --------- SAVE & UPLOAD ---------
 def save_and_upload(obj: dict, name: str, msg: str):
-    path = f"/tmp/{name}"
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
-    print(f"Saved: {path}")
-    with open(path, "rb") as f:
-        github_put_file(f"snapshots/{name}", f.read(), msg)
+    # отчёт о прогоне (время на Bybit, повторы, паузы, GitHub) — runs/<имя снапшота>
+    report = metrics.report(snapshot=name)
+    return STORE.put(name, obj, msg, extra={
+        f"runs/{name}": json.dumps(report, ensure_ascii=False, indent=1).encode("utf-8"),
+    })
+
+# --------- RUN ---------
+def run_forecast(d: str) -> dict:
+    print(f"Running forecast for {d}")
+    metrics.reset()
+    with resilience.run_deadline(RUN_DEADLINE):
+        snap = build_forecast_snapshot()
+    save_and_upload(snap, snapshot_name(d, "forecast"), f"auto snapshot forecast {d}")
+    print("✅ Forecast done.")
+    return snap
+
+def run_review(d: str, forecast: dict | None = None) -> dict:
+    print(f"Running review for {d}")
+    metrics.reset()
+    with resilience.run_deadline(RUN_DEADLINE):
+        rev = build_review_snapshot(forecast)
+    save_and_upload(rev, snapshot_name(d, "review"), f"auto snapshot review {d}")
+    print("✅ Review done.")
+    return rev
+
+# задачи планировщика: снапшот, уже лежащий в хранилище (снят до рестарта), не переснимается
+def forecast_job(d: str, memory: dict):
+    existing = STORE.local.read_bytes(snapshot_name(d, "forecast"))
+    snap = json.loads(existing) if existing is not None else run_forecast(d)
+    memory["forecast"] = {"date": d, "snapshot": snap}
+
+def review_job(d: str, memory: dict):
+    if STORE.local.read_bytes(snapshot_name(d, "review")) is not None:
+        return
+    kept = memory.get("forecast") or {}
+    run_review(d, kept.get("snapshot") if kept.get("date") == d else None)
+
+def make_scheduler(clock=now_local, sleep=time.sleep) -> Scheduler:
+    jobs = [("forecast", FORECAST_AT, forecast_job), ("review", REVIEW_AT, review_job)]
+    return Scheduler(jobs, SCHEDULER_STATE, clock, sleep)
+
+def run_daemon():
+    """Резидентный режим: один процесс, общий пул соединений, прогноз в памяти до review."""
+    print(f"⏰ Daemon: forecast at {FORECAST_AT}, review at {REVIEW_AT} ({LOCAL_TZ.key})")
+    make_scheduler().run_forever()
+
+def run_stream():
+    """Как daemon, но цены — из книги по WebSocket, без REST-запросов."""
+    global BOOK
+    symbols = list(parse_symbols(SYMBOLS))
+    BOOK = stream.PriceBook()
+    feed = stream.BookFeed(BOOK, symbols, STREAM_INTERVALS, on_closed=CANDLES.append_closed)
+    feed.start()
+    deadline = time.time() + 30
+    while not BOOK.ready(symbols) and time.time() < deadline:
+        time.sleep(0.2)
+    print(f"📡 Stream {'ready' if BOOK.ready(symbols) else 'not ready (REST fallback)'}: {', '.join(symbols)}")
+    run_daemon()
 
 # --------- MAIN ---------
 if __name__ == "__main__":
     d = today_local_str()
     if MODE == "forecast":
-        print(f"Running forecast for {d}")
-        snap = build_forecast_snapshot()
-        save_and_upload(snap, f"{d}_forecast.json", f"auto snapshot forecast {d}")
-        print("✅ Forecast done.")
+        run_forecast(d)
     elif MODE == "review":
-        print(f"Running review for {d}")
-        rev = build_review_snapshot()
-        save_and_upload(rev, f"{d}_review.json", f"auto snapshot review {d}")
-        print("✅ Review done.")
+        run_review(d)
+    elif MODE == "daemon":
+        run_daemon()
+    elif MODE == "stream":
+        run_stream()
     else:
-        print(f"Unknown MODE={MODE}. Use 'forecast' or 'review'.")
\ No newline at end of file
+        print(f"Unknown MODE={MODE}. Use 'forecast', 'review', 'daemon' or 'stream'.")
@@ -0,0 +1,157 @@
+# market.py — деривативы, объёмы и стакан из ответов Bybit v5 (NumPy)
+#
+# plan() — все запросы одного прогона: main.fetch_market отправляет их одной
+# волной через общую сессию, stats() разбирает ответы одним проходом:
+#   tickers_linear, tickers_spot   /v5/market/tickers — все символы категории одним ответом
+#   funding:<SYMBOL>               /v5/market/funding/history — последние 7 суток (21 выплата)
+#   oi                             /v5/market/open-interest — 25 часовых точек (24 ч)
+#   orderbook                      /v5/market/orderbook — 50 уровней на сторону
+#   trades                         /v5/market/recent-trade — до 1000 последних сделок
+# Стакан, сделки и OI берутся только для calc-символа (первой пары SYMBOLS).
+# Ликвидаций в REST v5 нет (только WebSocket allLiquidation) — поля остаются null.
+#
+# Единицы: фандинг — % за период, OI — млрд USD (openInterestValue), объёмы —
+# оборот за 24 ч в USD, дельта — покупки минус продажи тейкеров в USD.
+
+import math
+import numpy as np
+
+FUNDING_LIMIT = 21          # 3 выплаты в сутки x 7 дней
+OI_POINTS = 25              # 1h x 25 -> изменение за 24 ч
+BOOK_DEPTH = 50
+TRADES_LIMIT = 1000         # максимум Bybit для linear
+DELTA_WINDOW_MS = 3_600_000
+
+def prefix(symbol: str) -> str:
+    """ETHUSDT -> eth (суффикс полей derivs)."""
+    return symbol.removesuffix("USDT").removesuffix("USDC").lower()
+
+def plan(symbols, calc_symbol: str, spot: bool = True) -> dict:
+    """{ключ: (путь, параметры)}; spot=False — спот-тикеры не нужны (MODE=stream:
+    цены и оборот spot_volume_24h приходят из WebSocket, см. main.compute_market)."""
+    reqs = {"tickers_linear": ("/v5/market/tickers", {"category": "linear"})}
+    if spot:
+        reqs["tickers_spot"] = ("/v5/market/tickers", {"category": "spot"})
+    for s in symbols:
+        reqs[f"funding:{s}"] = ("/v5/market/funding/history",
+                                {"category": "linear", "symbol": s, "limit": str(FUNDING_LIMIT)})
+    lin = {"category": "linear", "symbol": calc_symbol}
+    reqs["oi"] = ("/v5/market/open-interest", lin | {"intervalTime": "1h", "limit": str(OI_POINTS)})
+    reqs["orderbook"] = ("/v5/market/orderbook", lin | {"limit": str(BOOK_DEPTH)})
+    reqs["trades"] = ("/v5/market/recent-trade", lin | {"limit": str(TRADES_LIMIT)})
+    return reqs
+
+# --------- Разбор ---------
+def _result(payload):
+    return (payload or {}).get("result") or {}
+
+def _list(payload) -> list:
+    return _result(payload).get("list") or []
+
+def _floats(rows, field: str) -> np.ndarray:
+    """Поле из списка dict -> float64; битые значения — NaN."""
+    out = np.full(len(rows), np.nan)
+    for i, r in enumerate(rows):
+        try:
+            out[i] = float(r[field])
+        except (KeyError, TypeError, ValueError):
+            pass
+    return out
+
+def tickers(payload) -> dict:
+    """Ответ /v5/market/tickers -> {symbol: строка тикера} (как есть, строками)."""
+    return {it["symbol"]: it for it in _list(payload) if isinstance(it, dict) and "symbol" in it}
+
+def _field(row: dict | None, name: str, scale: float = 1.0):
+    try:
+        v = float(row[name]) * scale
+    except (KeyError, TypeError, ValueError):
+        return None
+    return v if math.isfinite(v) else None
+
+def trades_arrays(payload) -> dict:
+    """Ответ /v5/market/recent-trade -> массивы price, size, time (мс), buy (тейкер купил)."""
+    rows = _list(payload)
+    t = _floats(rows, "time")
+    ok = np.isfinite(t)
+    return {"price": _floats(rows, "price")[ok], "size": _floats(rows, "size")[ok],
+            "time": t[ok].astype(np.int64),
+            "buy": np.array([r.get("side") == "Buy" for r in rows], dtype=bool)[ok]}
+
+def book_arrays(payload) -> tuple:
+    """Ответ /v5/market/orderbook -> (bids (n, 2), asks (m, 2)) [price, size]."""
+    r = _result(payload)
+    side = lambda k: np.asarray(r.get(k) or [], dtype=np.float64).reshape(-1, 2)
+    return side("b"), side("a")
+
+# --------- Расчёт ---------
+def flow(tr: dict, now_ms: int, window_ms: int = DELTA_WINDOW_MS) -> dict:
+    """Дельта и соотношение покупок/продаж тейкеров. 1000 сделок на активном рынке —
+    это минуты, а не час: дельта считается по тому окну, что покрыто (window_min)."""
+    if not len(tr["time"]):
+        return {"delta": None, "ratio": None, "window_min": None}
+    notional = tr["price"] * tr["size"]
+    signed = np.where(tr["buy"], notional, -notional)
+    recent = tr["time"] >= now_ms - window_ms
+    buy = tr["size"][tr["buy"]].sum()
+    sell = tr["size"][~tr["buy"]].sum()
+    covered = min(window_ms, now_ms - int(tr["time"].min()))
+    return {"delta": float(np.nansum(signed[recent])),
+            "ratio": float(buy / sell) if sell > 0 else None,
+            "window_min": round(max(covered, 0) / 60_000, 1)}
+
+def imbalance_pct(bids: np.ndarray, asks: np.ndarray) -> float | None:
+    """(объём бидов - объём асков) / сумма, % — по всей полученной глубине."""
+    b, a = bids[:, 1].sum(), asks[:, 1].sum()
+    return float((b - a) / (b + a) * 100) if b + a > 0 else None
+
+def oi_change_pct(payload) -> float | None:
+    """Изменение OI между самой старой и самой новой точкой (Bybit — новые первыми)."""
+    oi = _floats(_list(payload), "openInterest")
+    oi = oi[np.isfinite(oi)]
+    if len(oi) < 2 or oi[-1] <= 0:
+        return None
+    return float((oi[0] / oi[-1] - 1) * 100)
+
+def funding_avg_pct(payload) -> float | None:
+    rates = _floats(_list(payload), "fundingRate")
+    rates = rates[np.isfinite(rates)]
+    return float(rates.mean() * 100) if len(rates) else None
+
+def stats(payloads: dict, symbols, calc_symbol: str, now_ms: int) -> dict:
+    """Ответы plan() (None — запрос не удался) -> части снапшота:
+    {"derivs", "volume_analysis", "calc", "meta"}; чего нет — null."""
+    lin = tickers(payloads.get("tickers_linear"))
+    spot = tickers(payloads.get("tickers_spot"))
+    derivs = {}
+    for s in symbols:
+        p = prefix(s)
+        derivs[f"funding_{p}_pct"] = _field(lin.get(s), "fundingRate", 100)
+        derivs[f"funding_{p}_avg_7d_pct"] = funding_avg_pct(payloads.get(f"funding:{s}"))
+        derivs[f"oi_{p}"] = _field(lin.get(s), "openInterestValue", 1e-9)
+    fl = flow(trades_arrays(payloads.get("trades")), now_ms)
+    bids, asks = book_arrays(payloads.get("orderbook"))
+    derivs |= {
+        "oi_change_24h_pct": oi_change_pct(payloads.get("oi")),
+        "taker_buy_sell_ratio": fl["ratio"],
+        "liquidations_buy_24h_usd": None,
+        "liquidations_sell_24h_usd": None,
+    }
+    volumes = {
+        "spot_volume_24h": _field(spot.get(calc_symbol), "turnover24h"),
+        "futures_volume_24h": _field(lin.get(calc_symbol), "turnover24h"),
+        "cumulative_delta_1h": fl["delta"],
+        "liquidations_24h_usd": None,
+    }
+    rounded = lambda d, nd: {k: (round(v, nd) if isinstance(v, float) else v) for k, v in d.items()}
+    return {
+        "derivs": rounded(derivs, 6),
+        "volume_analysis": rounded(volumes, 0),
+        "calc": {"orderbook_imbalance_pct": round(v, 2) if (v := imbalance_pct(bids, asks)) is not None else None},
+        "meta": {
+            "derivs_symbol": calc_symbol,
+            "delta_window_min": fl["window_min"],
+            "market_failed": sorted(k for k, v in payloads.items() if v is None),
+            "liquidations_source": "unavailable via REST v5",
+        },
+    }
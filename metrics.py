@@ -0,0 +1,163 @@
+# metrics.py — счётчики и гистограммы задержек без внешних зависимостей
+#
+# Один реестр на процесс (REGISTRY), потокобезопасный: main.py качает
+# Bybit из пулов потоков. Что меряем:
+#   bybit_request_seconds{endpoint,outcome}   — каждая попытка http_get_json
+#   upstream_retries_total{upstream}, upstream_backoff_seconds_total{upstream},
+#   upstream_circuit_open_total{upstream}, upstream_fail_fast_total{upstream},
+#   upstream_circuit_open{upstream} (1 — предохранитель разомкнут) — resilience.py
+#   github_fetch_seconds{source,outcome}      — raw / contents API / local
+#   github_api_seconds{op,outcome}            — Git Data API и листинги
+#   http_request_seconds{path,status}         — запросы к proxy.py
+# Выдача: render() — текстовый формат Prometheus (/metrics в proxy.py),
+# report() — JSON-сводка прогона (main.py кладёт её рядом со снапшотом).
+#
+#   with metrics.timer("github_fetch_seconds", source="raw") as t:
+#       ...
+#       t.labels["outcome"] = "miss"      # метки можно уточнить до выхода
+
+import math, time, threading
+from contextlib import contextmanager
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class _Hist:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, v: float):
+        for i, b in enumerate(BUCKETS):
+            if v <= b:
+                self.counts[i] += 1
+                break
+        self.sum += v
+        self.count += 1
+        self.max = max(self.max, v)
+
+class _Timer:
+    __slots__ = ("labels", "seconds")
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.seconds = None
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}     # (name, labels) -> float
+        self.hists = {}        # (name, labels) -> _Hist
+        self.gauges = {}       # name -> (label, fn), снимаются при выдаче
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        k = (name, _key(labels))
+        with self._lock:
+            self.counters[k] = self.counters.get(k, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        k = (name, _key(labels))
+        with self._lock:
+            h = self.hists.get(k)
+            if h is None:
+                h = self.hists[k] = _Hist()
+            h.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Меряет блок с меткой outcome: ok, error (исключение) или заданная в блоке."""
+        t = _Timer(dict(labels))
+        t0 = time.perf_counter()
+        try:
+            yield t
+        except BaseException:
+            t.labels.setdefault("outcome", "error")
+            raise
+        finally:
+            t.seconds = time.perf_counter() - t0
+            t.labels.setdefault("outcome", "ok")
+            self.observe(name, t.seconds, **t.labels)
+
+    def gauge(self, name: str, fn, label: str | None = None):
+        """fn() -> число, или {значение метки `label`: число}; снимается при render()."""
+        self.gauges[name] = (label, fn)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.hists.clear()
+            self.started = time.time()
+
+    # ---- выдача ----
+    def render(self) -> str:
+        """Текстовый формат Prometheus 0.0.4."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            hists = sorted((k, (list(h.counts), h.sum, h.count)) for k, h in self.hists.items())
+        lines = []
+        typed = set()
+
+        def head(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), v in counters:
+            head(name, "counter")
+            lines.append(f"{name}{_fmt(labels)} {_num(v)}")
+        for name, (label, fn) in sorted(self.gauges.items()):
+            head(name, "gauge")
+            values = fn() if label else {None: fn()}
+            for lv, v in values.items():
+                lines.append(f"{name}{_fmt(((label, lv),) if label else ())} {_num(v)}")
+        for (name, labels), (counts, total, n) in hists:
+            head(name, "histogram")
+            acc = 0
+            for b, c in zip(BUCKETS, counts):
+                acc += c
+                lines.append(f"{name}_bucket{_fmt(labels + (('le', _num(b)),))} {acc}")
+            lines.append(f"{name}_bucket{_fmt(labels + (('le', '+Inf'),))} {n}")
+            lines.append(f"{name}_sum{_fmt(labels)} {_num(total)}")
+            lines.append(f"{name}_count{_fmt(labels)} {n}")
+        return "\n".join(lines) + "\n"
+
+    def report(self, **extra) -> dict:
+        """JSON-сводка: по каждой паре (метрика, метки) — число, сумма, максимум."""
+        with self._lock:
+            timings = [{"name": name, **dict(labels), "count": h.count,
+                        "total_s": round(h.sum, 4), "max_s": round(h.max, 4)}
+                       for (name, labels), h in sorted(self.hists.items())]
+            counters = [{"name": name, **dict(labels), "value": v}
+                        for (name, labels), v in sorted(self.counters.items())]
+        return {"started_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started)),
+                "elapsed_s": round(time.time() - self.started, 3),
+                **extra, "timings": timings, "counters": counters}
+
+def _num(v) -> str:
+    if isinstance(v, float):
+        if math.isinf(v):
+            return "+Inf" if v > 0 else "-Inf"
+        return repr(v) if v != int(v) else str(int(v))
+    return str(v)
+
+def _fmt(labels: tuple) -> str:
+    if not labels:
+        return ""
+    esc = lambda s: str(s).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}"
+
+REGISTRY = Registry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+gauge = REGISTRY.gauge
+render = REGISTRY.render
+report = REGISTRY.report
+reset = REGISTRY.reset
@@ -1,11 +1,37 @@
 # parser.py — агрегирует snapshots/*.json в analytics/daily_summary.csv
 # и генерирует analytics/README.md с таблицей ссылок и метрик.
-# ENV: GITHUB_TOKEN, GITHUB_REPO, GITHUB_PATH (напр. "snapshots/")
+# ENV: GITHUB_TOKEN, GITHUB_REPO, GITHUB_BRANCH, GITHUB_PATH (напр. "snapshots/")
+#      PARSER_FULL=1 — игнорировать манифест и пересобрать всё с нуля
+#      PARSER_WORKERS (по умолчанию 8) — сколько снапшотов качать параллельно
+#      GITHUB_API — базовый URL API (для локальной заглушки в тестах)
+#      SNAPSHOT_DIR, SNAPSHOT_REMOTE — см. store.py; при SNAPSHOT_REMOTE=none парсер
+#      работает офлайн: читает локальную папку и пишет в ANALYTICS_DIR
+#
+# Инкрементальный режим: манифест хранит имена обработанных снапшотов, их blob SHA
+# (их отдаёт листинг Git Trees API) и извлечённые поля. Скачиваются только
+# новые/изменённые файлы, остальные строки берутся из манифеста. Там же лежат
+# числовые поля для колоночной истории analytics/history.npy (см. history.py).
+# Манифест разбит по месяцам: analytics/manifest.json — маленький индекс
+# {version, path, shards: {"YYYY-MM": хеш листинга месяца}}, записи дней — в
+# analytics/manifest/YYYY-MM.json (компактный JSON). Новый день меняет один
+# месячный файл, остальные GitBatch не перезаливает (тот же blob SHA); если
+# хеши листинга совпали с индексом, месячные файлы не читаются вовсе.
 
-import os, json, base64, csv, io, urllib.request, urllib.parse
+import os, json, csv, io, hashlib, urllib.error, urllib.request, urllib.parse
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
-GITHUB_API = "https://api.github.com"
+import history, metrics
+from store import open_store, git_blob_sha, github_request, GitBatch, BRANCH, API_BASE
+
+GITHUB_API = API_BASE
+MANIFEST_PATH = "analytics/manifest.json"
+HISTORY_PATH = "analytics/history.npy"
+MANIFEST_DIR = "analytics/manifest"
+MANIFEST_VERSION = 3
+FULL_REBUILD = os.environ.get("PARSER_FULL", "").strip().lower() in ("1", "true", "yes")
+ANALYTICS_DIR = os.environ.get("ANALYTICS_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "analytics")
+WORKERS = max(1, int(os.environ.get("PARSER_WORKERS", "8")))
 
 def gh_request(url, token, method="GET", payload=None):
     headers = {
@@ -18,36 +44,40 @@ def gh_request(url, token, method="GET", payload=None):
         data = json.dumps(payload).encode()
         headers["Content-Type"] = "application/json"
     req = urllib.request.Request(url, data=data, headers=headers, method=method)
-    with urllib.request.urlopen(req, timeout=20) as r:
-        return json.loads(r.read().decode())
+    return json.loads(github_request(req, "github-api", "github_api_seconds", op=f"{method} contents"))
 
 def list_snapshot_files(repo, path, token):
-    url = f"{GITHUB_API}/repos/{repo}/contents/{path}"
-    items = gh_request(url, token)
-    return [it for it in items if it.get("type")=="file" and it["name"].endswith(".json")]
-
-def get_file_json(repo, path, token):
-    url = f"{GITHUB_API}/repos/{repo}/contents/{path}"
-    item = gh_request(url, token)
-    raw = base64.b64decode(item.get("content","")).decode()
-    return json.loads(raw)
-
-def upload_file(repo, path, token, content_str, message="update file"):
-    get_url = f"{GITHUB_API}/repos/{repo}/contents/{path}"
-    sha = None
-    try:
-        res = gh_request(get_url, token)
-        sha = res.get("sha")
-    except Exception:
-        sha = None
-    payload = {
-        "message": message,
-        "content": base64.b64encode(content_str.encode()).decode(),
-        "branch": "main"
-    }
-    if sha:
-        payload["sha"] = sha
-    return gh_request(get_url, token, method="PUT", payload=payload)
+    """Файлы папки с blob SHA через Git Trees API: листинг contents API обрезается
+    на 1000 записях (~500 дней), и новые снапшоты из него молча пропадали бы."""
+    ref = urllib.parse.quote(f"{BRANCH}:{path.strip('/')}", safe=":/")
+    t = gh_request(f"{GITHUB_API}/repos/{repo}/git/trees/{ref}", token)
+    if t.get("truncated"):
+        raise ValueError(f"{path}: tree listing truncated by GitHub")
+    return [{"name": e["path"], "type": "file", "sha": e["sha"]} for e in t.get("tree", [])
+            if e.get("type") == "blob" and e["path"].endswith(".json")]
+
+def list_local_files(store):
+    """Офлайн-аналог list_snapshot_files: имена и blob SHA из локальной папки."""
+    return [{"name": n, "type": "file", "sha": git_blob_sha(store.local.read_bytes(n))}
+            for n in store.local.names()]
+
+def get_snapshot(store, name, sha):
+    """Снапшот из хранилища (локальная копия с тем же SHA или GitHub; повторы
+    сетевых сбоев — внутри store, см. resilience.py)."""
+    data = store.get(name, sha)
+    if data is None:
+        raise FileNotFoundError(name)
+    return data
+
+def fetch_snapshots(store, items, workers=WORKERS):
+    """Параллельно достаёт снапшоты пулом из `workers` потоков.
+    Возвращает {name: data} — результат не зависит от порядка завершения."""
+    if not items:
+        return {}
+    names = [it["name"] for it in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        datas = pool.map(lambda it: get_snapshot(store, it["name"], it.get("sha")), items)
+        return dict(zip(names, datas))
 
 def safe(d, path, default=""):
     cur = d
@@ -61,22 +91,179 @@ def pct(a, b):
         return (float(b)/float(a)-1.0)*100.0
     except: return ""
 
+# ---- Поля, которые попадают в CSV/README (кэшируются в манифесте) ----
+SUMMARY_FIELDS = [
+    ("eth_spot","last"), ("btc_spot","last"),
+    ("derivs","funding_eth_pct"), ("derivs","oi_eth"),
+    ("calc","atr_1d"), ("calc","vwap_today"), ("calc","orderbook_imbalance_pct"),
+    ("levels","support",0), ("levels","support",1),
+    ("levels","resistance",0), ("levels","resistance",1),
+]
+
+def field_key(path):
+    return ".".join(str(p) for p in path)
+
+def extract_fields(data):
+    """Плоский срез снапшота: {"calc.atr_1d": 16.5, ...}; отсутствующие поля — ""."""
+    return {field_key(p): safe(data, p, "") for p in SUMMARY_FIELDS}
+
+def snapshot_mode(name):
+    """YYYY-MM-DD_mode.json -> (date, mode) или None."""
+    if "_" not in name: return None
+    date_part, rest = name.split("_", 1)
+    mode = "forecast" if "forecast" in rest else ("review" if "review" in rest else None)
+    if not mode: return None
+    return date_part, mode
+
+def local_path(path):
+    """analytics/<путь> -> файл в ANALYTICS_DIR (подпапки сохраняются)."""
+    return os.path.join(ANALYTICS_DIR, *path.split("/")[1:])
+
+def read_output(repo, token, path, offline):
+    """Ранее опубликованный файл analytics/* (str) или None."""
+    if offline:
+        try:
+            with open(local_path(path), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    # raw media type: в JSON contents API base64 есть только для файлов до 1 МБ,
+    # крупнее приходит пустой content — манифест молча «терялся» бы
+    req = urllib.request.Request(f"{GITHUB_API}/repos/{repo}/contents/{path}", headers={
+        "Authorization": f"token {token}",
+        "Accept": "application/vnd.github.raw",
+        "User-Agent": "snapshot-parser/1.0",
+    })
+    try:
+        return github_request(req, "github-api", "github_api_seconds", op="GET raw").decode()
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+
+def publish(repo, token, files, message, offline):
+    """{path: str|bytes} -> один коммит в репозиторий (неизменённые файлы пропускаются)
+    или, офлайн, файлы в ANALYTICS_DIR."""
+    if offline:
+        for path, content in files.items():
+            data = content if isinstance(content, bytes) else content.encode()
+            os.makedirs(os.path.dirname(local_path(path)), exist_ok=True)
+            with open(local_path(path), "wb") as f:
+                f.write(data)
+        return
+    GitBatch(repo, BRANCH, token).commit(files, message)
+
+def shard_path(month):
+    return f"{MANIFEST_DIR}/{month}.json"
+
+def _read_json(repo, token, path, offline):
+    """JSON-объект из analytics/* или None, если файла нет. Битый файл — ValueError:
+    тихая полная пересборка скрыла бы проблему."""
+    text = read_output(repo, token, path, offline)
+    if text is None:
+        return None
+    try:
+        obj = json.loads(text)
+    except ValueError as e:
+        raise ValueError(f"{path}: cannot decode manifest ({e}); use PARSER_FULL=1 to rebuild") from e
+    if not isinstance(obj, dict):
+        raise ValueError(f"{path}: manifest is not an object; use PARSER_FULL=1 to rebuild")
+    return obj
+
+def listing_digests(files):
+    """Листинг [{name, sha}] -> {"YYYY-MM": хеш имён и SHA снапшотов месяца}."""
+    months = defaultdict(list)
+    for it in files:
+        months[it["name"][:7]].append(f'{it["name"]} {it.get("sha")}')    # YYYY-MM-DD_mode.json
+    return {mo: hashlib.sha1("\n".join(sorted(lines)).encode()).hexdigest() for mo, lines in months.items()}
+
+def load_index(repo, token, snap_path, offline=False):
+    """Индекс манифеста {"YYYY-MM": хеш}; пусто, если его нет или он от другой папки/версии."""
+    m = _read_json(repo, token, MANIFEST_PATH, offline)
+    if m is None or m.get("version") != MANIFEST_VERSION or m.get("path") != snap_path:
+        return {}
+    return m.get("shards") or {}
+
+def load_shards(repo, token, shards, offline=False, workers=WORKERS):
+    """Записи манифеста {name: entry} из месячных файлов (параллельно);
+    пропавший месяц — ValueError."""
+    if not shards:
+        return {}
+    shards = sorted(shards)
+    with ThreadPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+        parts = list(pool.map(lambda mo: _read_json(repo, token, shard_path(mo), offline), shards))
+    entries = {}
+    for month, part in zip(shards, parts):
+        if part is None:
+            raise ValueError(f"{shard_path(month)}: listed in {MANIFEST_PATH} but missing; use PARSER_FULL=1 to rebuild")
+        entries.update(part)
+    return entries
+
+def load_manifest(repo, token, snap_path, offline=False):
+    """Все записи манифеста {name: entry}; пусто, если его нет или он от другой папки/версии."""
+    return load_shards(repo, token, load_index(repo, token, snap_path, offline), offline)
+
+def manifest_files(entries, snap_path):
+    """{name: entry} -> {путь: JSON} индекса и месячных файлов. Сериализация
+    детерминированная: неизменённый месяц даёт тот же blob SHA."""
+    months = defaultdict(dict)
+    for name, entry in entries.items():
+        months[name[:7]][name] = entry
+    dump = lambda obj: json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    out = {shard_path(mo): dump(part) for mo, part in months.items()}
+    digests = listing_digests({"name": n, "sha": e.get("sha")} for n, e in entries.items())
+    out[MANIFEST_PATH] = json.dumps({"version": MANIFEST_VERSION, "path": snap_path, "shards": digests},
+                                    ensure_ascii=False, indent=1, sort_keys=True)
+    return out
+
 def main():
-    token = os.environ["GITHUB_TOKEN"]
-    repo  = os.environ["GITHUB_REPO"]
+    store = open_store(os.environ.get("GITHUB_TOKEN"))
+    offline = store.remote is None
+    token = "" if offline else os.environ["GITHUB_TOKEN"]
+    repo  = "" if offline else os.environ["GITHUB_REPO"]
     snap_path = os.environ.get("GITHUB_PATH","snapshots/").rstrip("/") + "/"
 
-    files = list_snapshot_files(repo, snap_path, token)
+    files = list_local_files(store) if offline else list_snapshot_files(repo, snap_path, token)
+    files = [it for it in files if snapshot_mode(it["name"])]    # YYYY-MM-DD_mode.json
+    index = {} if FULL_REBUILD else load_index(repo, token, snap_path, offline)
+    if index and index == listing_digests(files):
+        print("OK: no new snapshots — analytics up to date")
+        print("timings:", json.dumps(metrics.report()["timings"], ensure_ascii=False))
+        return
+    known = load_shards(repo, token, index, offline)
 
-    by_date = defaultdict(dict)
+    # сверяем листинг с манифестом по blob SHA — качаем только новое/изменённое
+    entries = {}
+    changed = []
     for it in files:
-        name = it["name"]  # YYYY-MM-DD_mode.json
-        if "_" not in name: continue
-        date_part, rest = name.split("_", 1)
-        mode = "forecast" if "forecast" in rest else ("review" if "review" in rest else None)
-        if not mode: continue
-        data = get_file_json(repo, f"{snap_path}{name}", token)
-        by_date[date_part][mode] = data
+        name = it["name"]
+        prev = known.get(name)
+        if prev and it.get("sha") and prev.get("sha") == it["sha"]:
+            entries[name] = prev
+        else:
+            changed.append(it)
+
+    fetched = fetch_snapshots(store, changed)
+    for it in changed:
+        data = fetched[it["name"]]
+        entries[it["name"]] = {
+            "sha": it.get("sha"),
+            "fields": extract_fields(data),
+            "history": history.numeric_fields(data, snapshot_mode(it["name"])[1]),
+        }
+
+    if known and not changed and entries.keys() == known.keys():
+        print("OK: no new snapshots — analytics up to date")
+        print("timings:", json.dumps(metrics.report()["timings"], ensure_ascii=False))
+        return
+    print(f"Snapshots: {len(entries)} total, {len(changed)} fetched")
+
+    by_date = defaultdict(dict)
+    hist_rows = defaultdict(dict)
+    for name, entry in entries.items():
+        date_part, mode = snapshot_mode(name)
+        by_date[date_part][mode] = entry["fields"]
+        hist_rows[date_part].update(entry["history"])
 
     # ---- CSV ----
     headers = [
@@ -102,50 +289,61 @@ def main():
         try: return float(x)
         except: return ""
 
+    def g(fields, *path):
+        return fields.get(field_key(path), "")
+
     for date_key in sorted(by_date.keys()):
         f = by_date[date_key].get("forecast", {})
         r = by_date[date_key].get("review",   {})
 
-        eth_f = safe(f, ["eth_spot","last"], ""); eth_r = safe(r, ["eth_spot","last"], "")
-        btc_f = safe(f, ["btc_spot","last"], ""); btc_r = safe(r, ["btc_spot","last"], "")
+        eth_f = g(f, "eth_spot","last"); eth_r = g(r, "eth_spot","last")
+        btc_f = g(f, "btc_spot","last"); btc_r = g(r, "btc_spot","last")
         d_eth = pct(eth_f, eth_r); d_btc = pct(btc_f, btc_r)
 
         row = [
             date_key,
             n(eth_f), n(eth_r), d_eth,
             n(btc_f), n(btc_r), d_btc,
-            n(safe(f, ["derivs","funding_eth_pct"], "")),
-            n(safe(r, ["derivs","funding_eth_pct"], "")),
-            n(safe(f, ["derivs","oi_eth"], "")),
-            n(safe(r, ["derivs","oi_eth"], "")),
-            n(safe(f, ["calc","atr_1d"], "")),
-            n(safe(r, ["calc","vwap_today"], "")),
-            n(safe(f, ["calc","orderbook_imbalance_pct"], "")),
-            n(safe(f, ["levels","support",0], "")),
-            n(safe(f, ["levels","support",1], "")),
-            n(safe(f, ["levels","resistance",0], "")),
-            n(safe(f, ["levels","resistance",1], "")),
+            n(g(f, "derivs","funding_eth_pct")),
+            n(g(r, "derivs","funding_eth_pct")),
+            n(g(f, "derivs","oi_eth")),
+            n(g(r, "derivs","oi_eth")),
+            n(g(f, "calc","atr_1d")),
+            n(g(r, "calc","vwap_today")),
+            n(g(f, "calc","orderbook_imbalance_pct")),
+            n(g(f, "levels","support",0)),
+            n(g(f, "levels","support",1)),
+            n(g(f, "levels","resistance",0)),
+            n(g(f, "levels","resistance",1)),
         ]
         w.writerow(row)
 
         # Markdown-строка
         link_f = f"[forecast]({snap_path}{date_key}_forecast.json)"
         link_r = f"[review]({snap_path}{date_key}_review.json)" if "review" in by_date[date_key] else "—"
-        levels = f"S: {safe(f,['levels','support',0],'')}/{safe(f,['levels','support',1],'')} • R: {safe(f,['levels','resistance',0],'')}/{safe(f,['levels','resistance',1],'')}"
+        levels = f"S: {g(f, 'levels','support',0)}/{g(f, 'levels','support',1)} • R: {g(f, 'levels','resistance',0)}/{g(f, 'levels','resistance',1)}"
         rows_md.append(
             f"| {date_key} | {link_f} | {link_r} | "
             f"{'' if d_eth=='' else f'{d_eth:.2f}%'} | {'' if d_btc=='' else f'{d_btc:.2f}%'} | "
-            f"{safe(f,['derivs','funding_eth_pct'],'')} / {safe(r,['derivs','funding_eth_pct'],'')} | "
-            f"{safe(f,['derivs','oi_eth'],'')} / {safe(r,['derivs','oi_eth'],'')} | "
-            f"{safe(f,['calc','atr_1d'],'')} | {safe(r,['calc','vwap_today'],'')} | {levels} |\n"
+            f"{g(f, 'derivs','funding_eth_pct')} / {g(r, 'derivs','funding_eth_pct')} | "
+            f"{g(f, 'derivs','oi_eth')} / {g(r, 'derivs','oi_eth')} | "
+            f"{g(f, 'calc','atr_1d')} | {g(r, 'calc','vwap_today')} | {levels} |\n"
         )
 
     csv_str = out_csv.getvalue(); out_csv.close()
     md_str  = "".join(rows_md)
 
-    upload_file(repo, "analytics/daily_summary.csv", token, csv_str, "build analytics/daily_summary.csv")
-    upload_file(repo, "analytics/README.md",       token, md_str,  "build analytics/README.md")
+    # CSV, README, история и манифест — одним коммитом: манифест не может
+    # разойтись с файлами, которые он описывает
+    publish(repo, token, {
+        "analytics/daily_summary.csv": csv_str,
+        "analytics/README.md": md_str,
+        # история собирается из числовых полей манифеста — без повторного разбора JSON
+        HISTORY_PATH: history.to_bytes(history.build(hist_rows)),
+        **manifest_files(entries, snap_path),
+    }, "build analytics", offline)
     print("OK: analytics CSV & README updated")
+    print("timings:", json.dumps(metrics.report()["timings"], ensure_ascii=False))
 
 if __name__ == "__main__":
     main()
@@ -4,22 +4,89 @@
 #   GITHUB_BRANCH="main"            (опц., по умолчанию main)
 #   GITHUB_PATH="snapshots"         (опц., по умолчанию snapshots)
 #   PROXY_TOKEN="<секрет>"          (опц., если хочешь защиту)
+#   GITHUB_TOKEN="<токен>"          (опц., запросы к GitHub с ним: 5000/ч вместо 60/ч без токена)
+#   CACHE_MAX="512"                 (опц., сколько снапшотов держать в памяти)
+#   CACHE_TTL="60"                  (опц., сек — TTL для сегодняшних снапшотов)
+#   CACHE_MISS_TTL="30"             (опц., сек — сколько помнить, что снапшота нет (404))
+#   SNAPSHOT_DIR, SNAPSHOT_REMOTE   (опц., локальная папка и удалённый источник — см. store.py)
+#   HTTP_POOL="20"                  (опц., макс. соединений к GitHub в общем пуле)
+#   RANGE_MAX_DAYS="366"            (опц., макс. длина диапазона для /snapshots)
+#   RANGE_CONCURRENCY="8"           (опц., параллельных выборок на один /snapshots)
+#   SUMMARY_REFRESH="300"           (опц., сек — как часто искать новые снапшоты для /summary;
+#                                    листинг условный, 304 не расходует лимит GitHub)
+#   UPSTREAM_DEADLINE="8"           (опц., сек — предел на один запрос к GitHub вместе с повторами)
+#
+# /metrics — счётчики и гистограммы задержек в формате Prometheus (см. metrics.py)
+# /snapshot, /today: ETag + 304 на If-None-Match, gzip (и br, если стоит пакет
+# brotli) по Accept-Encoding, format=msgpack (или Accept: application/msgpack) —
+# если стоит пакет msgpack; fields= — только нужные поля
 #
 # Deploy как Web Service на Render: Command = `uvicorn proxy:app --host 0.0.0.0 --port 10000`
 
-import os, base64, json, urllib.request, urllib.parse
-from fastapi import FastAPI, HTTPException, Response, Query
+import os, io, csv, gzip, time, base64, json, hashlib, asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, date as Date, timedelta
+from zoneinfo import ZoneInfo
+import httpx
+from fastapi import FastAPI, HTTPException, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+import metrics, resilience, summary
+from history import json_number
+from store import open_store, snapshot_name, git_blob_sha, RAW_BASE, API_BASE
 
 REPO   = os.getenv("GITHUB_REPO", "anton-baton-sem/bybit-tg-bot")
 BRANCH = os.getenv("GITHUB_BRANCH", "main")
 SNPATH = os.getenv("GITHUB_PATH", "snapshots")
 PTOKEN = os.getenv("PROXY_TOKEN")   # если задан — запросы должны передавать token=<...>
+GTOKEN = os.getenv("GITHUB_TOKEN")
+
+# локальная папка — основной путь чтения; GitHub — только если файла там нет
+STORE = open_store()
+
+TZ = ZoneInfo("Europe/Podgorica")
+
+CACHE_MAX = int(os.getenv("CACHE_MAX", "512"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+CACHE_MISS_TTL = float(os.getenv("CACHE_MISS_TTL", "30"))
+HTTP_POOL = int(os.getenv("HTTP_POOL", "20"))
+RANGE_MAX_DAYS = int(os.getenv("RANGE_MAX_DAYS", "366"))
+RANGE_CONCURRENCY = int(os.getenv("RANGE_CONCURRENCY", "8"))
+SUMMARY_REFRESH = float(os.getenv("SUMMARY_REFRESH", "300"))
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "8"))
+# короче, чем у main.py/parser.py: клиент ждёт ответа, а устаревший снапшот лучше долгой ошибки
+GITHUB_POLICY = resilience.Policy(attempts=2, base=0.2, cap=1.0, timeout=5.0, max_wait=2.0)
+# транспорт httpx для GitHub: None — сеть; подменяется до старта (bench/, заглушки)
+TRANSPORT: httpx.AsyncBaseTransport | None = None
 
-RAW_BASE = "https://raw.githubusercontent.com"
-API_BASE = "https://api.github.com"
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # один keep-alive пул на весь процесс: без нового TCP+TLS на каждый запрос
+    async with httpx.AsyncClient(
+        timeout=12,
+        headers={"User-Agent":"Proxy/1.0"},
+        limits=httpx.Limits(max_connections=HTTP_POOL, max_keepalive_connections=HTTP_POOL),
+        transport=TRANSPORT,
+    ) as client:
+        app.state.http = client
+        refresher = asyncio.create_task(summary_loop())
+        try:
+            yield
+        finally:
+            refresher.cancel()
 
-app = FastAPI(title="GitHub Snapshot Proxy")
+app = FastAPI(title="GitHub Snapshot Proxy", lifespan=lifespan)
 
 # Разрешим CORS на всякий случай
 app.add_middleware(
@@ -27,38 +94,304 @@ app.add_middleware(
     allow_origins=["*"], allow_methods=["GET"], allow_headers=["*"],
 )
 
-def http_get(url, headers=None, timeout=12):
-    req = urllib.request.Request(url, headers=headers or {"User-Agent":"Proxy/1.0"})
-    with urllib.request.urlopen(req, timeout=timeout) as r:
-        return r.read(), r.getcode(), r.headers
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # шаблон маршрута, а не сырой путь: у /snapshot?date=... одна серия, а не по дате
+        route = request.scope.get("route")
+        path = getattr(route, "path", "other")
+        metrics.observe("http_request_seconds", time.perf_counter() - t0, path=path, status=status)
+
+async def http_get(url, headers=None, timeout=12.0):
+    r = await app.state.http.get(url, headers=headers, timeout=timeout)
+    return r.content, r.status_code, r.headers
+
+def gh_headers(etag: str | None = None, **extra) -> dict:
+    """Заголовки запроса к GitHub: токен, если задан, и If-None-Match для условного запроса."""
+    h = {"User-Agent": "Proxy/1.0"}
+    if GTOKEN:
+        h["Authorization"] = f"token {GTOKEN}"
+    if etag:
+        h["If-None-Match"] = etag
+    return h | extra
+
+async def upstream_get(url, upstream: str, headers=None):
+    """http_get по правилам resilience: 2xx/304 — ответ, прочее — UpstreamError.
+    Сеть, 5xx и лимиты повторяются в пределах UPSTREAM_DEADLINE; при открытом
+    предохранителе апстрима — сразу CircuitOpen, без ожидания таймаута."""
+    async def attempt(timeout):
+        body, code, hdrs = await http_get(url, headers, timeout)
+        if code >= 400:
+            raise resilience.UpstreamError(code, hdrs)
+        return body, code, hdrs
+    return await resilience.acall(attempt, GITHUB_POLICY, resilience.breaker(upstream),
+                                  resilience.Deadline(UPSTREAM_DEADLINE), name=upstream)
 
-def fetch_snapshot(date_str: str, snap_type: str):
-    # 1) raw
-    rel = f"{SNPATH}/{date_str}_{snap_type}.json"
-    raw_url = f"{RAW_BASE}/{REPO}/{BRANCH}/{rel}"
+# ---------- Кэш снапшотов ----------
+# LRU по ключу (date, type). Прошедшие дни неизменны — отдаём из памяти без
+# запросов к GitHub. Сегодняшние (и будущие) живут CACHE_TTL секунд, после чего
+# перепроверяются условным запросом (If-None-Match) к тому же источнику.
+# Снапшота нет ни в одном источнике (404) — запись-промах {"missing": True}
+# живёт CACHE_MISS_TTL секунд: повторные запросы такого дня не ходят в GitHub.
+# Весь доступ идёт из event loop, поэтому блокировки не нужны.
+class SnapshotCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.coalesced = 0
+        self.rendered = 0
+
+    def get(self, key):
+        entry = self._items.get(key)
+        if entry is not None:
+            self._items.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self._items[key] = entry
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated,
+                "coalesced": self.coalesced, "rendered": self.rendered, "size": len(self._items)}
+
+CACHE = SnapshotCache(CACHE_MAX)
+metrics.gauge("snapshot_cache", CACHE.stats, label="stat")
+
+def _iso_or_400(d: str | None, name: str) -> str | None:
+    if d is None:
+        return None
     try:
-        body, code, _ = http_get(raw_url)
-        if code == 200:
-            return json.loads(body.decode("utf-8"))
-    except Exception:
-        pass
-    # 2) API fallback
-    api_url = f"{API_BASE}/repos/{REPO}/contents/{rel}?ref={BRANCH}"
+        return Date.fromisoformat(d).isoformat()
+    except ValueError:
+        raise HTTPException(400, f"{name} must be YYYY-MM-DD")
+
+def is_past_date(date_str: str) -> bool:
+    return Date.fromisoformat(date_str) < datetime.now(TZ).date()
+
+# Источники возвращают (bytes, etag); (None, etag) — не изменилось с etag.
+async def _fetch_local(name: str, etag: str | None = None):
+    data = STORE.local.read_bytes(name)
+    if data is None:
+        raise FileNotFoundError(name)
+    sha = git_blob_sha(data)
+    return (None, etag) if sha == etag else (data, sha)
+
+async def _fetch_raw(name: str, etag: str | None = None):
+    body, code, hdrs = await upstream_get(f"{RAW_BASE}/{REPO}/{BRANCH}/{SNPATH}/{name}", "github-raw",
+                                          gh_headers(etag))
+    if code == 304:
+        return None, etag
+    return body, hdrs.get("ETag")
+
+async def _fetch_api(name: str, etag: str | None = None):
+    body, code, hdrs = await upstream_get(f"{API_BASE}/repos/{REPO}/contents/{SNPATH}/{name}?ref={BRANCH}",
+                                          "github-api", gh_headers(etag, Accept="application/vnd.github+json"))
+    if code == 304:
+        return None, etag
+    obj = json.loads(body.decode("utf-8"))
+    content = obj.get("content", "")
+    return base64.b64decode(content), hdrs.get("ETag")
+
+FETCHERS = {"local": _fetch_local, "raw": _fetch_raw, "api": _fetch_api}
+SOURCES = ("local", "raw", "api") if STORE.remote is not None else ("local",)
+
+async def _revalidate(name: str, entry: dict) -> dict | None:
+    """Условный запрос к источнику записи. None — не удалось (отдадим устаревшее)."""
     try:
-        body, code, _ = http_get(api_url, headers={"User-Agent":"Proxy/1.0","Accept":"application/vnd.github+json"})
-        if code == 200:
-            obj = json.loads(body.decode("utf-8"))
-            content = obj.get("content", "")
-            data = base64.b64decode(content).decode("utf-8")
-            return json.loads(data)
+        with metrics.timer("github_fetch_seconds", source=entry["source"], kind="revalidate") as t:
+            body, etag = await FETCHERS[entry["source"]](name, entry.get("etag"))
+            data = json.loads(body.decode("utf-8")) if body is not None else None
+            if body is None:
+                t.labels["outcome"] = "not_modified"
     except Exception:
-        pass
+        return None
+    if data is None:
+        CACHE.revalidated += 1
+        return entry | {"checked_at": time.monotonic()}
+    return entry | {"data": data, "etag": etag, "checked_at": time.monotonic(), "rendered": {}}
+
+async def _load(date_str: str, snap_type: str, entry: dict | None):
+    name = snapshot_name(date_str, snap_type)
+    key = (date_str, snap_type)
+    immutable = is_past_date(date_str)
+    if entry is not None:
+        fresh = await _revalidate(name, entry)
+        if fresh is None:
+            return entry["data"]
+        fresh["immutable"] = immutable
+        CACHE.put(key, fresh)
+        return fresh["data"]
+
+    CACHE.misses += 1
+    # 1) локальная папка, 2) raw, 3) API fallback
+    absent = True   # все источники ответили «нет такого файла», а не ошибкой
+    for source in SOURCES:
+        try:
+            with metrics.timer("github_fetch_seconds", source=source, kind="load"):
+                body, etag = await FETCHERS[source](name)
+                data = json.loads(body.decode("utf-8"))
+        except FileNotFoundError:
+            continue
+        except resilience.UpstreamError as e:
+            absent = absent and e.status == 404
+            continue
+        except Exception:
+            absent = False
+            continue
+        if immutable and source != "local":
+            # прошедший день больше не изменится — кладём на диск, переживёт рестарт
+            STORE.local.write_bytes(name, body)
+        CACHE.put(key, {
+            "data": data, "etag": etag, "source": source,
+            "checked_at": time.monotonic(), "immutable": immutable, "rendered": {},
+        })
+        return data
+    if absent:
+        CACHE.put(key, {"data": None, "missing": True, "checked_at": time.monotonic(),
+                        "immutable": False, "rendered": {}})
     raise HTTPException(status_code=404, detail="snapshot not found")
 
+# ключ -> задача, которая сейчас грузит его из GitHub: пачка одинаковых
+# запросов ждёт одну и ту же выборку вместо N параллельных
+_INFLIGHT: dict[tuple[str, str], asyncio.Task] = {}
+
+async def fetch_snapshot(date_str: str, snap_type: str, fresh: bool = False):
+    """fresh=True — мимо кэша: запись из кэша перепроверяется условным запросом."""
+    # дата идёт в имя файла: только настоящая YYYY-MM-DD, иначе 400 до кэша и хранилища
+    date_str = _iso_or_400(date_str, "date")
+    key = (date_str, snap_type)
+    entry = CACHE.get(key)
+    if entry is not None and entry.get("missing"):
+        if not fresh and time.monotonic() - entry["checked_at"] < CACHE_MISS_TTL:
+            CACHE.hits += 1
+            raise HTTPException(status_code=404, detail="snapshot not found")
+        entry = None    # промах устарел — ищем заново во всех источниках
+    if entry is not None and not fresh and (entry["immutable"] or time.monotonic() - entry["checked_at"] < CACHE_TTL):
+        CACHE.hits += 1
+        return entry["data"]
+
+    task = _INFLIGHT.get(key)
+    if task is not None:
+        CACHE.coalesced += 1
+    else:
+        task = asyncio.create_task(_load(date_str, snap_type, entry))
+        _INFLIGHT[key] = task
+        task.add_done_callback(lambda _: _INFLIGHT.pop(key, None))
+    # shield: отмена одного клиента не должна обрывать выборку для остальных
+    return await asyncio.shield(task)
+
+def parse_fields(fields: str | None) -> list[str]:
+    return [f.strip() for f in (fields or "").split(",") if f.strip()]
+
+def project(data: dict, fields: list[str]) -> dict:
+    """Оставляет в снапшоте только пути из fields ("eth_spot", "compare.bias")."""
+    out = {}
+    for path in fields:
+        parts = path.split(".")
+        cur = data
+        for p in parts:
+            if not isinstance(cur, dict) or p not in cur:
+                break
+            cur = cur[p]
+        else:
+            dst = out
+            for p in parts[:-1]:
+                dst = dst.setdefault(p, {})
+            dst[parts[-1]] = cur
+    return out
+
+# ---------- Готовые ответы ----------
+# Снапшот не меняется, пока жива запись кэша, поэтому итоговые байты ответа
+# (JSON или msgpack, с проекцией fields) и их сжатые варианты считаются один
+# раз и лежат в самой записи ("rendered"). Горячий запрос — выбор варианта по
+# Accept-Encoding и заголовки, без json.loads/dumps и сжатия.
+MEDIA = {"json": "application/json", "msgpack": "application/msgpack"}
+COMPRESS_MIN = 512          # меньше — сжатие не окупает заголовков
+RENDERED_MAX = 16           # вариантов (fields, format) на один снапшот
+
+def render(data: dict, fields: list[str], fmt: str) -> dict:
+    """{"etag", "identity", "gzip"[, "br"]} — тело ответа и его сжатые варианты."""
+    obj = project(data, fields) if fields else data
+    if fmt == "msgpack":
+        body = msgpack.packb(obj, use_bin_type=True)
+    else:
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    # слабый ETag: одинаков для всех Content-Encoding одного тела
+    out = {"etag": f'W/"{hashlib.sha1(body).hexdigest()[:20]}"', "identity": body}
+    if len(body) >= COMPRESS_MIN:
+        out["gzip"] = gzip.compress(body, 6, mtime=0)
+        if brotli is not None:
+            out["br"] = brotli.compress(body, quality=5)
+    return out
+
+def _not_modified(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    return bool(inm) and (inm.strip() == "*" or etag in (t.strip() for t in inm.split(",")))
+
+def pick_encoding(accept: str | None, variants: dict) -> str:
+    """Лучшая из имеющихся кодировок, которую принимает клиент: br > gzip > identity."""
+    q = {}
+    for part in (accept or "").lower().split(","):
+        name, _, params = part.partition(";")
+        params = params.strip()
+        try:
+            q[name.strip()] = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            q[name.strip()] = 0.0
+    for enc in ("br", "gzip"):
+        if enc in variants and q.get(enc, q.get("*", 0.0)) > 0:
+            return enc
+    return "identity"
+
+def response_format(request: Request, fmt: str | None) -> str:
+    if fmt is None:
+        fmt = "msgpack" if "msgpack" in request.headers.get("accept", "") and msgpack is not None else "json"
+    if fmt == "msgpack" and msgpack is None:
+        raise HTTPException(status_code=406, detail="msgpack is not installed on the proxy")
+    return fmt
+
+async def snapshot_reply(request: Request, date_str: str, snap_type: str, fields: str | None, fmt: str | None):
+    fmt = response_format(request, fmt)
+    date_str = _iso_or_400(date_str, "date")
+    data = await fetch_snapshot(date_str, snap_type)
+    entry = CACHE.get((date_str, snap_type))
+    # запись могли вытеснить или заменить, пока ждали, — тогда собираем без кэша
+    cached = entry["rendered"] if entry is not None and entry["data"] is data else {}
+    key = (tuple(parse_fields(fields)), fmt)
+    r = cached.get(key)
+    if r is None:
+        r = render(data, list(key[0]), fmt)
+        CACHE.rendered += 1
+        if len(cached) >= RENDERED_MAX:
+            cached.pop(next(iter(cached)))
+        cached[key] = r
+    headers = {"ETag": r["etag"], "Cache-Control": "no-cache", "Vary": "Accept-Encoding, Accept"}
+    if _not_modified(request, r["etag"]):
+        return Response(status_code=304, headers=headers)
+    enc = pick_encoding(request.headers.get("accept-encoding"), r)
+    if enc != "identity":
+        headers["Content-Encoding"] = enc
+    return Response(content=r[enc], media_type=MEDIA[fmt], headers=headers)
+
 @app.get("/snapshot")
-def snapshot(
+async def snapshot(
+    request: Request,
     date: str = Query(..., description="YYYY-MM-DD"),
     type: str = Query(..., pattern="^(forecast|review)$"),
+    fields: str | None = Query(None, description="eth_spot,levels,compare.bias"),
+    format: str | None = Query(None, pattern="^(json|msgpack)$"),
     token: str | None = None
 ):
     # опц. защита токеном
@@ -66,29 +399,22 @@ def snapshot(
         raise HTTPException(status_code=401, detail="unauthorized")
 
     try:
-        data = fetch_snapshot(date, type)
+        return await snapshot_reply(request, date, type, fields, format)
     except HTTPException as e:
         raise e
     except Exception:
         raise HTTPException(status_code=500, detail="internal error")
 
-    # без кэша и как чистый JSON
-    return Response(
-        content=json.dumps(data, ensure_ascii=False),
-        media_type="application/json",
-        headers={"Cache-Control":"no-store"}
-    )
-    
-    # ----------------------------------------------------
+# ----------------------------------------------------
 # Новый блок: быстрый доступ к "сегодняшнему" снапшоту
 # ----------------------------------------------------
-from zoneinfo import ZoneInfo
-from datetime import datetime
-
-TZ = ZoneInfo("Europe/Podgorica")
-
 @app.get("/today")
-def today_snapshot(type: str):
+async def today_snapshot(
+    request: Request,
+    type: str,
+    fields: str | None = None,
+    format: str | None = Query(None, pattern="^(json|msgpack)$"),
+):
     """
     Возвращает актуальный снапшот за сегодняшний день
     по часовому поясу Europe/Podgorica.
@@ -97,15 +423,254 @@ def today_snapshot(type: str):
     if type not in ("forecast", "review"):
         raise HTTPException(400, "type must be forecast|review")
     date = datetime.now(TZ).date().isoformat()
-    print(f"[{datetime.now(TZ)}] /today called with type={type}")
-    data = fetch_snapshot(date, type)
-    return Response(
-        content=json.dumps(data, ensure_ascii=False),
-        media_type="application/json",
-        headers={"Cache-Control": "no-store"}
-    )
+    return await snapshot_reply(request, date, type, fields, format)
+
+# ----------------------------------------------------
+# Диапазон: все снапшоты за период одним ответом
+# ----------------------------------------------------
+@app.get("/snapshots")
+async def snapshots_range(
+    from_: str = Query(..., alias="from", description="YYYY-MM-DD"),
+    to: str = Query(..., description="YYYY-MM-DD (включительно)"),
+    type: str = Query("all", pattern="^(forecast|review|all)$"),
+    fields: str | None = Query(None, description="eth_spot,levels,compare.bias"),
+    token: str | None = None
+):
+    """
+    Отдаёт JSON-массив [{"date","type","data"}, ...] по датам по возрастанию.
+    Выборки из GitHub идут параллельно (не больше RANGE_CONCURRENCY),
+    элементы уходят клиенту по мере готовности. Отсутствующие снапшоты пропускаются.
+    Пример: /snapshots?from=2025-11-01&to=2025-11-30&type=review&fields=actual,compare.bias
+    """
+    if PTOKEN and token != PTOKEN:
+        raise HTTPException(status_code=401, detail="unauthorized")
+    try:
+        d0, d1 = Date.fromisoformat(from_), Date.fromisoformat(to)
+    except ValueError:
+        raise HTTPException(400, "from/to must be YYYY-MM-DD")
+    days = (d1 - d0).days + 1
+    if days < 1:
+        raise HTTPException(400, "to must not be before from")
+    if days > RANGE_MAX_DAYS:
+        raise HTTPException(400, f"range too long (max {RANGE_MAX_DAYS} days)")
+
+    types = ("forecast", "review") if type == "all" else (type,)
+    keys = [((d0 + timedelta(days=i)).isoformat(), t) for i in range(days) for t in types]
+    proj = parse_fields(fields)
+    sem = asyncio.Semaphore(RANGE_CONCURRENCY)
+
+    async def one(date_str, snap_type):
+        async with sem:
+            try:
+                return await fetch_snapshot(date_str, snap_type)
+            except HTTPException:
+                return None
+
+    async def stream():
+        tasks = [asyncio.create_task(one(*k)) for k in keys]
+        try:
+            yield b"["
+            sep = b""
+            for (date_str, snap_type), task in zip(keys, tasks):
+                data = await task
+                if data is None:
+                    continue
+                item = {"date": date_str, "type": snap_type, "data": project(data, proj) if proj else data}
+                yield sep + json.dumps(item, ensure_ascii=False).encode("utf-8")
+                sep = b","
+            yield b"]"
+        finally:
+            # клиент отвалился — недокачанное не нужно
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/json", headers={"Cache-Control":"no-store"})
+
+# ----------------------------------------------------
+# Сводка точности прогнозов: индекс по дням в памяти
+# ----------------------------------------------------
+# Строится при старте и дополняется фоновой задачей: раз в SUMMARY_REFRESH
+# секунд листинг папки (один условный запрос к GitHub или stat локальных файлов)
+# сверяется с версиями уже учтённых снапшотов, догружаются только новые и
+# изменённые. Ответы не зависят от длины истории: средние за диапазон — из
+# префиксных сумм (см. summary.py), ETag — версия индекса + запрос.
+SUMMARY = summary.SummaryIndex()
+metrics.gauge("summary_days", lambda: len(SUMMARY))
+BOOT = f"{int(time.time()):x}"   # ETag не должен совпасть с ETag прошлого процесса
+
+def snapshot_key(name: str):
+    """YYYY-MM-DD_forecast.json -> (date, type) или None."""
+    stem, _, ext = name.partition(".")
+    date_str, _, snap_type = stem.partition("_")
+    if ext != "json" or snap_type not in ("forecast", "review"):
+        return None
+    try:
+        Date.fromisoformat(date_str)
+    except ValueError:
+        return None
+    return date_str, snap_type
+
+# последний листинг GitHub и его ETag: на 304 (папка не менялась) берём его
+LISTING = {"etag": None, "versions": None}
+
+async def _list_versions() -> dict:
+    """{имя снапшота: версия}: blob SHA из дерева папки в GitHub (Git Trees API —
+    листинг contents API обрезан на 1000 записях), офлайн — mtime+размер файла."""
+    if STORE.remote is not None:
+        try:
+            body, code, hdrs = await upstream_get(
+                f"{API_BASE}/repos/{REPO}/git/trees/{BRANCH}:{SNPATH.strip('/')}", "github-api",
+                gh_headers(LISTING["etag"] if LISTING["versions"] is not None else None,
+                           Accept="application/vnd.github+json"))
+            if code == 304:
+                return LISTING["versions"]
+            tree = json.loads(body)
+            if tree.get("truncated"):
+                raise ValueError("snapshot tree truncated")
+            versions = {e["path"]: e["sha"] for e in tree.get("tree", []) if e.get("type") == "blob"}
+            LISTING.update(etag=hdrs.get("ETag"), versions=versions)
+            return versions
+        except (resilience.CircuitOpen, resilience.UpstreamError, httpx.HTTPError, ValueError):
+            # GitHub недоступен: последний удачный листинг, а если его не было —
+            # локальная папка (версии там mtime+размер, не SHA — смешивать нельзя)
+            if LISTING["versions"] is not None:
+                return LISTING["versions"]
+    out = {}
+    for name in STORE.local.names():
+        try:
+            st = os.stat(STORE.local.path(name))
+        except FileNotFoundError:
+            continue
+        out[name] = f"{st.st_mtime_ns}-{st.st_size}"
+    return out
+
+async def refresh_summary() -> int:
+    """Догружает в индекс новые/изменённые снапшоты; возвращает их число."""
+    versions = await _list_versions()
+    todo = [(n, v, k) for n, v in versions.items()
+            if SUMMARY.sources.get(n) != v and (k := snapshot_key(n)) is not None]
+    sem = asyncio.Semaphore(RANGE_CONCURRENCY)
+
+    async def one(key):
+        async with sem:
+            try:
+                return await fetch_snapshot(*key, fresh=True)
+            except HTTPException:
+                return None
+
+    datas = await asyncio.gather(*(one(k) for _, _, k in todo))
+    loaded = [(name, version, key, data) for (name, version, key), data in zip(todo, datas) if data is not None]
+    # одной пачкой: на старте это вся история, по дню вышло бы O(n²) на event loop
+    SUMMARY.update_many([(*key, data) for _, _, key, data in loaded])
+    for name, version, _, _ in loaded:
+        SUMMARY.sources[name] = version
+    return len(todo)
+
+async def summary_loop():
+    while True:
+        try:
+            n = await refresh_summary()
+            if n:
+                print(f"summary: {n} snapshots indexed, {len(SUMMARY)} days")
+        except Exception as e:
+            print(f"⚠️ summary refresh failed: {e!r}")
+        await asyncio.sleep(SUMMARY_REFRESH)
+
+def _summary_etag(request: Request) -> str:
+    q = hashlib.sha1(request.url.query.encode()).hexdigest()[:12]
+    return f'"{BOOT}-{SUMMARY.version}-{q}"'
+
+def _summary_reply(request: Request, fmt: str, build):
+    """build() -> (заголовок CSV, строки CSV, объект JSON); на совпавший ETag — 304 без сборки."""
+    if PTOKEN and request.query_params.get("token") != PTOKEN:
+        raise HTTPException(status_code=401, detail="unauthorized")
+    etag = _summary_etag(request)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    header, rows, obj = build()
+    if fmt == "csv":
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(header)
+        w.writerows(["" if v is None else v for v in row] for row in rows)
+        return Response(content=buf.getvalue(), media_type="text/csv; charset=utf-8", headers=headers)
+    return Response(content=json.dumps(obj, ensure_ascii=False), media_type="application/json", headers=headers)
+
+@app.get("/summary")
+async def summary_days(
+    request: Request,
+    from_: str | None = Query(None, alias="from", description="YYYY-MM-DD"),
+    to: str | None = Query(None, description="YYYY-MM-DD (включительно)"),
+    format: str = Query("json", pattern="^(json|csv)$"),
+    token: str | None = None
+):
+    """
+    Метрики по дням и средние за период.
+    Пример: /summary?from=2025-11-01&to=2025-11-30&format=csv
+    """
+    start, end = _iso_or_400(from_, "from"), _iso_or_400(to, "to")
+
+    def build():
+        days = [[d] + [json_number(v) for v in row] for d, row in SUMMARY.days(start, end)]
+        obj = {"days": [dict(zip(("date",) + summary.METRICS, r)) for r in days],
+               "stats": SUMMARY.stats(start, end)}
+        return ("date",) + summary.METRICS, days, obj
+    return _summary_reply(request, format, build)
+
+@app.get("/summary/stats")
+async def summary_stats(
+    request: Request,
+    from_: str | None = Query(None, alias="from", description="YYYY-MM-DD"),
+    to: str | None = Query(None, description="YYYY-MM-DD (включительно)"),
+    days: int | None = Query(None, ge=1, description="последние N календарных дней до to"),
+    format: str = Query("json", pattern="^(json|csv)$"),
+    token: str | None = None
+):
+    """
+    Средние за период: доли касаний уровней, попадания в диапазон и по направлению,
+    среднее изменение ETH/BTC. Пример: /summary/stats?days=30
+    """
+    start, end = _iso_or_400(from_, "from"), _iso_or_400(to, "to")
+
+    def build():
+        s, e = start, end
+        if days is not None:
+            e = e or (SUMMARY.dates[-1] if SUMMARY.dates else datetime.now(TZ).date().isoformat())
+            s = (Date.fromisoformat(e) - timedelta(days=days - 1)).isoformat()
+        stats = SUMMARY.stats(s, e)
+        rows = [[m, stats[m]["mean"], stats[m]["n"]] for m in summary.METRICS]
+        return ("metric", "mean", "n"), rows, {"from": s, "to": e, "stats": stats}
+    return _summary_reply(request, format, build)
+
+@app.get("/summary/rolling")
+async def summary_rolling(
+    request: Request,
+    window: int = Query(30, ge=1, le=3660, description="окно, календарных дней"),
+    from_: str | None = Query(None, alias="from", description="YYYY-MM-DD"),
+    to: str | None = Query(None, description="YYYY-MM-DD (включительно)"),
+    format: str = Query("json", pattern="^(json|csv)$"),
+    token: str | None = None
+):
+    """
+    Скользящие средние метрик за `window` дней, по каждому дню периода.
+    Пример: /summary/rolling?window=7&from=2025-11-01
+    """
+    start, end = _iso_or_400(from_, "from"), _iso_or_400(to, "to")
+
+    def build():
+        rows = [[d] + [json_number(v) for v in mean] for d, mean, _ in SUMMARY.rolling(window, start, end)]
+        obj = {"window": window, "days": [dict(zip(("date",) + summary.METRICS, r)) for r in rows]}
+        return ("date",) + summary.METRICS, rows, obj
+    return _summary_reply(request, format, build)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Метрики процесса в текстовом формате Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/healthz")
-def health_check():
+async def health_check():
     """Проверка состояния прокси."""
-    return {"ok": True, "time": datetime.now(TZ).isoformat()}
+    return {"ok": True, "time": datetime.now(TZ).isoformat(), "cache": CACHE.stats(),
+            "summary": {"days": len(SUMMARY), "version": SUMMARY.version}}
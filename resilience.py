@@ -0,0 +1,292 @@
+# resilience.py — повторы, дедлайны и предохранители для запросов к Bybit и GitHub
+#
+# Общие правила для main.py, parser.py, store.py и proxy.py:
+#   • повтор только там, где он может помочь: сеть, таймаут, 5xx, 429 (и 403
+#     от лимитов GitHub); прочие 4xx — сразу ошибка;
+#   • пауза — экспонента с полным джиттером (uniform(0, base*2^i), не больше cap),
+#     а если сервер сказал, когда приходить (Retry-After, сброс лимита Bybit/GitHub), —
+#     не раньше этого;
+#   • общий дедлайн прогона: таймаут попытки и паузы урезаются до остатка, после
+#     него новых попыток нет — хвост задержки ограничен сверху;
+#   • предохранитель на каждый апстрим: после N подряд сбоев запросы к нему
+#     сразу получают CircuitOpen, через reset_after секунд пропускается одна
+#     пробная попытка.
+#
+#   with resilience.run_deadline(120):       # весь прогон main.py
+#       j = resilience.call(lambda timeout: get(url, timeout=timeout), policy=P, breaker=breaker("bybit"))
+
+import time, random, asyncio, threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import metrics
+
+# --------- Ошибки ---------
+class UpstreamError(Exception):
+    """Ответ апстрима с HTTP-статусом (status=None — сеть/таймаут/битый ответ)."""
+
+    def __init__(self, status: int | None, headers=None, message: str = ""):
+        super().__init__(message or f"HTTP {status}")
+        self.status = status
+        self.headers = headers or {}
+
+class CircuitOpen(UpstreamError):
+    def __init__(self, name: str):
+        super().__init__(None, None, f"circuit open: {name}")
+
+class DeadlineExceeded(UpstreamError, TimeoutError):
+    def __init__(self, message: str = "deadline exceeded"):
+        super().__init__(None, None, message)
+
+def classify(exc: BaseException):
+    """-> (status | None, headers, retryable) для ошибок httpx, urllib и UpstreamError."""
+    if isinstance(exc, (CircuitOpen, DeadlineExceeded)):
+        return None, {}, False
+    if isinstance(exc, UpstreamError):
+        status, headers = exc.status, exc.headers
+    elif getattr(exc, "response", None) is not None and hasattr(exc.response, "status_code"):
+        status, headers = exc.response.status_code, exc.response.headers        # httpx.HTTPStatusError
+    elif isinstance(getattr(exc, "code", None), int) and hasattr(exc, "headers"):
+        status, headers = exc.code, exc.headers                                  # urllib.error.HTTPError
+    elif isinstance(exc, (OSError, ValueError)) or type(exc).__module__.startswith("httpx"):
+        return None, {}, True          # сеть, таймаут (URLError, httpx.TransportError), обрезанный JSON
+    else:
+        return None, {}, False         # ошибка в нашем коде — повтор не поможет
+    return status, headers, retryable_status(status, headers)
+
+def retryable_status(status: int | None, headers=None) -> bool:
+    if status is None or status >= 500 or status in (408, 429):
+        return True
+    if status == 403:
+        # GitHub отвечает 403 на исчерпанный (в т.ч. вторичный) лимит — это ожидание, а не запрет
+        return _header(headers, "x-ratelimit-remaining") == "0" or _header(headers, "retry-after") is not None
+    return False
+
+def _header(headers, name: str):
+    if not headers:
+        return None
+    get = getattr(headers, "get", None)
+    v = get(name) if get else None
+    if v is None and get:
+        v = get(name.title()) or get(name.upper())
+    return v
+
+def retry_after(headers, now: float | None = None) -> float | None:
+    """Сколько секунд сервер просит подождать: Retry-After (секунды или HTTP-дата),
+    сброс лимита Bybit (X-Bapi-Limit-Reset-Timestamp, мс) или GitHub (X-RateLimit-Reset, с)."""
+    now = time.time() if now is None else now
+    v = _header(headers, "retry-after")
+    if v is not None:
+        try:
+            return max(0.0, float(v))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(v).timestamp() - now)
+            except (TypeError, ValueError):
+                pass
+    if _header(headers, "x-bapi-limit-status") == "0":
+        reset = _header(headers, "x-bapi-limit-reset-timestamp")
+        if reset:
+            return max(0.0, int(reset) / 1000 - now)
+    if _header(headers, "x-ratelimit-remaining") == "0":
+        reset = _header(headers, "x-ratelimit-reset")
+        if reset:
+            return max(0.0, int(reset) - now)
+    return None
+
+# --------- Дедлайн ---------
+class Deadline:
+    def __init__(self, seconds: float | None):
+        self.at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return float("inf") if self.at is None else self.at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+_RUN = Deadline(None)    # дедлайн текущего прогона; потоки пулов видят его без передачи
+_RUN_LOCK = threading.Lock()
+
+@contextmanager
+def run_deadline(seconds: float | None):
+    """Общий дедлайн для всех запросов внутри блока (в т.ч. из пулов потоков)."""
+    global _RUN
+    with _RUN_LOCK:
+        prev, _RUN = _RUN, Deadline(seconds)
+    try:
+        yield _RUN
+    finally:
+        with _RUN_LOCK:
+            _RUN = prev
+
+# --------- Предохранитель ---------
+class CircuitBreaker:
+    def __init__(self, name: str, fail_threshold: int = 5, reset_after: float = 30.0, clock=time.monotonic):
+        self.name = name
+        self.fail_threshold = fail_threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        """Можно ли идти к апстриму; True — это пробная попытка (исход обязателен:
+        success/failure, а если её прервали — release)."""
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            if self.clock() - self.opened_at >= self.reset_after and not self._probing:
+                self._probing = True      # одна пробная попытка, остальные ждут её исхода
+                return True
+        metrics.inc("upstream_fail_fast_total", upstream=self.name)
+        raise CircuitOpen(self.name)
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def release(self):
+        """Пробная попытка прервана без исхода (отмена задачи) — следующая сможет пробовать."""
+        with self._lock:
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            was_open = self.opened_at is not None
+            if self._probing or self.failures >= self.fail_threshold:
+                self.opened_at = self.clock()
+            self._probing = False
+        if not was_open and self.opened_at is not None:
+            metrics.inc("upstream_circuit_open_total", upstream=self.name)
+            print(f"⚠️ circuit open: {self.name} ({self.failures} failures in a row)")
+
+_BREAKERS = {}
+
+def breaker(name: str, **kw) -> CircuitBreaker:
+    """Общий предохранитель апстрима на процесс (bybit, github-raw, github-api)."""
+    with _RUN_LOCK:
+        b = _BREAKERS.get(name)
+        if b is None:
+            b = _BREAKERS[name] = CircuitBreaker(name, **kw)
+        return b
+
+def _breaker_states():
+    return {n: float(b.state != "closed") for n, b in list(_BREAKERS.items())}
+
+metrics.gauge("upstream_circuit_open", _breaker_states, label="upstream")
+
+# --------- Политика повторов ---------
+class Policy:
+    def __init__(self, attempts: int = 4, base: float = 0.5, cap: float = 8.0, timeout: float = 10.0,
+                 max_wait: float = 30.0):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.timeout = timeout        # на одну попытку
+        self.max_wait = max_wait      # дольше этого Retry-After не ждём — ошибка сразу
+
+    def backoff(self, i: int, rng=random) -> float:
+        return rng.uniform(0, min(self.cap, self.base * 2 ** i))
+
+class _Attempts:
+    """Общая логика call/acall: что делать перед попыткой и после ошибки."""
+
+    def __init__(self, policy: Policy, breaker: CircuitBreaker | None, deadline: Deadline | None, name: str):
+        self.policy = policy
+        self.breaker = breaker
+        self.deadline = deadline or _RUN
+        self.name = name or (breaker.name if breaker else "upstream")
+        self.i = 0
+        self.probe = False            # текущая попытка — пробная в полуоткрытом предохранителе
+
+    def before(self) -> float:
+        """Таймаут этой попытки; CircuitOpen/DeadlineExceeded — не пытаться."""
+        left = self.deadline.remaining()
+        if left <= 0:
+            raise DeadlineExceeded(f"{self.name}: run deadline exceeded")
+        if self.breaker is not None:
+            self.probe = self.breaker.allow()
+        return min(self.policy.timeout, left)
+
+    def ok(self):
+        self.probe = False
+        if self.breaker is not None:
+            self.breaker.success()
+
+    def abandon(self):
+        """Выход без исхода попытки (отмена, KeyboardInterrupt): не держать место пробы."""
+        if self.probe:
+            self.probe = False
+            self.breaker.release()
+
+    def failed(self, exc: BaseException) -> float:
+        """Пауза перед следующей попыткой; исключение — если повторять нельзя."""
+        status, headers, retryable = classify(exc)
+        self.probe = False
+        if self.breaker is not None and not isinstance(exc, (CircuitOpen, DeadlineExceeded)):
+            # 4xx (кроме лимитов) — апстрим жив, это наш запрос плохой
+            if retryable:
+                self.breaker.failure()
+            else:
+                self.breaker.success()
+        self.i += 1
+        if not retryable or self.i >= self.policy.attempts:
+            raise exc
+        wait = self.policy.backoff(self.i - 1)
+        hint = retry_after(headers)
+        if hint is not None:
+            if hint > self.policy.max_wait:
+                raise exc
+            wait = max(wait, hint)
+        if wait >= self.deadline.remaining():
+            raise DeadlineExceeded(f"{self.name}: no time left to retry after {exc!r}") from exc
+        metrics.inc("upstream_retries_total", upstream=self.name)
+        metrics.inc("upstream_backoff_seconds_total", wait, upstream=self.name)
+        return wait
+
+def call(fn, policy: Policy, breaker: CircuitBreaker | None = None, deadline: Deadline | None = None,
+         name: str = "", sleep=time.sleep):
+    """fn(timeout) -> результат; повторяет по правилам policy."""
+    a = _Attempts(policy, breaker, deadline, name)
+    try:
+        while True:
+            timeout = a.before()
+            try:
+                result = fn(timeout)
+            except Exception as e:
+                sleep(a.failed(e))
+                continue
+            a.ok()
+            return result
+    finally:
+        a.abandon()
+
+async def acall(fn, policy: Policy, breaker: CircuitBreaker | None = None, deadline: Deadline | None = None,
+                name: str = ""):
+    """Как call, но fn(timeout) — корутина, паузы — asyncio.sleep."""
+    a = _Attempts(policy, breaker, deadline, name)
+    try:
+        while True:
+            timeout = a.before()
+            try:
+                result = await fn(timeout)
+            except Exception as e:
+                await asyncio.sleep(a.failed(e))
+                continue
+            a.ok()
+            return result
+    finally:
+        # отменённая пробная попытка иначе навсегда оставила бы предохранитель открытым
+        a.abandon()
@@ -0,0 +1,100 @@
+# scheduler.py — резидентный планировщик снапшотов (MODE=daemon / MODE=stream)
+#
+# Задачи запускаются раз в сутки в своё локальное время (Europe/Podgorica).
+# Состояние — даты последних запусков и память задач (утренний прогноз для
+# вечернего review) — пишется в JSON после каждой задачи, так что после
+# рестарта процесс продолжает с того же места. Часы и sleep подставляются
+# снаружи — расписание проверяется без реального ожидания.
+
+import os, json, time
+from datetime import datetime, timedelta
+
+RETRY_AFTER = 60     # сек до повтора упавшей задачи
+MAX_SLEEP = 300      # сек — не спим дольше, чтобы пережить перевод часов
+
+def parse_hhmm(s: str):
+    h, m = s.strip().split(":")
+    return int(h), int(m)
+
+class Scheduler:
+    """jobs: [(kind, "HH:MM", fn)], fn(date_str, memory) -> None; memory — dict,
+    переживающий рестарты. clock() -> aware datetime в локальной зоне."""
+
+    def __init__(self, jobs, state_path: str, clock, sleep=time.sleep, retry_after: float = RETRY_AFTER):
+        self.jobs = [(kind, parse_hhmm(at), fn) for kind, at, fn in jobs]
+        self.state_path = state_path
+        self.clock = clock
+        self.sleep = sleep
+        self.retry_after = retry_after
+        self.retry_at = {}
+        self.state = self._load()
+
+    # ---- состояние ----
+    def _load(self) -> dict:
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                st = json.load(f)
+        except (FileNotFoundError, ValueError):
+            st = {}
+        st.setdefault("done", {})
+        st.setdefault("memory", {})
+        return st
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp = f"{self.state_path}.tmp{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    @property
+    def memory(self) -> dict:
+        return self.state["memory"]
+
+    # ---- расписание ----
+    def _slot(self, now: datetime, hm) -> datetime:
+        return now.replace(hour=hm[0], minute=hm[1], second=0, microsecond=0)
+
+    def due(self, now: datetime) -> list:
+        d = now.date().isoformat()
+        out = []
+        for kind, hm, fn in self.jobs:
+            if now < self._slot(now, hm) or self.state["done"].get(kind) == d:
+                continue
+            if now.timestamp() < self.retry_at.get(kind, 0):
+                continue
+            out.append((kind, fn))
+        return out
+
+    def tick(self) -> list:
+        """Запускает всё, что пора; возвращает список выполненных задач."""
+        now = self.clock()
+        d = now.date().isoformat()
+        ran = []
+        for kind, fn in self.due(now):
+            try:
+                fn(d, self.memory)
+            except Exception as e:
+                print(f"⚠️ {kind} failed: {e!r}; retry in {self.retry_after:.0f}s")
+                self.retry_at[kind] = now.timestamp() + self.retry_after
+                continue
+            self.retry_at.pop(kind, None)
+            self.state["done"][kind] = d
+            self.save()
+            ran.append(kind)
+        return ran
+
+    def seconds_until_next(self, now: datetime) -> float:
+        waits = [MAX_SLEEP]
+        for kind, hm, _ in self.jobs:
+            slot = self._slot(now, hm)
+            if slot <= now:
+                slot = self._slot(now + timedelta(days=1), hm)
+            waits.append((slot - now).total_seconds())
+        waits += [t - now.timestamp() for t in self.retry_at.values()]
+        return max(1.0, min(waits))
+
+    def run_forever(self):
+        while True:
+            self.tick()
+            self.sleep(self.seconds_until_next(self.clock()))
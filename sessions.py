@@ -0,0 +1,140 @@
+# sessions.py — агрегаты свечей по сессиям (NumPy)
+#
+# Для каждой сессии [start_ms, end_ms]: high/low/close, объёмы, VWAP, а также
+# касания уровней поддержки/сопротивления и время первого касания каждого
+# уровня. Все сессии считаются одним проходом по массиву свечей (reduceat),
+# без float() по строкам. Свечи — массив candles.DTYPE по возрастанию start.
+#
+# Сравнение со старым построчным циклом:
+#   python sessions.py
+
+import numpy as np
+
+import candles
+
+TOUCH_EPS = 1e-8
+
+def parse_klines(payload: dict) -> np.ndarray:
+    """Ответ /v5/market/kline -> массив candles.DTYPE по возрастанию времени."""
+    return candles.to_records(payload.get("result", {}).get("list", []) or [])
+
+def _levels(levels, n_sessions: int) -> np.ndarray:
+    """Уровни: общий список (L,) или по сессиям (S, L) -> float (S, L), пропуски — NaN."""
+    if levels is None or len(levels) == 0:
+        return np.empty((n_sessions, 0))
+    first = levels[0]
+    if np.ndim(first) == 0:
+        row = np.asarray(levels, dtype=np.float64)
+        return np.broadcast_to(row, (n_sessions, len(row)))
+    width = max((len(x) for x in levels), default=0)
+    out = np.full((n_sessions, width), np.nan)
+    for i, x in enumerate(levels):
+        out[i, :len(x)] = np.asarray(x, dtype=np.float64)
+    return out
+
+def _first_touch(hit: np.ndarray, i0: np.ndarray, nonempty: np.ndarray, start: np.ndarray) -> np.ndarray:
+    """hit (n, L) -> время (ms) первой свечи сессии с касанием; -1 — касания не было."""
+    s, L = len(i0), hit.shape[1]
+    out = np.full((s, L), -1, dtype=np.int64)
+    if L == 0 or not nonempty.any():
+        return out
+    n = len(hit)
+    pos = np.where(hit, np.arange(n)[:, None], n)
+    first = np.minimum.reduceat(pos, i0[nonempty], axis=0)
+    t = np.where(first < n, start[np.minimum(first, n - 1)], -1)
+    out[nonempty] = t
+    return out
+
+def aggregate(recs: np.ndarray, bounds, support=None, resistance=None) -> dict:
+    """bounds: [(start_ms, end_ms), ...] — сессии по возрастанию, без перекрытий;
+    в сессию входят свечи со start в [start_ms, end_ms].
+    support/resistance: общий список уровней или список списков по сессиям.
+    Возвращает dict массивов длиной S (касания — (S, L)); пустая сессия — NaN/0."""
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 2)
+    S = len(bounds)
+    start = recs["start"]
+    i0 = np.searchsorted(start, bounds[:, 0], side="left")
+    i1 = np.searchsorted(start, bounds[:, 1], side="right")
+    count = i1 - i0
+    nonempty = count > 0
+
+    out = {"count": count}
+    for name in ("high", "low", "close", "volume", "turnover", "vwap"):
+        out[name] = np.full(S, np.nan)
+    out["volume"][:] = 0.0
+    out["turnover"][:] = 0.0
+
+    # сессия на каждую свечу: -1 — вне всех сессий
+    sid = np.searchsorted(bounds[:, 0], start, side="right") - 1
+    sid[(sid < 0) | (start > bounds[np.maximum(sid, 0), 1])] = -1
+    if nonempty.any():
+        idx = np.flatnonzero(nonempty)
+        # reduceat по началам непустых сессий; свечи между сессиями отсекаем маской
+        ins = sid >= 0
+        starts = np.searchsorted(np.flatnonzero(ins), i0[idx])
+        hi, lo = recs["high"][ins], recs["low"][ins]
+        out["high"][idx] = np.maximum.reduceat(hi, starts)
+        out["low"][idx] = np.minimum.reduceat(lo, starts)
+        out["close"][idx] = recs["close"][i1[idx] - 1]
+        out["volume"][idx] = np.add.reduceat(recs["volume"][ins], starts)
+        out["turnover"][idx] = np.add.reduceat(recs["turnover"][ins], starts)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["vwap"] = np.where(out["volume"] > 0, out["turnover"] / out["volume"], np.nan)
+
+    sup = _levels(support, S)
+    res = _levels(resistance, S)
+    safe_sid = np.maximum(sid, 0)[:, None]
+    inside = (sid >= 0)[:, None]
+    with np.errstate(invalid="ignore"):
+        hit_s = inside & (recs["low"][:, None] <= sup[safe_sid[:, 0]] + TOUCH_EPS) if sup.shape[1] else np.zeros((len(recs), 0), bool)
+        hit_r = inside & (recs["high"][:, None] >= res[safe_sid[:, 0]] - TOUCH_EPS) if res.shape[1] else np.zeros((len(recs), 0), bool)
+    out["support_first_touch_ms"] = _first_touch(hit_s, i0, nonempty, start)
+    out["resistance_first_touch_ms"] = _first_touch(hit_r, i0, nonempty, start)
+    out["touched_support"] = (out["support_first_touch_ms"] >= 0).any(axis=1)
+    out["touched_resistance"] = (out["resistance_first_touch_ms"] >= 0).any(axis=1)
+    return out
+
+# --------- Бенчмарк против построчного цикла ---------
+def _loop(kl, supp, ress):
+    # так считал build_review_snapshot до векторизации
+    hi, lo, close, vb, vq = -float("inf"), float("inf"), float("nan"), 0.0, 0.0
+    for k in kl:
+        h = float(k[2]); l = float(k[3]); c = float(k[4])
+        hi = max(hi, h); lo = min(lo, l); close = c
+        vb += float(k[5]); vq += float(k[6])
+    ts = any(lo <= float(s) + 1e-8 for s in supp)
+    tr = any(hi >= float(r) - 1e-8 for r in ress)
+    return hi, lo, close, vb, vq, ts, tr
+
+if __name__ == "__main__":
+    import time
+    rng = np.random.default_rng(3)
+    n, minute = 200_000, 60_000
+    t0 = 1_700_000_000_000
+    c = 3000 + np.cumsum(rng.normal(0, 0.5, n))
+    rows = [[str(t0 + i*minute), f"{c[i]:.2f}", f"{c[i]+rng.uniform(0,2):.2f}", f"{c[i]-rng.uniform(0,2):.2f}",
+             f"{c[i]:.2f}", "1.5", f"{1.5*c[i]:.4f}"] for i in range(n)][::-1]   # как Bybit: новые первыми
+    days = [(t0 + d*1440*minute, t0 + (d+1)*1440*minute - 1) for d in range(n // 1440)]
+    supp, ress = [2950, 2900], [3050, 3100]
+
+    asc = rows[::-1]
+    by_day = [asc[d*1440:(d+1)*1440] for d in range(len(days))]
+    t = time.perf_counter()
+    loop = [_loop(kl, supp, ress) for kl in by_day]
+    dt_loop = time.perf_counter() - t
+
+    t = time.perf_counter()
+    recs = parse_klines({"result": {"list": rows}})
+    dt_parse = time.perf_counter() - t
+    t = time.perf_counter()
+    agg = aggregate(recs, days, supp, ress)
+    dt_vec = time.perf_counter() - t
+
+    ok = all(np.isclose(agg["high"][i], hi) and np.isclose(agg["low"][i], lo) and np.isclose(agg["close"][i], cl)
+             and np.isclose(agg["volume"][i], vb) and np.isclose(agg["turnover"][i], vq)
+             and agg["touched_support"][i] == ts and agg["touched_resistance"][i] == tr
+             for i, (hi, lo, cl, vb, vq, ts, tr) in enumerate(loop))
+    # в review свечи приходят из candles.CandleStore уже типизированными —
+    # разбор строк делается один раз при записи в хранилище
+    print(f"{n} candles, {len(days)} sessions: loop {dt_loop*1000:.0f} ms, aggregate {dt_vec*1000:.0f} ms "
+          f"(+ one-time parse {dt_parse*1000:.0f} ms) — {'OK' if ok else 'MISMATCH'}")
@@ -0,0 +1,243 @@
+# store.py — хранилище снапшотов: локальная папка (основной путь чтения)
+# и опциональный удалённый GitHub, с которым она синхронизируется.
+# ENV:
+#   SNAPSHOT_DIR     — локальная папка (по умолчанию snapshots/ рядом с этим файлом)
+#   SNAPSHOT_REMOTE  — github | none (по умолчанию github; none — полностью офлайн)
+#   GITHUB_REPO, GITHUB_BRANCH, GITHUB_PATH, GITHUB_TOKEN
+#   GITHUB_RAW, GITHUB_API — базовые URL (для локальных заглушек)
+#
+# Общий код поиска снапшотов для main.py, parser.py и proxy.py:
+# сначала локальный файл, потом GitHub (raw, затем contents API), с записью
+# скачанного обратно в локальную папку. Запись в GitHub — одним коммитом на
+# пачку файлов через Git Data API (GitBatch). Если известен blob SHA из листинга,
+# скачанное с ним сверяется: raw.githubusercontent.com кэширует файлы ~5 минут
+# и после перезаписи может отдать старую версию.
+
+import os, json, base64, hashlib, urllib.request, urllib.error
+
+import metrics, resilience
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+SNAPSHOT_REMOTE = os.environ.get("SNAPSHOT_REMOTE", "github").strip().lower()
+REPO = os.environ.get("GITHUB_REPO", "anton-baton-sem/bybit-tg-bot")
+BRANCH = os.environ.get("GITHUB_BRANCH", "main")
+SNPATH = os.environ.get("GITHUB_PATH", "snapshots").strip("/")
+RAW_BASE = os.environ.get("GITHUB_RAW", "https://raw.githubusercontent.com").rstrip("/")
+API_BASE = os.environ.get("GITHUB_API", "https://api.github.com").rstrip("/")
+GITHUB_POLICY = resilience.Policy(attempts=4, base=0.5, cap=8.0, timeout=20.0)
+
+def snapshot_name(date_str: str, snap_type: str) -> str:
+    return f"{date_str}_{snap_type}.json"
+
+def git_blob_sha(data: bytes) -> str:
+    """SHA блоба так, как его считает git (и отдают листинги contents/trees API)."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class BlobMismatch(ValueError):
+    """GitHub отдал не ту версию файла, что в листинге (устаревший кэш)."""
+
+def dump_snapshot(obj: dict) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+def github_request(req: urllib.request.Request, upstream: str, metric: str, timeout: float = 20,
+                   policy: resilience.Policy = GITHUB_POLICY, **labels) -> bytes:
+    """Тело ответа GitHub: повторы сети/5xx/лимитов с учётом Retry-After, 4xx — сразу
+    (urllib.error.HTTPError), предохранитель на апстрим (github-raw / github-api)."""
+    def attempt(left):
+        with metrics.timer(metric, **labels), urllib.request.urlopen(req, timeout=min(timeout, left)) as r:
+            return r.read()
+    return resilience.call(attempt, policy, resilience.breaker(upstream), name=upstream)
+
+# --------- Локальная папка ---------
+class LocalStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def read_bytes(self, name: str) -> bytes | None:
+        try:
+            with open(self.path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write_bytes(self, name: str, data: bytes) -> str:
+        """Атомарная запись: читатель никогда не увидит половину файла."""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return path
+
+    def names(self) -> list[str]:
+        try:
+            return sorted(n for n in os.listdir(self.root) if n.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+# --------- GitHub ---------
+class GitHubRemote:
+    def __init__(self, repo=REPO, branch=BRANCH, path=SNPATH, token=None, timeout=10):
+        self.repo, self.branch, self.path = repo, branch, path
+        self.token = token if token is not None else os.environ.get("GITHUB_TOKEN")
+        self.timeout = timeout
+
+    def _headers(self, **extra):
+        h = {"User-Agent": "RenderBot/1.0"}
+        if self.token:
+            h["Authorization"] = f"token {self.token}"
+        return h | extra
+
+    def read_bytes(self, name: str, sha: str | None = None) -> bytes | None:
+        """Пробуем RAW, затем contents API (raw media type). None — если нигде нет.
+        sha — ожидаемый blob SHA: старая копия из кэша raw отбрасывается и файл
+        берётся из API; не совпал и там — BlobMismatch."""
+        raw_url = f"{RAW_BASE}/{self.repo}/{self.branch}/{self.path}/{name}"
+        stale = None
+        try:
+            req = urllib.request.Request(raw_url, headers=self._headers())
+            data = github_request(req, "github-raw", "github_fetch_seconds", self.timeout, source="raw")
+            if sha is None or git_blob_sha(data) == sha:
+                return data
+            stale = git_blob_sha(data)
+            metrics.inc("snapshot_stale_raw_total")
+        except Exception:
+            pass   # нет файла, raw недоступен или его предохранитель открыт — идём в API
+        api_url = f"{API_BASE}/repos/{self.repo}/contents/{self.path}/{name}?ref={self.branch}"
+        try:
+            req = urllib.request.Request(api_url, headers=self._headers(Accept="application/vnd.github.raw"))
+            data = github_request(req, "github-api", "github_fetch_seconds", self.timeout, source="api")
+        except Exception:
+            data = None
+        if data is not None and (sha is None or git_blob_sha(data) == sha):
+            return data
+        if data is not None or stale is not None:
+            got = git_blob_sha(data) if data is not None else stale
+            raise BlobMismatch(f"{name}: GitHub returned blob {got[:7]}, listing says {sha[:7]}")
+        return None
+
+    def write_bytes(self, name: str, data: bytes, message: str):
+        self.write_many({name: data}, message)
+
+    def write_many(self, files: dict, message: str):
+        """{name: bytes} -> один коммит в папку снапшотов (неизменённые пропускаются)."""
+        if not self.token:
+            print("⚠️ No GITHUB_TOKEN — skip upload")
+            return None
+        batch = GitBatch(self.repo, self.branch, self.token, self.timeout)
+        return batch.commit({f"{self.path}/{n}": d for n, d in files.items()}, message)
+
+# --------- GitHub: пакетный коммит (Git Data API) ---------
+class GitBatch:
+    """Несколько файлов -> один коммит: ref -> commit -> tree -> [blobs] -> tree
+    -> commit -> ref. Файлы, чей blob SHA совпадает с деревом ветки, не
+    отправляются; если не изменилось ничего — коммита нет. Текстовые файлы
+    уходят прямо в новое дерево, отдельный blob создаётся только для бинарных.
+    Итого 6 запросов на любое число текстовых файлов (против GET+PUT на файл
+    в contents API, который к тому же падает на повторе без sha)."""
+
+    def __init__(self, repo=REPO, branch=BRANCH, token=None, timeout=20, attempts=3):
+        self.repo, self.branch = repo, branch
+        self.token = token if token is not None else os.environ.get("GITHUB_TOKEN")
+        self.timeout = timeout
+        self.attempts = attempts
+
+    def _call(self, method: str, path: str, payload=None):
+        headers = {"User-Agent": "RenderBot/1.0", "Accept": "application/vnd.github+json"}
+        if self.token:
+            headers["Authorization"] = f"token {self.token}"
+        data = None
+        if payload is not None:
+            data = json.dumps(payload).encode()
+            headers["Content-Type"] = "application/json"
+        req = urllib.request.Request(f"{API_BASE}/repos/{self.repo}/git/{path}",
+                                     data=data, headers=headers, method=method)
+        op = f"{method} git/{path.split('/')[0].split('?')[0]}"
+        return json.loads(github_request(req, "github-api", "github_api_seconds", self.timeout, op=op))
+
+    def _tree_shas(self, tree_sha: str) -> dict:
+        """{path: blob sha} всего дерева; при усечённом ответе — пусто (отправим всё)."""
+        t = self._call("GET", f"trees/{tree_sha}?recursive=1")
+        if t.get("truncated"):
+            return {}
+        return {e["path"]: e["sha"] for e in t.get("tree", []) if e.get("type") == "blob"}
+
+    def _entry(self, path: str, data: bytes) -> dict:
+        e = {"path": path, "mode": "100644", "type": "blob"}
+        try:
+            return e | {"content": data.decode("utf-8")}
+        except UnicodeDecodeError:
+            blob = self._call("POST", "blobs", {"content": base64.b64encode(data).decode(), "encoding": "base64"})
+            return e | {"sha": blob["sha"]}
+
+    def commit(self, files: dict, message: str) -> str | None:
+        """{path: bytes|str} -> SHA нового коммита или None, если менять нечего.
+        Если ветку успели сдвинуть между чтением и записью ref, собираем заново."""
+        files = {p.strip("/"): (d if isinstance(d, bytes) else d.encode("utf-8")) for p, d in files.items()}
+        for attempt in range(self.attempts):
+            head = self._call("GET", f"ref/heads/{self.branch}")["object"]["sha"]
+            base_tree = self._call("GET", f"commits/{head}")["tree"]["sha"]
+            current = self._tree_shas(base_tree)
+            changed = {p: d for p, d in files.items() if current.get(p) != git_blob_sha(d)}
+            if not changed:
+                print(f"GitHub: unchanged, skip commit ({len(files)} files)")
+                return None
+            tree = self._call("POST", "trees", {
+                "base_tree": base_tree,
+                "tree": [self._entry(p, d) for p, d in sorted(changed.items())],
+            })["sha"]
+            new = self._call("POST", "commits", {"message": message, "tree": tree, "parents": [head]})["sha"]
+            try:
+                self._call("PATCH", f"refs/heads/{self.branch}", {"sha": new, "force": False})
+            except urllib.error.HTTPError as e:
+                if e.code == 422 and attempt < self.attempts - 1:   # не fast-forward
+                    continue
+                raise
+            print(f"GitHub commit {new[:7]}: {', '.join(sorted(changed))}"
+                  + (f" (+{len(files) - len(changed)} unchanged)" if len(files) > len(changed) else ""))
+            return new
+        return None
+
+# --------- Снапшоты: локально + удалённо ---------
+class SnapshotStore:
+    def __init__(self, local: LocalStore, remote: GitHubRemote | None = None):
+        self.local = local
+        self.remote = remote
+
+    def get_bytes(self, name: str, sha: str | None = None) -> bytes | None:
+        """Локальный файл, если он есть (и совпадает по blob SHA, если он задан);
+        иначе — удалённый, с сохранением локальной копии."""
+        data = self.local.read_bytes(name)
+        if data is not None and (sha is None or git_blob_sha(data) == sha):
+            metrics.inc("snapshot_local_hits_total")
+            return data
+        if self.remote is None:
+            return data if sha is None else None
+        data = self.remote.read_bytes(name, sha)     # BlobMismatch — не кэшируем
+        if data is not None:
+            self.local.write_bytes(name, data)
+        return data
+
+    def get(self, name: str, sha: str | None = None) -> dict | None:
+        data = self.get_bytes(name, sha)
+        return json.loads(data.decode("utf-8")) if data is not None else None
+
+    def put(self, name: str, obj: dict, message: str, extra: dict | None = None) -> str:
+        """extra — {имя: bytes} рядом со снапшотом (например, runs/<name>), тем же коммитом."""
+        files = {name: dump_snapshot(obj)} | (extra or {})
+        path = self.local.write_bytes(name, files[name])
+        for n, data in (extra or {}).items():
+            self.local.write_bytes(n, data)
+        print(f"Saved: {path}")
+        if self.remote is not None:
+            self.remote.write_many(files, message)
+        return path
+
+
+def open_store(token: str | None = None) -> SnapshotStore:
+    remote = GitHubRemote(token=token) if SNAPSHOT_REMOTE == "github" else None
+    return SnapshotStore(LocalStore(SNAPSHOT_DIR), remote)
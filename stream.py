@@ -0,0 +1,138 @@
+# stream.py — живые цены Bybit через публичный WebSocket (MODE=stream в main.py)
+#
+# BookFeed в фоновом потоке подписывается на tickers.<SYMBOL> и kline.<iv>.<SYMBOL>
+# и складывает последние значения в PriceBook. Снапшоты читают книгу из памяти
+# без REST-запросов. Закрытые свечи (confirm=true) отдаются в on_closed —
+# main дописывает их в локальное хранилище свечей.
+# ENV: BYBIT_WS (по умолчанию wss://stream.bybit.com/v5/public/spot)
+
+import os, json, time, asyncio, threading
+import numpy as np
+
+import candles
+
+WS_URL = os.environ.get("BYBIT_WS", "wss://stream.bybit.com/v5/public/spot")
+PING_EVERY = 20      # сек; Bybit рвёт соединение без ping примерно через 30 с
+ARGS_PER_SUB = 10    # лимит аргументов в одном subscribe для spot
+
+class PriceBook:
+    """Последние тикеры и свечи. Пишет один поток (фид), читают любые.
+    Каждое значение — неизменяемый кортеж, который подменяется целиком одним
+    присваиванием в dict, поэтому читателю не нужны блокировки."""
+
+    def __init__(self):
+        self.tickers = {}   # symbol -> (lastPrice, ts_ms)
+        self.turnovers = {} # symbol -> (turnover24h, ts_ms) — для volume_analysis без REST
+        self.klines = {}    # (symbol, interval) -> (start, open, high, low, close, volume, turnover, confirm, ts_ms)
+
+    def on_message(self, msg: dict):
+        """Разбирает сообщение Bybit; возвращает закрытую свечу (symbol, interval, row) или None."""
+        topic = msg.get("topic", "")
+        data = msg.get("data")
+        ts = int(msg.get("ts") or time.time() * 1000)
+        if topic.startswith("tickers.") and isinstance(data, dict):
+            try:
+                self.tickers[data["symbol"]] = (float(data["lastPrice"]), ts)
+            except (KeyError, TypeError, ValueError):
+                pass
+            try:
+                self.turnovers[data["symbol"]] = (float(data["turnover24h"]), ts)
+            except (KeyError, TypeError, ValueError):
+                pass
+            return None
+        if topic.startswith("kline.") and isinstance(data, list):
+            _, interval, symbol = topic.split(".", 2)
+            closed = None
+            for k in data:
+                row = (int(k["start"]), float(k["open"]), float(k["high"]), float(k["low"]),
+                       float(k["close"]), float(k["volume"]), float(k["turnover"]))
+                self.klines[(symbol, interval)] = row + (bool(k.get("confirm")), ts)
+                if k.get("confirm"):
+                    closed = (symbol, interval, row)
+            return closed
+        return None
+
+    def last(self, symbol: str, max_age_ms: int = 60_000):
+        """(price, ts_ms) или None, если тикера нет или он устарел."""
+        it = self.tickers.get(symbol)
+        if it is None or time.time() * 1000 - it[1] > max_age_ms:
+            return None
+        return it
+
+    def turnover(self, symbol: str, max_age_ms: int = 60_000):
+        """(оборот за 24 ч в котируемой, ts_ms) или None, если нет или устарел."""
+        it = self.turnovers.get(symbol)
+        if it is None or time.time() * 1000 - it[1] > max_age_ms:
+            return None
+        return it
+
+    def candle(self, symbol: str, interval: str, max_age_ms: int = 60_000):
+        """Текущая свеча как массив candles.DTYPE из одной записи, или None."""
+        it = self.klines.get((symbol, interval))
+        if it is None or time.time() * 1000 - it[8] > max_age_ms:
+            return None
+        return np.array([it[:7]], dtype=candles.DTYPE)
+
+    def ready(self, symbols) -> bool:
+        return all(self.last(s) is not None for s in symbols)
+
+class BookFeed(threading.Thread):
+    """Фоновый поток с собственным event loop: подписка, чтение, ping,
+    переподключение с нарастающей паузой (до 30 с)."""
+
+    def __init__(self, book: PriceBook, symbols, intervals=("1",), url: str = WS_URL, on_closed=None):
+        super().__init__(name="bybit-ws", daemon=True)
+        self.book = book
+        self.args = [f"tickers.{s}" for s in symbols] + [f"kline.{iv}.{s}" for s in symbols for iv in intervals]
+        self.url = url
+        self.on_closed = on_closed
+        self._halt = threading.Event()
+
+    def stop(self):
+        self._halt.set()
+
+    def run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        import websockets
+        pause = 1
+        while not self._halt.is_set():
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as ws:
+                    for i in range(0, len(self.args), ARGS_PER_SUB):
+                        await ws.send(json.dumps({"op": "subscribe", "args": self.args[i:i + ARGS_PER_SUB]}))
+                    pause = 1
+                    pinger = asyncio.create_task(self._ping(ws))
+                    try:
+                        while not self._halt.is_set():
+                            try:
+                                raw = await asyncio.wait_for(ws.recv(), timeout=1)
+                            except asyncio.TimeoutError:
+                                continue
+                            self._handle(raw)
+                    finally:
+                        pinger.cancel()
+            except Exception as e:
+                if self._halt.is_set():
+                    break
+                print(f"⚠️ WS disconnected: {e!r}; retry in {pause}s")
+                await asyncio.sleep(pause)
+                pause = min(pause * 2, 30)
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(PING_EVERY)
+            await ws.send(json.dumps({"op": "ping"}))
+
+    def _handle(self, raw):
+        try:
+            msg = json.loads(raw)
+        except ValueError:
+            return
+        closed = self.book.on_message(msg)
+        if closed is not None and self.on_closed is not None:
+            try:
+                self.on_closed(*closed)
+            except Exception as e:
+                print(f"⚠️ closed candle not stored: {e!r}")
@@ -0,0 +1,160 @@
+# summary.py — индекс точности прогнозов по дням (для /summary в proxy.py)
+#
+# На каждый день — строка метрик из пары forecast/review: изменение ETH/BTC
+# между прогнозом и review, касания уровней, попадание в диапазон и
+# совпадение направления (calc.ema_cross прогноза против compare.bias review).
+# Метрики-флаги хранятся как 0/1, их среднее — доля дней; пропуск — NaN.
+#
+# Рядом с таблицей держатся префиксные суммы и счётчики непустых значений,
+# поэтому среднее за любой диапазон дат — две строки префиксов, O(1) после
+# бинарного поиска границ, независимо от длины истории. Обновление пересчитывает
+# префиксы только начиная с самого раннего изменённого дня (новый день — в
+# конце); пачка дней (update_many, старт прокси) — одна вставка и один пересчёт.
+
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+import history
+
+METRICS = (
+    "eth_change_pct", "btc_change_pct",
+    "touched_support", "touched_resistance", "inside_range",
+    "bias_hit",
+)
+COL = {m: i for i, m in enumerate(METRICS)}
+
+def _get(d, *path):
+    cur = d
+    for p in path:
+        if not isinstance(cur, dict) or p not in cur:
+            return None
+        cur = cur[p]
+    return cur
+
+def extract(data: dict, mode: str) -> dict:
+    """Только то, что нужно для метрик дня (снапшот целиком в индексе не держим)."""
+    if mode == "forecast":
+        return {
+            "eth": history.number(data.get("eth_spot")),
+            "btc": history.number(data.get("btc_spot")),
+            "cross": _get(data, "calc", "ema_cross"),
+        }
+    cmp = data.get("compare") or {}
+    return {
+        # у review нет своего спота ETH — цена закрытия сессии в actual
+        "eth": history.number(data.get("eth_spot")) or history.number(_get(data, "actual", "close")),
+        # старые review хранили спот целиком, новые — закрытие BTC в actual
+        "btc": history.number(data.get("btc_spot")) or history.number(_get(data, "actual", "btc_close")),
+        "eth_ref": history.number(_get(data, "forecast_ref", "eth_spot_at_forecast")),
+        "btc_ref": history.number(_get(data, "forecast_ref", "btc_spot_at_forecast")),
+        "cross_ref": _get(data, "forecast_ref", "calc_at_forecast", "ema_cross"),
+        "touched_support": cmp.get("touched_support"),
+        "touched_resistance": cmp.get("touched_resistance"),
+        "inside_range": cmp.get("inside_range"),
+        "bias": cmp.get("bias"),
+    }
+
+def day_metrics(parts: dict) -> np.ndarray:
+    """{"forecast": extract(...), "review": extract(...)} -> строка METRICS (NaN — нет данных)."""
+    f = parts.get("forecast") or {}
+    r = parts.get("review") or {}
+    row = np.full(len(METRICS), np.nan)
+    for sym in ("eth", "btc"):
+        a = f.get(sym) or r.get(f"{sym}_ref")
+        b = r.get(sym)
+        if a and b is not None:
+            row[COL[f"{sym}_change_pct"]] = (b / a - 1.0) * 100.0
+    for flag in ("touched_support", "touched_resistance", "inside_range"):
+        if isinstance(r.get(flag), bool):
+            row[COL[flag]] = float(r[flag])
+    # направление угадано, если день был трендовым в сторону ema_cross; range — не в счёт
+    cross = f.get("cross") or r.get("cross_ref")
+    if cross in ("bullish", "bearish") and r.get("bias") in ("bullish", "bearish"):
+        row[COL["bias_hit"]] = float(cross == r["bias"])
+    return row
+
+class SummaryIndex:
+    """Дни по возрастанию, таблица метрик и префиксные суммы по ней.
+    Пишет один поток (event loop прокси); version растёт с каждым изменением."""
+
+    def __init__(self):
+        self.dates = []                        # "YYYY-MM-DD" по возрастанию
+        self.sources = {}                      # имя снапшота -> версия (sha/mtime), уже учтённая
+        self._parts = {}                       # дата -> {"forecast": {...}, "review": {...}}
+        self._vals = np.empty((0, len(METRICS)))
+        self._sum = np.zeros((1, len(METRICS)))
+        self._cnt = np.zeros((1, len(METRICS)), dtype=np.int64)
+        self.version = 0
+
+    def __len__(self):
+        return len(self.dates)
+
+    def update(self, date_str: str, mode: str, data: dict):
+        self.update_many([(date_str, mode, data)])
+
+    def update_many(self, items):
+        """[(date, mode, снапшот), ...] одной пачкой: новые дни вставляются одной
+        операцией, префиксы пересчитываются один раз — O(n) на пачку, а не на день."""
+        touched = set()
+        for date_str, mode, data in items:
+            self._parts.setdefault(date_str, {})[mode] = extract(data, mode)
+            touched.add(date_str)
+        new = sorted(touched.difference(self.dates))
+        first = len(self.dates) + 1
+        if new:
+            at = [bisect_left(self.dates, d) for d in new]
+            first = at[0]
+            self._vals = np.insert(self._vals, at, np.nan, axis=0)
+            self.dates = sorted(self.dates + new)
+            pad = np.zeros((len(new), len(METRICS)))
+            self._sum = np.vstack([self._sum, pad])
+            self._cnt = np.vstack([self._cnt, pad.astype(np.int64)])
+        for date_str in touched:
+            i = bisect_left(self.dates, date_str)
+            row = day_metrics(self._parts[date_str])
+            if not np.array_equal(self._vals[i], row, equal_nan=True):
+                self._vals[i] = row
+                first = min(first, i)
+        if first <= len(self.dates):
+            self._reprefix(first)
+            self.version += 1
+
+    def _reprefix(self, i: int):
+        v = self._vals[i:]
+        ok = ~np.isnan(v)
+        self._sum[i + 1:] = self._sum[i] + np.cumsum(np.where(ok, v, 0.0), axis=0)
+        self._cnt[i + 1:] = self._cnt[i] + np.cumsum(ok, axis=0)
+
+    def bounds(self, start: str | None, end: str | None):
+        """[start, end] включительно -> срез индексов [i, j)."""
+        i = bisect_left(self.dates, start) if start else 0
+        j = bisect_right(self.dates, end) if end else len(self.dates)
+        return i, max(i, j)
+
+    def stats(self, start: str | None = None, end: str | None = None) -> dict:
+        """{metric: {"mean": float|None, "n": дней со значением}} за [start, end]."""
+        i, j = self.bounds(start, end)
+        s = self._sum[j] - self._sum[i]
+        c = self._cnt[j] - self._cnt[i]
+        return {m: {"mean": (float(s[k] / c[k]) if c[k] else None), "n": int(c[k])}
+                for k, m in enumerate(METRICS)}
+
+    def days(self, start: str | None = None, end: str | None = None):
+        """[(date, строка METRICS), ...] за [start, end]."""
+        i, j = self.bounds(start, end)
+        return list(zip(self.dates[i:j], self._vals[i:j]))
+
+    def rolling(self, window: int, start: str | None = None, end: str | None = None):
+        """Скользящие средние за `window` календарных дней, оканчивающихся каждым днём
+        из [start, end]: [(date, средние METRICS, число дней со значением), ...]."""
+        i, j = self.bounds(start, end)
+        if i == j:
+            return []
+        days = np.array(self.dates, dtype="datetime64[D]")
+        lo = np.searchsorted(days, days[i:j] - (window - 1), side="left")
+        hi = np.arange(i + 1, j + 1)
+        s = self._sum[hi] - self._sum[lo]
+        c = self._cnt[hi] - self._cnt[lo]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(c > 0, s / c, np.nan)
+        return list(zip(self.dates[i:j], mean, c))
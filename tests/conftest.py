@@ -0,0 +1,19 @@
+# tests/conftest.py — общее окружение для pytest
+#
+# Модули читают ENV при импорте (store.py, proxy.py, candles.py), поэтому
+# папки и офлайн-режим задаются здесь, до первого импорта из тестов.
+
+import os, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp(prefix="bybit-tests-")
+os.environ.update({
+    "SNAPSHOT_DIR": os.path.join(TMP, "snapshots"),
+    "SNAPSHOT_REMOTE": "none",
+    "KLINE_DIR": os.path.join(TMP, "klines"),
+    "ANALYTICS_DIR": os.path.join(TMP, "analytics"),
+    "SUMMARY_REFRESH": "3600",
+})
+os.makedirs(os.environ["SNAPSHOT_DIR"], exist_ok=True)
@@ -0,0 +1,76 @@
+# tests/test_backtest.py — векторный бэктест против наивного цикла по дням
+
+import json, math
+import numpy as np
+
+import backtest, candles
+from bench.fakes import FakeBybit
+from store import LocalStore
+
+DAY = 86_400_000
+T0 = 1_735_689_600_000          # 2025-01-01 00:00 UTC
+
+def forecasts(days: int, rng) -> dict:
+    """Прогнозы на 9:00 UTC с отрезком до 19:00; уровни вокруг цены FakeBybit, часть — NaN."""
+    px = FakeBybit().price
+    t0 = T0 + np.arange(days) * DAY + 9 * 3_600_000
+    spot = px("ETHUSDT", t0)
+    levels = spot[:, None] * (1 + np.array([-0.01, -0.025, 0.01, 0.025]) + rng.normal(0, 0.004, (days, 4)))
+    levels[rng.random((days, 4)) < 0.1] = np.nan
+    spot[3] = np.nan
+    return {
+        "date": np.array([f"d{i}" for i in range(days)]), "t0": t0, "t1": t0 + 10 * 3_600_000,
+        "spot": spot, "direction": rng.choice(np.array([-1, 0, 1], dtype=np.int8), days),
+        "levels": levels, "side": np.array([True, True, False, False]), "names": ["S1", "S2", "R1", "R2"],
+    }
+
+def naive(fc, recs, tolerances):
+    """Поштучно: день за днём, уровень за уровнем, свеча за свечой."""
+    D, L, K = len(fc["date"]), len(fc["side"]), len(tolerances)
+    touched = np.zeros((D, L, K), bool)
+    first = np.full((D, L, K), np.nan)
+    mae, mfe, bias = np.full(D, np.nan), np.full(D, np.nan), np.full(D, np.nan)
+    for d in range(D):
+        sess = [r for r in recs if fc["t0"][d] <= r["start"] <= fc["t1"][d]]
+        for l in range(L):
+            lv = fc["levels"][d, l]
+            for k, tol in enumerate(tolerances):
+                for r in sess:
+                    hit = r["low"] <= lv * (1 + tol) if fc["side"][l] else r["high"] >= lv * (1 - tol)
+                    if hit:
+                        touched[d, l, k] = True
+                        first[d, l, k] = (r["start"] - fc["t0"][d]) / candles.MINUTE
+                        break
+        spot = fc["spot"][d]
+        if not sess or math.isnan(spot):
+            continue
+        up = (max(r["high"] for r in sess) / spot - 1) * 100
+        down = (1 - min(r["low"] for r in sess) / spot) * 100
+        long = fc["direction"][d] >= 0
+        mfe[d], mae[d] = (up, down) if long else (down, up)
+        if fc["direction"][d]:
+            bias[d] = float(np.sign(sess[-1]["close"] - spot) == fc["direction"][d])
+    return {"touched": touched, "first_touch_min": first, "mae_pct": mae, "mfe_pct": mfe, "bias_hit": bias}
+
+def test_vectorized_matches_naive_loop():
+    rng = np.random.default_rng(3)
+    fc = forecasts(20, rng)
+    recs = FakeBybit().candles("ETHUSDT", "5", T0, T0 + 19 * DAY)
+    recs = recs[rng.random(len(recs)) > 0.05]            # дыры в свечах
+    tolerances = np.array([0, 0.0005, 0.0025])
+    got = backtest.run(fc, recs, tolerances, chunk_days=7)
+    ref = naive(fc, recs, tolerances)
+    for k, v in ref.items():
+        np.testing.assert_allclose(got[k].astype(np.float64), v.astype(np.float64), rtol=1e-12, equal_nan=True, err_msg=k)
+
+def test_load_forecasts_reads_legacy_spot(tmp_path):
+    store = LocalStore(str(tmp_path))
+    base = {"timestamp_utc": "2025-01-02T09:00:00", "levels": {"support": [3000], "resistance": [3200]},
+            "calc": {"ema_cross": "bullish"}}
+    store.write_bytes("2025-01-02_forecast.json", json.dumps(base | {"eth_spot": {"last": "3100.5"}}).encode())
+    store.write_bytes("2025-01-03_forecast.json", json.dumps(base | {"timestamp_utc": "2025-01-03T09:00:00",
+                                                                      "eth_spot": 3111.25}).encode())
+    fc = backtest.load_forecasts(str(tmp_path))
+    assert list(fc["date"]) == ["2025-01-02", "2025-01-03"]
+    assert fc["spot"].tolist() == [3100.5, 3111.25]
+    assert fc["direction"].tolist() == [1, 1]
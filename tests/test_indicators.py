@@ -0,0 +1,10 @@
+# tests/test_indicators.py — индикаторы против наивных реализаций
+
+import pytest
+
+import indicators
+
+@pytest.mark.parametrize("n", [5, 30, 300, 5000])    # короче периодов, около них и длинный ряд
+def test_matches_naive(n):
+    results = indicators.self_check(n)
+    assert all(results.values()), {k: v for k, v in results.items() if not v}
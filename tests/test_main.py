@@ -0,0 +1,42 @@
+# tests/test_main.py — разбор ответов Bybit
+
+import json, os, time
+
+import main, market, stream
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+def load(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return json.load(f)
+
+def test_parse_tickers():
+    book = main.parse_tickers(load("tickers_spot.json"))
+    # NEWUSDT без сделок (lastPrice "") пропускается
+    assert book == {"ETHUSDT": 2583.52, "BTCUSDT": 97012.4, "SOLUSDT": 172.69, "ETHUSDC": 2584.2}
+
+def test_parse_tickers_error_payload():
+    assert main.parse_tickers({"retCode": 10001, "retMsg": "params error", "result": {}}) == {}
+    assert main.parse_tickers({"retCode": 0, "result": {"list": None}}) == {}
+
+def test_stream_mode_spot_volume_from_book(monkeypatch):
+    book = stream.PriceBook()
+    book.on_message({"topic": "tickers.ETHUSDT", "ts": int(time.time() * 1000),
+                     "data": {"symbol": "ETHUSDT", "lastPrice": "2583.52", "turnover24h": "291553462.25"}})
+    monkeypatch.setattr(main, "BOOK", book)
+    payloads = {k: None for k in market.plan(["ETHUSDT"], "ETHUSDT", spot=False)}
+    snap = main.compute_market({}, payloads, ["ETHUSDT"], "ETHUSDT")
+    assert snap["volume_analysis"]["spot_volume_24h"] == 291553462.0
+
+def test_missing_spot_ticker_is_null(monkeypatch):
+    # SOLUSDT нет в тикерах: вместо NaN (невалидный JSON) — null и флаг в meta.invalid
+    monkeypatch.setattr(main, "get_spot_tickers", lambda cat, syms: ({"BTCUSDT": 97012.4}, 1))
+    monkeypatch.setattr(main, "get_kline_last_close",
+                        lambda s: (97000.0, 1) if s == "BTCUSDT" else (float("nan"), None))
+    snap = {"calc": {}}
+    main.fetch_spots_safe(snap, {"BTCUSDT": "btc_spot", "SOLUSDT": "sol_spot"},
+                          tickers=({"BTCUSDT": 97012.4}, 1))
+    assert snap["btc_spot"] == 97012.4 and snap["sol_spot"] is None
+    assert snap["meta"]["sol_spot_ref_close"] is None
+    assert snap["meta"]["invalid"] == ["sol_spot"]
+    json.dumps(snap, allow_nan=False)
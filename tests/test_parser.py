@@ -0,0 +1,56 @@
+# tests/test_parser.py — чтение манифеста через заглушку GitHub
+
+from datetime import date, timedelta
+import pytest
+
+import parser
+from bench.fakes import FakeGitHub, CONTENTS_LIMIT, git_blob_sha
+
+SNAP = "snapshots/"
+
+@pytest.fixture
+def gh(monkeypatch):
+    with FakeGitHub() as g:
+        monkeypatch.setattr(parser, "GITHUB_API", g.api_url)
+        yield g
+
+def test_large_file_is_read_whole(gh):
+    # больше 1 МБ contents API в JSON отдаёт пустой content — читать надо raw
+    text = "x" * (CONTENTS_LIMIT + 1)
+    gh.seed({"analytics/daily_summary.csv": text.encode()})
+    assert parser.read_output(gh.repo, "t", "analytics/daily_summary.csv", False) == text
+
+def test_manifest_roundtrip_by_month(gh):
+    entries = {f"2025-{m:02d}-{d:02d}_forecast.json": {"sha": f"{m}{d}", "fields": {}, "history": {}}
+               for m in (1, 2, 3) for d in (1, 15)}
+    files = parser.manifest_files(entries, SNAP)
+    assert sorted(files) == [parser.MANIFEST_PATH] + [parser.shard_path(f"2025-{m:02d}") for m in (1, 2, 3)]
+    gh.seed({p: t.encode() for p, t in files.items()})
+    assert parser.load_manifest(gh.repo, "t", SNAP) == entries
+    # новый день меняет только свой месяц (и его хеш в индексе)
+    more = parser.manifest_files(entries | {"2025-03-20_review.json": {"sha": "x"}}, SNAP)
+    assert sorted(p for p in files if files[p] != more[p]) == [parser.MANIFEST_PATH, parser.shard_path("2025-03")]
+
+def test_missing_shard_raises(gh):
+    files = parser.manifest_files({"2025-01-01_forecast.json": {"sha": "a"}}, SNAP)
+    gh.seed({parser.MANIFEST_PATH: files[parser.MANIFEST_PATH].encode()})
+    with pytest.raises(ValueError):
+        parser.load_manifest(gh.repo, "t", SNAP)
+
+def test_missing_manifest_is_empty(gh):
+    gh.seed({"snapshots/2025-01-01_forecast.json": b"{}"})
+    assert parser.load_manifest(gh.repo, "t", SNAP) == {}
+
+def test_corrupt_manifest_raises(gh):
+    gh.seed({parser.MANIFEST_PATH: b'{"version": 2, "files": {'})
+    with pytest.raises(ValueError):
+        parser.load_manifest(gh.repo, "t", SNAP)
+
+def test_listing_is_not_capped(gh):
+    # 600 дней = 1200 файлов: contents API отдал бы только первые 1000 по алфавиту
+    start = date(2025, 10, 26)
+    names = [f"{start + timedelta(days=i)}_{m}.json" for i in range(600) for m in ("forecast", "review")]
+    gh.seed({f"snapshots/{n}": n.encode() for n in names} | {"snapshots/README.md": b"x"})
+    files = parser.list_snapshot_files(gh.repo, SNAP, "t")
+    assert sorted(it["name"] for it in files) == sorted(names)
+    assert all(it["sha"] == git_blob_sha(it["name"].encode()) for it in files)
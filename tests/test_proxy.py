@@ -0,0 +1,144 @@
+import os, asyncio
+from datetime import date as Date, timedelta
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import proxy, resilience
+from bench.fakes import FakeGitHub, git_blob_sha
+
+@pytest.fixture
+def client():
+    with TestClient(proxy.app) as c:
+        yield c
+
+@pytest.mark.parametrize("date", ["../secret/x", "..%2Fsecret%2Fx", "2025-13-01", "yesterday"])
+def test_snapshot_rejects_bad_date(client, date):
+    secret = os.path.join(os.path.dirname(proxy.STORE.local.root), "secret")
+    os.makedirs(secret, exist_ok=True)
+    with open(os.path.join(secret, "x_forecast.json"), "w") as f:
+        f.write('{"leak": true}')
+    r = client.get(f"/snapshot?date={date}&type=forecast")
+    assert r.status_code == 400
+    assert not any(k[0] == date for k in proxy.CACHE._items)
+
+def test_is_past_date_parses():
+    assert proxy.is_past_date("2000-01-01")
+    assert not proxy.is_past_date("2999-01-01")
+    with pytest.raises(ValueError):
+        proxy.is_past_date("../x")
+
+def test_listing_is_conditional_and_authorized(monkeypatch):
+    seen = []
+    http_get = proxy.http_get
+
+    async def spy(url, headers=None, timeout=12.0):
+        body, code, hdrs = await http_get(url, headers, timeout)
+        seen.append((dict(headers or {}), code))
+        return body, code, hdrs
+
+    async def twice():
+        async with httpx.AsyncClient() as http:
+            proxy.app.state.http = http
+            return await proxy._list_versions(), await proxy._list_versions()
+
+    with FakeGitHub() as gh:
+        # 1200 файлов: листинг contents API обрезал бы их до 1000
+        names = [f"{Date(2025, 1, 1) + timedelta(days=i)}_{m}.json" for i in range(600) for m in ("forecast", "review")]
+        gh.seed({f"snapshots/{n}": n.encode() for n in names})
+        for k, v in {"API_BASE": gh.api_url, "REPO": gh.repo, "BRANCH": gh.branch, "SNPATH": "snapshots",
+                     "GTOKEN": "secret", "http_get": spy, "LISTING": {"etag": None, "versions": None}}.items():
+            monkeypatch.setattr(proxy, k, v)
+        monkeypatch.setattr(proxy.STORE, "remote", object())
+        first, second = asyncio.run(twice())
+    assert first == second == {n: git_blob_sha(n.encode()) for n in names}
+    assert [code for _, code in seen] == [200, 304]
+    assert all(h["Authorization"] == "token secret" for h, _ in seen)
+    assert "If-None-Match" not in seen[0][0] and seen[1][0]["If-None-Match"]
+
+def test_listing_survives_upstream_failure(monkeypatch):
+    last = {"2025-01-01_forecast.json": "abc"}
+    monkeypatch.setattr(proxy, "LISTING", {"etag": '"e"', "versions": last})
+    monkeypatch.setattr(proxy.STORE, "remote", object())
+    for exc in (httpx.ConnectError("down"), resilience.CircuitOpen("github-api")):
+        async def fail(*a, exc=exc, **kw):
+            raise exc
+        monkeypatch.setattr(proxy, "upstream_get", fail)
+        assert asyncio.run(proxy._list_versions()) is last
+
+def test_missing_snapshot_is_negatively_cached(client, monkeypatch):
+    calls = []
+    fetch_local = proxy.FETCHERS["local"]
+
+    async def counting(name, etag=None):
+        calls.append(name)
+        return await fetch_local(name, etag)
+
+    monkeypatch.setitem(proxy.FETCHERS, "local", counting)
+    for _ in range(3):
+        assert client.get("/snapshot?date=2001-02-03&type=forecast").status_code == 404
+    assert calls == ["2001-02-03_forecast.json"]
+    # промах устарел — снова идём в источники
+    monkeypatch.setattr(proxy, "CACHE_MISS_TTL", 0)
+    assert client.get("/snapshot?date=2001-02-03&type=forecast").status_code == 404
+    assert len(calls) == 2
+
+def test_concurrent_today_is_coalesced(monkeypatch):
+    calls = []
+
+    async def slow(name, etag=None):
+        calls.append(name)
+        await asyncio.sleep(0.2)
+        return b'{"eth_spot": 2583.52}', "e1"
+
+    monkeypatch.setitem(proxy.FETCHERS, "local", slow)
+    monkeypatch.setattr(proxy, "CACHE", proxy.SnapshotCache(8))
+
+    async def burst(n):
+        transport = httpx.ASGITransport(app=proxy.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as c:
+            return await asyncio.gather(*(c.get("/today?type=forecast") for _ in range(n)))
+
+    replies = asyncio.run(burst(20))
+    assert [r.status_code for r in replies] == [200] * 20
+    assert all(r.json() == {"eth_spot": 2583.52} for r in replies)
+    assert len(calls) == 1
+    assert proxy.CACHE.stats()["coalesced"] == 19
+
+@pytest.fixture
+def stored(monkeypatch):
+    monkeypatch.setattr(proxy, "CACHE", proxy.SnapshotCache(8))
+    proxy.STORE.local.write_bytes("2001-03-04_forecast.json", b'{"eth_spot": 2583.52, "levels": [1, 2]}')
+    return "/snapshot?date=2001-03-04&type=forecast"
+
+def test_if_none_match_gives_304(client, stored):
+    r = client.get(stored)
+    assert r.status_code == 200 and r.headers["ETag"]
+    again = client.get(stored, headers={"If-None-Match": f'"other", {r.headers["ETag"]}'})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["ETag"] == r.headers["ETag"]
+    assert client.get(stored, headers={"If-None-Match": "*"}).status_code == 304
+    assert client.get(stored, headers={"If-None-Match": '"other"'}).status_code == 200
+
+@pytest.mark.parametrize("accept, enc", [
+    ("gzip, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0", "identity"),
+    ("*", "br"),
+    ("*, br;q=0", "gzip"),
+    ("gzip;q=bad", "identity"),
+    (None, "identity"),
+])
+def test_pick_encoding(accept, enc):
+    assert proxy.pick_encoding(accept, {"identity": b"", "gzip": b"", "br": b""}) == enc
+
+def test_pick_encoding_only_offers_present_variants():
+    # короткое тело не сжимаем — остаётся только identity
+    assert proxy.pick_encoding("br, gzip", {"identity": b""}) == "identity"
+
+def test_msgpack_without_package_is_406(client, stored, monkeypatch):
+    monkeypatch.setattr(proxy, "msgpack", None)
+    assert client.get(stored + "&format=msgpack").status_code == 406
+    # по Accept формат не навязан явно — молча отдаём JSON
+    r = client.get(stored, headers={"Accept": "application/msgpack"})
+    assert r.status_code == 200 and r.headers["content-type"] == "application/json"
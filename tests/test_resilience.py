@@ -0,0 +1,45 @@
+# tests/test_resilience.py — предохранитель и отмена пробной попытки
+
+import asyncio
+import pytest
+
+import resilience
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+def opened(clock):
+    b = resilience.CircuitBreaker("test", fail_threshold=1, reset_after=10, clock=clock)
+    b.failure()
+    clock.t += 10      # полуоткрыт: пропустит одну пробу
+    return b
+
+def test_cancelled_probe_releases_breaker():
+    clock = Clock()
+    b = opened(clock)
+    policy = resilience.Policy(attempts=1)
+
+    async def hang(timeout):
+        await asyncio.sleep(3600)
+
+    async def cancel_probe():
+        task = asyncio.create_task(resilience.acall(hang, policy, b, resilience.Deadline(60)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+    assert b.allow() is True          # место пробы свободно
+
+def test_probe_is_exclusive():
+    b = opened(Clock())
+    assert b.allow() is True
+    with pytest.raises(resilience.CircuitOpen):
+        b.allow()
+    b.success()
+    assert b.state == "closed" and b.allow() is False
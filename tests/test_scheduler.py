@@ -0,0 +1,45 @@
+# tests/test_scheduler.py — расписание на подменённых часах через перевод времени
+
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import pytest
+
+import scheduler
+
+TZ = ZoneInfo("Europe/Podgorica")
+
+class FakeClock:
+    """Время — UTC timestamp; sleep двигает его вперёд без ожидания."""
+
+    def __init__(self, start: datetime):
+        self.t = start.timestamp()
+
+    def __call__(self) -> datetime:
+        return datetime.fromtimestamp(self.t, TZ)
+
+    def sleep(self, seconds: float):
+        self.t += seconds
+
+@pytest.mark.parametrize("start", ["2025-03-27", "2025-10-23"])   # весенний и осенний переводы
+def test_runs_at_local_times_across_dst(tmp_path, start):
+    clock = FakeClock(datetime.fromisoformat(start).replace(hour=5, tzinfo=TZ))
+    runs = []
+    jobs = [(kind, at, lambda d, mem, kind=kind: runs.append((kind, d, clock())))
+            for kind, at in (("forecast", "09:00"), ("review", "21:00"))]
+    s = scheduler.Scheduler(jobs, str(tmp_path / "state.json"), clock, sleep=clock.sleep)
+    end = clock.t + 6 * 86_400
+    while clock.t < end:
+        s.tick()
+        s.sleep(s.seconds_until_next(clock()))
+
+    offsets = {r[2].utcoffset() for r in runs}
+    assert offsets == {timedelta(hours=1), timedelta(hours=2)}     # перевод часов действительно пройден
+    days = sorted({d for _, d, _ in runs})
+    assert len(days) == 6
+    for kind, hm in (("forecast", (9, 0)), ("review", (21, 0))):
+        mine = [(d, at) for k, d, at in runs if k == kind]
+        assert len(mine) == len({d for d, _ in mine})                # не больше одного раза в сутки
+        for d, at in mine:
+            assert at.date().isoformat() == d
+            assert (at.hour, at.minute, at.second) == (*hm, 0), (kind, at)
+    assert len(runs) == 12
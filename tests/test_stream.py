@@ -0,0 +1,38 @@
+# tests/test_stream.py — BookFeed против заглушки WebSocket Bybit
+
+import time
+import pytest
+
+import stream
+from bench.fakes import FakeBybitWS
+
+def wait(cond, timeout=10.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_feed_reconnects_and_updates_book():
+    book = stream.PriceBook()
+    with FakeBybitWS(drop_after=3) as ws:
+        feed = stream.BookFeed(book, ["ETHUSDT", "BTCUSDT"], intervals=("1",), url=ws.url)
+        feed.start()
+        try:
+            assert wait(lambda: ws.connections >= 2 and len(ws.subscriptions[-1]) == len(feed.args))
+            # после переподключения подписка повторена целиком
+            assert all(sorted(s) == sorted(feed.args) for s in ws.subscriptions)
+            first = book.last("ETHUSDT")
+            assert first is not None
+            assert wait(lambda: book.last("ETHUSDT")[1] > first[1])
+        finally:
+            feed.stop()
+            feed.join(5)
+    now = int(time.time() * 1000)
+    price, _ = book.last("ETHUSDT")
+    assert book.turnover("ETHUSDT")[0] == pytest.approx(price * 2e5, rel=0.01)
+    assert abs(price - float(ws.prices.price("ETHUSDT", now))) < 5
+    c = book.candle("BTCUSDT", "1")
+    minute = now - now % 60_000
+    assert c is not None and int(c["start"][0]) in (minute, minute - 60_000)
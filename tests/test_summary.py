@@ -0,0 +1,54 @@
+# tests/test_summary.py — индекс /summary: пачка против поштучных обновлений
+
+import random
+from datetime import date, timedelta
+import numpy as np
+
+import summary
+from bench.fakes import snapshot_pair
+
+def snapshots(days: int):
+    """Пары forecast/review в формате main.py (bench.fakes.snapshot_pair); у каждого
+    третьего прогноза спот в старом формате {"last": ...}."""
+    out = []
+    for i in range(days):
+        day = date(2024, 1, 1) + timedelta(days=i)
+        pair = snapshot_pair(day)
+        f, r = pair[f"{day}_forecast.json"], pair[f"{day}_review.json"]
+        if i % 3 == 0:
+            f["eth_spot"] = {"last": f["eth_spot"]}
+        out += [(day.isoformat(), "forecast", f), (day.isoformat(), "review", r)]
+    return out
+
+def test_batch_matches_one_by_one():
+    items = snapshots(200)
+    rng = random.Random(1)
+    shuffled = items[:]
+    rng.shuffle(shuffled)
+    one = summary.SummaryIndex()
+    for it in shuffled:
+        one.update(*it)
+    batch = summary.SummaryIndex()
+    batch.update_many(shuffled[:150])
+    batch.update_many(shuffled[150:])
+    assert batch.dates == one.dates == sorted({d for d, _, _ in items})
+    np.testing.assert_array_equal(batch._vals, one._vals)
+    np.testing.assert_allclose(batch._sum, one._sum)
+    np.testing.assert_array_equal(batch._cnt, one._cnt)
+    # префиксы — те же средние, что и прямой nanmean
+    s = batch.stats("2024-02-01", "2024-05-31")
+    i, j = batch.bounds("2024-02-01", "2024-05-31")
+    for k, m in enumerate(summary.METRICS):
+        col = batch._vals[i:j, k]
+        assert s[m]["n"] == int(np.isfinite(col).sum())
+        if s[m]["n"]:
+            assert abs(s[m]["mean"] - np.nanmean(col)) < 1e-9
+
+def test_change_metrics_and_unchanged_version():
+    idx = summary.SummaryIndex()
+    idx.update_many(snapshots(3))
+    for col in ("eth_change_pct", "btc_change_pct"):
+        assert all(np.isfinite(row[summary.COL[col]]) for _, row in idx.days()), col
+    v = idx.version
+    idx.update_many(snapshots(3))     # те же данные — индекс не меняется
+    assert idx.version == v